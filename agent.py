@@ -1,22 +1,50 @@
 import requests
 import os
-from textblob import TextBlob
-from services.fmcsa import FMCSAService
+import time
+import numpy as np
+from services.fmcsa import get_fmcsa_service
 from core.config import Config
+from core.metrics import LOAD_SEARCH_MATCHES, NEGOTIATION_ROUNDS
+from api.negotiation import append_negotiation, negotiate_rate, negotiate_rates, negotiation_at
+from services.reservations import get_reservation_book
 
 API_URL = Config.API_URL
 HEADERS = {"X-API-Key": Config.API_KEY}
+# Tries at taking a booked load off the board before the booking is settled regardless
+BOOKING_DELETE_ATTEMPTS = 3
+
+_textblob = None
+
+def _get_textblob():
+    """Import TextBlob (and NLTK behind it) on first use; it dominates import time"""
+    global _textblob
+    if _textblob is None:
+        from textblob import TextBlob
+        _textblob = TextBlob
+    return _textblob
+
+def warm_sentiment():
+    """Import TextBlob and run one analysis so corpora are loaded before the first call"""
+    _get_textblob()("warm up").sentiment
+
+def _as_offer(offer):
+    """Same leniency as negotiate(): an offer that isn't a number counts as 0"""
+    try:
+        return int(offer)
+    except (ValueError, TypeError):
+        return 0
 
 class CarrierAgent:
     def __init__(self):
         self.negotiation_log = []
-        self.fmcsa_service = FMCSAService()
+        # Shared service so the verification cache survives across requests
+        self.fmcsa_service = get_fmcsa_service()
 
-    def verify_mc(self, mc_number):
+    def verify_mc(self, mc_number, deadline=None):
         """Verify MC number using real FMCSA API"""
         try:
             # Use the enhanced FMCSA service
-            result = self.fmcsa_service.verify_mc_number(mc_number)
+            result = self.fmcsa_service.verify_mc_number(mc_number, deadline=deadline)
             return result
         except Exception as e:
             # Fallback to API endpoint if direct service fails
@@ -31,19 +59,66 @@ class CarrierAgent:
                     "message": f"Verification failed: {str(e)}"
                 }
 
-    def search_loads(self, equipment_type=None, origin=None, destination=None):
+    def search_loads(self, equipment_type=None, origin=None, destination=None, **windows):
+        """Loads nobody holds; ``windows``: available_from / available_to / deliver_by"""
         # Directly import and call the loads logic to avoid HTTP self-call deadlock
         try:
-            from api.loads import get_loads
-            # get_loads returns a list of dicts
-            return get_loads(equipment_type=equipment_type, origin=origin, destination=destination)
+            from api.loads import get_loads_store
+            # Loads held by other calls are skipped
+            results = get_loads_store().search(equipment_type, origin, destination,
+                                               exclude=get_reservation_book().held_ids(), **windows)
+            LOAD_SEARCH_MATCHES.observe(len(results), "agent")
+            return results
         except Exception as e:
             print(f"Failed to get loads directly: {e}")
             return []
 
+    def hold_load(self, loads, holder=None):
+        """Hold the first candidate no other call holds; returns (load, token) or (None, None)"""
+        book = get_reservation_book()
+        for load in loads:
+            token = book.hold(load["load_id"], holder, Config.LOAD_HOLD_SECONDS)
+            if token is not None:
+                return load, token
+        return None, None
+
+    def confirm_load(self, load, token):
+        """Book a held load for the sales rep; False if the hold lapsed in the meantime
+        
+        The booked load is deleted from the board through the load repository
+        (WAL-backed, so it stays off after a restart), then the booking is
+        settled so the reservation book only tracks calls in flight. A failing
+        delete is retried; the booking is settled either way, so it never
+        outlives the call.
+        """
+        from api.loads import get_load_repository
+        from services.load_repository import LoadNotFoundError
+        book = get_reservation_book()
+        if not book.confirm(load["load_id"], token):
+            return False
+        for attempt in range(BOOKING_DELETE_ATTEMPTS):
+            try:
+                get_load_repository().delete(load["load_id"])
+                break
+            except LoadNotFoundError:
+                break  # deleted or expired while we negotiated; the deal still stands
+            except Exception as e:
+                print(f"Failed to remove booked load {load['load_id']} from the board "
+                      f"(attempt {attempt + 1}/{BOOKING_DELETE_ATTEMPTS}): {e}")
+                if attempt + 1 < BOOKING_DELETE_ATTEMPTS:
+                    time.sleep(0.1 * (attempt + 1))
+        book.settle(load["load_id"], token)
+        return True
+
+    def release_load(self, load, token):
+        get_reservation_book().release(load["load_id"], token)
+
     def negotiate(self, load, initial_offer, max_rounds=3):
         """
-        Negotiate a load rate by calling the negotiation API endpoint
+        Negotiate a load rate with the same logic as the /negotiate endpoint
+        
+        Runs in-process rather than over HTTP so calls from the webhook don't
+        spend the platform's API key rate limit.
         
         Args:
             load (dict): The load information including loadboard_rate
@@ -53,49 +128,49 @@ class CarrierAgent:
         Returns:
             dict: Negotiation result with accepted status, final rate, and history
         """
-        try:
-            # Try using the dedicated negotiation API endpoint
-            payload = {
+        result = negotiate_rate(load["loadboard_rate"], _as_offer(initial_offer), max_rounds)
+        NEGOTIATION_ROUNDS.observe(len(result["history"]), "agent", "accepted" if result["accepted"] else "rejected")
+        # Logged like /negotiate logs successful negotiations
+        if result["accepted"]:
+            self.log_negotiation({
                 "load_id": load["load_id"],
-                "loadboard_rate": load["loadboard_rate"],
                 "initial_offer": initial_offer,
-                "max_rounds": max_rounds
-            }
-            
-            response = requests.post(
-                f"{API_URL}/negotiate", 
-                json=payload, 
-                headers=HEADERS, 
-                timeout=10
-            )
+                "final_rate": result["final_rate"],
+                "rounds": len(result["history"])
+            })
+        return result
+
+    def negotiate_candidates(self, loads, initial_offer, max_rounds=3):
+        """
+        Negotiate every candidate load in one vectorized pass
+        
+        Args:
+            loads (list): Candidate loads, in search order
+            initial_offer: The carrier's offer, or a list with one offer per load
+            max_rounds (int): Maximum number of negotiation rounds
             
-            if response.status_code == 200:
-                return response.json()
-            else:
-                print(f"Negotiation API failed with status {response.status_code}: {response.text}")
-                # Fall back to local implementation
-        except Exception as e:
-            print(f"Failed to use negotiation API: {e}")
-            # Fall back to local implementation
+        Returns:
+            list: (load, negotiation) pairs, best first: deals that close, cheapest
+            relative to the board rate, then the rest by how close the offers came
+        """
+        if not loads:
+            return []
+        offers = initial_offer if isinstance(initial_offer, (list, tuple)) else [initial_offer] * len(loads)
+        offers = [_as_offer(offer) for offer in offers]
+        rates = np.array([load["loadboard_rate"] for load in loads], dtype=np.int64)
+        result = negotiate_rates(rates, offers, max_rounds)
         
-        # Fallback negotiation logic (if API call fails)
-        counter = load["loadboard_rate"]
-        # Convert initial_offer to int if it's a string
-        try:
-            initial_offer = int(initial_offer)
-        except (ValueError, TypeError):
-            initial_offer = 0  # or handle as you wish
-        rounds = 0
-        accepted = False
-        negotiation_history = []
-        while rounds < max_rounds:
-            negotiation_history.append({"round": rounds+1, "carrier_offer": initial_offer, "broker_offer": counter})
-            if abs(initial_offer - counter) <= 100:
-                accepted = True
-                break
-            counter = int((counter + initial_offer) / 2)
-            rounds += 1
-        return {"accepted": accepted, "final_rate": counter if accepted else None, "history": negotiation_history}
+        board = np.maximum(rates, 1)
+        last_broker_offer = result["broker_offers"][np.maximum(result["rounds"] - 1, 0), np.arange(len(loads))]
+        gap = np.abs(result["initial_offers"] - last_broker_offer) / board
+        cost = np.where(result["accepted"], result["final_rates"] / board, gap)
+        # Sort keys, last is primary: accepted first, then cost, then search order
+        order = np.lexsort((np.arange(len(loads)), cost, ~result["accepted"]))
+        
+        ranked = [(loads[i], negotiation_at(result, i)) for i in order]
+        best = ranked[0][1]
+        NEGOTIATION_ROUNDS.observe(len(best["history"]), "agent", "accepted" if best["accepted"] else "rejected")
+        return ranked
 
     def classify_outcome(self, negotiation_result):
         if negotiation_result["accepted"]:
@@ -103,7 +178,7 @@ class CarrierAgent:
         return "No Deal"
 
     def classify_sentiment(self, call_transcript):
-        blob = TextBlob(call_transcript)
+        blob = _get_textblob()(call_transcript)
         polarity = blob.sentiment.polarity
         if polarity > 0.2:
             return "Positive"
@@ -113,7 +188,9 @@ class CarrierAgent:
             return "Neutral"
 
     def log_negotiation(self, data):
+        # Appended in-process: an HTTP self-call shares the default key's rate limit
+        # with platform traffic and a 429 would silently drop the record
         try:
-            requests.post(f"{API_URL}/log_negotiation", json=data, headers=HEADERS, timeout=10)
+            append_negotiation(data)
         except Exception as e:
             print(f"Failed to log negotiation: {e}")
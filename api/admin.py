@@ -0,0 +1,102 @@
+import tracemalloc
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from core import memory
+from core.security import get_api_key
+from core.profiler import DEFAULT_INTERVAL, MAX_DURATION, ProfiledRoute, profile_for, request_profiles
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(get_api_key)], route_class=ProfiledRoute)
+
+def _render_profile(profiler, format: str):
+    if format == "json":
+        return profiler.to_dict()
+    return PlainTextResponse(profiler.collapsed())
+
+@router.get("/profile")
+def run_profile(
+    seconds: float = Query(10, gt=0, le=MAX_DURATION),
+    interval_ms: float = Query(DEFAULT_INTERVAL * 1000, ge=1, le=1000),
+    format: str = Query("collapsed", pattern="^(collapsed|json)$"),
+):
+    """
+    Sample every thread's stack for N seconds and return the aggregated profile
+    
+    - format=collapsed: folded stacks for flamegraph.pl / speedscope
+    - format=json: stack -> sample count mapping with metadata
+    """
+    profiler = profile_for(seconds, interval_ms / 1000)
+    if profiler is None:
+        raise HTTPException(status_code=409, detail="A profiling session is already running")
+    return _render_profile(profiler, format)
+
+@router.get("/profile/requests")
+def list_request_profiles():
+    """List recent per-request profiles captured via the X-Profile header"""
+    return {"profiles": request_profiles.list()}
+
+@router.get("/profile/requests/{profile_id}")
+def get_request_profile(profile_id: str, format: str = Query("collapsed", pattern="^(collapsed|json)$")):
+    """Return a stored per-request profile"""
+    entry = request_profiles.get(profile_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    description, profiler = entry
+    return _render_profile(profiler, format)
+
+@router.get("/memory")
+def memory_report():
+    """
+    Memory footprint of this worker: RSS, threads and GC state, then entry
+    counts and approximate bytes per subsystem (null until first used)
+    """
+    return memory.report()
+
+@router.post("/memory/snapshots")
+def take_memory_snapshot(
+    frames: int = Query(memory.DEFAULT_FRAMES, ge=1, le=memory.MAX_FRAMES),
+    label: str = Query("", max_length=100),
+):
+    """
+    Take a tracemalloc snapshot, starting allocation tracing on the first call
+    
+    Only allocations made after tracing started are seen, so take a baseline
+    snapshot, let traffic run, then take another and diff the two. ``frames``
+    only applies when tracing starts.
+    """
+    return memory.snapshots.take(frames, label)
+
+@router.get("/memory/snapshots")
+def list_memory_snapshots():
+    """List stored tracemalloc snapshots"""
+    return {"tracing": tracemalloc.is_tracing(), "snapshots": memory.snapshots.list()}
+
+@router.delete("/memory/snapshots")
+def clear_memory_snapshots():
+    """Drop every snapshot and stop tracing"""
+    memory.snapshots.clear()
+    return {"tracing": False}
+
+@router.get("/memory/snapshots/{snapshot_id}")
+def get_memory_snapshot(
+    snapshot_id: str,
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    limit: int = Query(25, ge=1, le=500),
+):
+    """Largest allocation sites in a snapshot"""
+    top = memory.snapshots.top(snapshot_id, group_by, limit)
+    if top is None:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return top
+
+@router.get("/memory/snapshots/{first_id}/diff/{second_id}")
+def diff_memory_snapshots(
+    first_id: str,
+    second_id: str,
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    limit: int = Query(25, ge=1, le=500),
+):
+    """Allocation sites ranked by growth between two snapshots"""
+    diff = memory.snapshots.diff(first_id, second_id, group_by, limit)
+    if diff is None:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return diff
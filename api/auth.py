@@ -1,15 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from core.config import Config
+from core.profiler import ProfiledRoute
 from core.security import get_api_key
-from services.fmcsa import FMCSAService
-from pydantic import BaseModel, field_validator
-from typing import Union
+from services.fmcsa import get_fmcsa_service
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Optional, Union
 import logging
 import json
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
-fmcsa_service = FMCSAService()
+router = APIRouter(route_class=ProfiledRoute)
 
 class MCVerificationRequest(BaseModel):
     mc_number: Union[str, int]
@@ -25,6 +27,20 @@ class MCVerificationRequest(BaseModel):
         else:
             raise ValueError("MC number must be a string or number")
 
+class BulkMCVerificationRequest(BaseModel):
+    mc_numbers: List[Union[str, int]]
+    max_concurrency: Optional[int] = Field(None, ge=1, le=64)
+    
+    @field_validator('mc_numbers', mode='before')
+    @classmethod
+    def convert_mc_numbers_to_strings(cls, v):
+        """Apply the single-MC conversion to every entry"""
+        if not isinstance(v, list):
+            raise ValueError("mc_numbers must be a list")
+        if len(v) > Config.FMCSA_BULK_MAX_ITEMS:
+            raise ValueError(f"At most {Config.FMCSA_BULK_MAX_ITEMS} MC numbers per request")
+        return [MCVerificationRequest.convert_mc_number_to_string(item) for item in v]
+
 @router.post("/verify_mc", dependencies=[Depends(get_api_key)])
 def verify_mc(request: MCVerificationRequest):
     """Verify MC number using real FMCSA API"""
@@ -40,7 +56,8 @@ def verify_mc(request: MCVerificationRequest):
         # Log the processed MC number after validation
         logger.info(f"📝 Processing MC verification for: {request.mc_number}")
         
-        result = fmcsa_service.verify_mc_number(request.mc_number)
+        # Eligibility, safety rating and authority in one (cached) lookup
+        result = get_fmcsa_service().get_carrier_profile(request.mc_number)
         
         # Log the result summary
         logger.info(f"✅ VERIFY_MC Result: MC {request.mc_number} -> eligible: {result.get('eligible', False)}, status: {result.get('status', 'unknown')}")
@@ -57,10 +74,28 @@ def verify_mc(request: MCVerificationRequest):
 def get_carrier_safety_rating(mc_number: str):
     """Get carrier safety rating from FMCSA"""
     try:
-        safety_rating = fmcsa_service.get_carrier_safety_rating(mc_number)
+        profile = get_fmcsa_service().get_carrier_profile(mc_number)
         return {
             "mc_number": mc_number,
-            "safety_rating": safety_rating
+            "safety_rating": profile.get("safety_rating")
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get safety rating: {str(e)}")
+
+@router.post("/verify_mc/bulk", dependencies=[Depends(get_api_key)])
+def verify_mc_bulk(request: BulkMCVerificationRequest):
+    """
+    Verify many MC numbers, streaming one JSON result per line (NDJSON)
+    
+    Duplicates are removed and cached results arrive first; cache misses are
+    fanned out to FMCSA with bounded concurrency and a rate limit, and each
+    line is flushed as its lookup completes.
+    """
+    logger.info(f"📦 Bulk MC verification for {len(request.mc_numbers)} MC numbers")
+    results = get_fmcsa_service().verify_mc_numbers(
+        request.mc_numbers, max_concurrency=request.max_concurrency
+    )
+    return StreamingResponse(
+        (json.dumps(result) + "\n" for result in results),
+        media_type="application/x-ndjson",
+    )
@@ -1,28 +1,72 @@
 from fastapi import APIRouter, Request, HTTPException
 from fastapi.responses import HTMLResponse
+from html import escape
 import os
 import json
-import requests
-from core.config import Config
+from collections import deque
+from api.negotiation import get_metrics
+from core.profiler import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
+
+# Lanes shown in the per-lane table (busiest first)
+DASHBOARD_LANES = 10
+
+def _format(value, unit):
+    if value is None:
+        return "–"
+    if unit == "$":
+        return f"${value:,.0f}"
+    if unit == "%":
+        return f"{value * 100:.1f}%"
+    if unit == "ms":
+        return f"{value * 1000:.0f} ms"
+    return f"{value:.1f}"
+
+def _quantile_rows(rows):
+    """<tr>s of name, count, p50/p90/p99 for (label, summary, unit) triples"""
+    html = ""
+    for label, summary, unit in rows:
+        summary = summary or {}
+        cells = "".join(f"<td>{_format(summary.get(p), unit)}</td>" for p in ("p50", "p90", "p99"))
+        html += f"<tr><td>{escape(label)}</td><td>{summary.get('count', 0)}</td>{cells}</tr>"
+    return html
+
+def _quantile_table(title, rows):
+    return f"""
+        <h2>{escape(title)}</h2>
+        <table class="quantiles">
+            <tr><th></th><th>Samples</th><th>p50</th><th>p90</th><th>p99</th></tr>
+            {_quantile_rows(rows)}
+        </table>
+    """
 
 @router.get("/dashboard", response_class=HTMLResponse)
-async def show_dashboard(request: Request):
+def show_dashboard(request: Request):
     """
     Renders a simple dashboard directly in the FastAPI application
     This avoids the need for a separate Streamlit process
     """
-    # Get metrics data from the API
+    # Plain def: tailing the log and the SQLite metrics exchange block, so run in the threadpool
+    # Same numbers as /metrics, computed in-process rather than over an HTTP self-call
     try:
-        metrics_response = requests.get(
-            f"{Config.API_URL}/metrics", 
-            headers={"X-API-Key": Config.API_KEY},
-            timeout=5
-        )
-        metrics = metrics_response.json() if metrics_response.status_code == 200 else {"negotiations": 0}
+        metrics = get_metrics()
     except Exception as e:
         metrics = {"negotiations": 0, "error": str(e)}
+    latency = metrics.get("webhook_latency_seconds") or {}
+    
+    quantiles_html = _quantile_table("Rates & Negotiation", [
+        ("Final rate", metrics.get("final_rate"), "$"),
+        ("Discount vs loadboard rate", metrics.get("discount"), "%"),
+        ("Rounds", metrics.get("rounds"), ""),
+        ("Webhook latency", latency.get("all"), "ms"),
+    ])
+    lanes = sorted((metrics.get("by_lane") or {}).items(), key=lambda item: -item[1]["calls"])[:DASHBOARD_LANES]
+    quantiles_html += _quantile_table("Final Rate by Lane", [(lane, stats["final_rate"], "$") for lane, stats in lanes])
+    quantiles_html += _quantile_table("Discount by Equipment Type", [
+        (equipment, stats["discount"], "%") for equipment, stats in (metrics.get("by_equipment_type") or {}).items()])
+    quantiles_html += _quantile_table("Webhook Latency by Equipment Type", [
+        (equipment, summary, "ms") for equipment, summary in (latency.get("by_equipment_type") or {}).items()])
     
     # Try to read negotiation logs
     logs = []
@@ -30,9 +74,8 @@ async def show_dashboard(request: Request):
         log_path = os.path.join(os.path.dirname(__file__), '../data/negotiations.log')
         if os.path.exists(log_path):
             with open(log_path) as f:
-                lines = f.readlines()
-                # Get the last 10 logs
-                for line in lines[-10:]:
+                # Stream the file keeping only the last 10 lines, rather than reading it all into memory
+                for line in deque(f, maxlen=10):
                     try:
                         logs.append(json.loads(line))
                     except:
@@ -100,6 +143,19 @@ async def show_dashboard(request: Request):
                 flex: 1;
                 min-width: 300px;
             }}
+            .quantiles {{
+                width: 100%;
+                border-collapse: collapse;
+                margin: 10px 0 20px;
+            }}
+            .quantiles th, .quantiles td {{
+                padding: 8px 12px;
+                border-bottom: 1px solid #e1e4e8;
+                text-align: right;
+            }}
+            .quantiles th:first-child, .quantiles td:first-child {{
+                text-align: left;
+            }}
             .auto-refresh {{
                 color: #7f8c8d;
                 font-size: 0.9rem;
@@ -129,6 +185,8 @@ async def show_dashboard(request: Request):
             </div>
         </div>
         
+        {quantiles_html}
+        
         <h2>Negotiation Logs</h2>
     """
     
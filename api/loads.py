@@ -1,41 +1,138 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, status
-from typing import List
-import json
-import os
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Request, Response, status
+from datetime import datetime
+from typing import List, Optional
+import logging
+import threading
+import zlib
+from core import memory
+from core.config import Config
 from core.security import get_api_key
+from core.metrics import CACHE_REQUESTS, LOAD_SEARCH_MATCHES
+from core.profiler import ProfiledRoute
+from core.responses import FastJSONResponse, JSONFragments
+from services.load_repository import LoadConflictError, LoadNotFoundError, LoadRepository
+from services.load_store import LoadValidationError
+from services.load_table import LoadTable
+from services.reservations import get_reservation_book
 
-router = APIRouter()
+logger = logging.getLogger(__name__)
+router = APIRouter(route_class=ProfiledRoute)
 
-def get_loads_data():
-    """Load data from JSON file when needed"""
+DATA_PATH = Config.LOADS_PATH
+_repository = None
+_repository_lock = threading.Lock()
+
+def get_load_repository() -> LoadRepository:
+    """Process-wide repository over the load board file and its write-ahead log"""
+    global _repository
+    if _repository is None:
+        with _repository_lock:
+            if _repository is None:
+                _repository = LoadRepository(DATA_PATH, compact_every=Config.LOADS_COMPACT_EVERY)
+    return _repository
+
+memory.register("loads", lambda: _repository.table.memory_usage() if _repository is not None else None)
+
+def get_loads_store() -> LoadTable:
+    """Columnar load board; re-ingested only when the file is replaced, WAL changes applied incrementally"""
+    repository = get_load_repository()
     try:
-        data_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/loads.json'))
-        with open(data_path) as f:
-            return json.load(f)
+        if repository.is_current():
+            CACHE_REQUESTS.inc("loads_file", "hit")
+            return repository.table
+        CACHE_REQUESTS.inc("loads_file", "miss")
+        return repository.refresh()
     except Exception as e:
         print(f"Error loading loads data: {e}")
-        return []
+        return LoadTable()
 
-@router.get("/loads", dependencies=[Depends(get_api_key)])
-def get_loads(equipment_type: str = None, origin: str = None, destination: str = None) -> List[dict]:
-    loads = get_loads_data()
-    results = loads
-    if equipment_type:
-        results = [l for l in results if l["equipment_type"].lower() == equipment_type.lower()]
-    if origin:
-        results = [l for l in results if origin.lower() in l["origin"].lower()]
-    if destination:
-        results = [l for l in results if destination.lower() in l["destination"].lower()]
+def get_loads_data():
+    """All loads in board order"""
+    return get_loads_store().rows()
+
+def _search_response(equipment_type, origin, destination, endpoint: str, held=None, **windows):
+    """Matching loads that nobody holds, as a list or as cached JSON fragments when FAST_JSON is on"""
+    store = get_loads_store()
+    if held is None:
+        held = get_reservation_book().held_ids()
+    if Config.FAST_JSON:
+        rows = store.find(equipment_type, origin, destination, exclude=held, **windows)
+        LOAD_SEARCH_MATCHES.observe(len(rows), endpoint)
+        return FastJSONResponse(JSONFragments(store.fragments(rows)))
+    # Vectorized mask over the columnar table; only matching rows become dicts
+    results = store.search(equipment_type, origin, destination, exclude=held, **windows)
+    LOAD_SEARCH_MATCHES.observe(len(results), endpoint)
     return results
 
+def _board_etag(held) -> str:
+    """Board version, extended with a digest of the held loads (searches hide them)"""
+    etag = get_load_repository().etag
+    if not held:
+        return etag
+    digest = zlib.crc32("\n".join(sorted(held)).encode("utf-8"))
+    return f'{etag[:-1]}.{digest:x}"'
+
+@router.get("/loads", dependencies=[Depends(get_api_key)])
+def get_loads(response: Response, equipment_type: str = None, origin: str = None, destination: str = None,
+              available_from: Optional[datetime] = None, available_to: Optional[datetime] = None,
+              deliver_by: Optional[datetime] = None,
+              if_none_match: Optional[str] = Header(None)) -> List[dict]:
+    """Pickup between available_from and available_to, delivery by deliver_by (ISO 8601, all optional)"""
+    # Every change to the board bumps the version, so unchanged queries can be revalidated cheaply
+    get_loads_store()
+    held = get_reservation_book().held_ids()
+    etag = _board_etag(held)
+    if if_none_match and etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    result = _search_response(equipment_type, origin, destination, "loads", held, available_from=available_from,
+                              available_to=available_to, deliver_by=deliver_by)
+    (result if isinstance(result, Response) else response).headers["ETag"] = etag
+    return result
+
 @router.get("/load/{load_id}", dependencies=[Depends(get_api_key)])
 def get_load(load_id: str):
-    loads = get_loads_data()
-    for l in loads:
-        if l["load_id"] == load_id:
-            return l
+    load = get_loads_store().get(load_id)
+    if load is not None:
+        return load
     raise HTTPException(status_code=404, detail="Load not found")
 
+def _mutation_response(response: Response, load=None):
+    response.headers["ETag"] = get_load_repository().etag
+    return load
+
+@router.post("/loads", status_code=status.HTTP_201_CREATED, dependencies=[Depends(get_api_key)])
+def create_load(response: Response, load: dict = Body(...)):
+    """Add a load; written to the WAL and applied to the in-memory indexes"""
+    try:
+        created = get_load_repository().create(load)
+    except LoadValidationError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid load: {e}")
+    except LoadConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    logger.info(f"➕ Created load {created['load_id']}")
+    return _mutation_response(response, created)
+
+@router.patch("/load/{load_id}", dependencies=[Depends(get_api_key)])
+def update_load(load_id: str, response: Response, changes: dict = Body(...)):
+    """Change some fields of a load; null removes an optional field"""
+    try:
+        updated = get_load_repository().update(load_id, changes)
+    except LoadNotFoundError:
+        raise HTTPException(status_code=404, detail="Load not found")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid load: {e}")
+    logger.info(f"✏️ Updated load {load_id}: {sorted(changes)}")
+    return _mutation_response(response, updated)
+
+@router.delete("/load/{load_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(get_api_key)])
+def delete_load(load_id: str):
+    try:
+        get_load_repository().delete(load_id)
+    except LoadNotFoundError:
+        raise HTTPException(status_code=404, detail="Load not found")
+    logger.info(f"🗑️ Deleted load {load_id}")
+    return Response(status_code=status.HTTP_204_NO_CONTENT, headers={"ETag": get_load_repository().etag})
+
 @router.post("/search_loads", dependencies=[Depends(get_api_key)])
 async def search_loads(request: Request):
     """Search loads by equipment_type, origin, and destination from JSON body"""
@@ -58,12 +155,22 @@ async def search_loads(request: Request):
     equipment_type = body.get("equipment_type")
     origin = body.get("origin")
     destination = body.get("destination")
-    loads = get_loads_data()
-    results = loads
-    if equipment_type:
-        results = [l for l in results if l["equipment_type"].lower() == equipment_type.lower()]
-    if origin:
-        results = [l for l in results if origin.lower() in l["origin"].lower()]
-    if destination:
-        results = [l for l in results if destination.lower() in l["destination"].lower()]
-    return results
\ No newline at end of file
+    return _search_response(equipment_type, origin, destination, "search_loads", **parse_time_windows(body))
+
+TIME_WINDOW_KEYS = ("available_from", "available_to", "deliver_by")
+
+def parse_time_windows(body: dict) -> dict:
+    """Optional ISO 8601 time-window filters from a JSON body"""
+    windows = {}
+    for key in TIME_WINDOW_KEYS:
+        value = body.get(key)
+        if not value:
+            continue
+        try:
+            windows[key] = datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid {key}: expected an ISO 8601 date/time, got {value!r}"
+            )
+    return windows
@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from core.security import get_api_key
+from core.metrics import REGISTRY
+from core.profiler import ProfiledRoute
+from core.shared_store import exchange_metrics
+
+router = APIRouter(route_class=ProfiledRoute)
+
+# Prometheus text exposition format
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+@router.get("/metrics/prometheus", dependencies=[Depends(get_api_key)], response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Expose latency histograms and counters in Prometheus text format"""
+    return PlainTextResponse(REGISTRY.render(exchange_metrics(REGISTRY)), media_type=PROMETHEUS_CONTENT_TYPE)
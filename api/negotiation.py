@@ -1,13 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 from core.security import get_api_key
+from core.metrics import NEGOTIATION_ROUNDS, REGISTRY, WEBHOOK_LATENCY
+from core.profiler import ProfiledRoute
+from core.shared_store import append_line, exchange_metrics
+from core.sketch import summaries_by_label
+from services.carrier_history import TRUSTED_SOURCE
+from services.negotiation_stats import get_negotiation_stats
 import os
 import json
 import logging
+import numpy as np
 from pydantic import BaseModel
 from typing import Optional, List
 
 logger = logging.getLogger(__name__)
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
+
+NEGOTIATIONS_LOG = os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/negotiations.log'))
 
 class NegotiationRequest(BaseModel):
     load_id: str
@@ -25,20 +34,104 @@ class NegotiationResponse(BaseModel):
     final_rate: Optional[int] = None
     history: List[dict]
 
+def negotiate_rate(loadboard_rate: int, initial_offer: int, max_rounds: int = 3) -> dict:
+    """
+    Core negotiation loop shared by the /negotiate endpoint and CarrierAgent
+    
+    The broker starts at the loadboard rate and moves to the midpoint each
+    round; the deal closes once both offers are within $100.
+    """
+    counter = loadboard_rate
+    rounds = 0
+    accepted = False
+    negotiation_history = []
+    while rounds < max_rounds:
+        negotiation_history.append({
+            "round": rounds+1, 
+            "carrier_offer": initial_offer, 
+            "broker_offer": counter
+        })
+        
+        # Accept if close enough (within $100)
+        if abs(initial_offer - counter) <= 100:
+            accepted = True
+            break
+        
+        # Calculate counter offer - midpoint between current offers
+        counter = int((counter + initial_offer) / 2)
+        rounds += 1
+    return {
+        "accepted": accepted, 
+        "final_rate": counter if accepted else None, 
+        "history": negotiation_history
+    }
+
+def negotiate_rates(loadboard_rates, initial_offers, max_rounds: int = 3) -> dict:
+    """
+    ``negotiate_rate`` for many loads in one pass (array-likes, one entry per load)
+    
+    ``initial_offers`` may be a single offer for every load. Each round is a
+    vectorized step over the loads still negotiating; ``broker_offers[r, i]``
+    is load i's broker offer in round r + 1, of which the first
+    ``rounds[i]`` were made. Use ``negotiation_at`` for one load's result in
+    ``negotiate_rate``'s shape.
+    """
+    counters = np.array(loadboard_rates, dtype=np.int64)
+    offers = np.broadcast_to(np.asarray(initial_offers, dtype=np.int64), counters.shape)
+    accepted = np.zeros(counters.shape, dtype=bool)
+    active = np.ones(counters.shape, dtype=bool)
+    rounds = np.zeros(counters.shape, dtype=np.int64)
+    broker_offers = np.zeros((max_rounds,) + counters.shape, dtype=np.int64)
+    for r in range(max_rounds):
+        if not active.any():
+            break
+        broker_offers[r] = counters
+        rounds += active
+        # Accept if close enough (within $100)
+        close = active & (np.abs(offers - counters) <= 100)
+        accepted |= close
+        active &= ~close
+        # Midpoint counter offer for the rest (truncated like int())
+        counters = np.where(active, np.trunc((counters + offers) / 2).astype(np.int64), counters)
+    return {"accepted": accepted, "final_rates": counters, "rounds": rounds,
+            "broker_offers": broker_offers, "initial_offers": offers}
+
+def negotiation_at(result: dict, index: int) -> dict:
+    """Load ``index``'s outcome from ``negotiate_rates``, as ``negotiate_rate`` returns it"""
+    accepted = bool(result["accepted"][index])
+    offer = int(result["initial_offers"][index])
+    return {
+        "accepted": accepted,
+        "final_rate": int(result["final_rates"][index]) if accepted else None,
+        "history": [{"round": r + 1, "carrier_offer": offer, "broker_offer": int(result["broker_offers"][r, index])}
+                    for r in range(int(result["rounds"][index]))]
+    }
+
+def append_negotiation(data: dict):
+    """Append a record to the negotiation log as-is (in-process callers only)"""
+    # Locked append so concurrent workers never interleave partial lines
+    append_line(NEGOTIATIONS_LOG, json.dumps(data))
+
 @router.post("/log_negotiation", dependencies=[Depends(get_api_key)])
 def log_negotiation(data: dict):
-    with open(os.path.join(os.path.dirname(__file__), '../data/negotiations.log'), "a") as f:
-        f.write(json.dumps(data) + "\n")
+    # Posted records can't claim to come from the webhook: carrier history would
+    # trust their verified_at and let that MC skip FMCSA
+    if data.get("source") == TRUSTED_SOURCE:
+        data = {k: v for k, v in data.items() if k != "source"}
+    append_negotiation(data)
     return {"status": "logged"}
 
 @router.get("/metrics", dependencies=[Depends(get_api_key)])
 def get_metrics():
-    try:
-        with open(os.path.join(os.path.dirname(__file__), '../data/negotiations.log')) as f:
-            lines = f.readlines()
-        return {"negotiations": len(lines)}
-    except FileNotFoundError:
-        return {"negotiations": 0}
+    """Negotiation count plus p50/p90/p99 of rates, discounts, rounds and webhook latency"""
+    # Sketches are updated as the log grows and as calls finish; nothing is rescanned here
+    # Peers come from the exchange only; a concurrent /metrics/prometheus render may
+    # have filled _peer_totals with the same workers
+    latency = WEBHOOK_LATENCY.collect(include_peers=False, peer_exports=exchange_metrics(REGISTRY))
+    return {
+        **get_negotiation_stats().summary(),
+        "webhook_latency_seconds": summaries_by_label(latency, WEBHOOK_LATENCY.labelnames),
+    }
 
 @router.post("/negotiate", dependencies=[Depends(get_api_key)], response_model=NegotiationResponse)
 async def negotiate(request: Request):
@@ -88,49 +181,27 @@ async def negotiate(request: Request):
             detail="loadboard_rate, initial_offer, and max_rounds must be numeric values"
         )
 
-    # Implement negotiation logic
-    counter = loadboard_rate
-    rounds = 0
-    accepted = False
-    negotiation_history = []
-    
     logger.info(f"🤝 Starting negotiation for load {load_id}: initial offer={initial_offer}, loadboard rate={loadboard_rate}")
     
-    while rounds < max_rounds:
-        negotiation_history.append({
-            "round": rounds+1, 
-            "carrier_offer": initial_offer, 
-            "broker_offer": counter
-        })
-        
-        logger.info(f"🔄 Round {rounds+1}: carrier offered {initial_offer}, broker offered {counter}")
-        
-        # Accept if close enough (within $100)
-        if abs(initial_offer - counter) <= 100:
-            accepted = True
-            logger.info(f"✅ Negotiation accepted: final rate={counter}")
-            break
-        
-        # Calculate counter offer - midpoint between current offers
-        counter = int((counter + initial_offer) / 2)
-        rounds += 1
+    result = negotiate_rate(loadboard_rate, initial_offer, max_rounds)
+    accepted = result["accepted"]
+    negotiation_history = result["history"]
+    for entry in negotiation_history:
+        logger.info(f"🔄 Round {entry['round']}: carrier offered {entry['carrier_offer']}, broker offered {entry['broker_offer']}")
     
-    if not accepted:
+    if accepted:
+        logger.info(f"✅ Negotiation accepted: final rate={result['final_rate']}")
+    else:
         logger.info(f"❌ Negotiation failed after {max_rounds} rounds")
-    
-    result = {
-        "accepted": accepted, 
-        "final_rate": counter if accepted else None, 
-        "history": negotiation_history
-    }
+    NEGOTIATION_ROUNDS.observe(len(negotiation_history), "api", "accepted" if accepted else "rejected")
     
     # Automatically log successful negotiations
     if accepted:
         log_data = {
             "load_id": load_id,
             "initial_offer": body.get("initial_offer"),
-            "final_rate": counter,
-            "rounds": rounds + 1
+            "final_rate": result["final_rate"],
+            "rounds": len(negotiation_history)
         }
         log_negotiation(log_data)
     
@@ -1,13 +1,80 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Header, HTTPException, Response
 from agent import CarrierAgent
+from api.loads import parse_time_windows
+from core import memory
+from core.config import Config
+from core.idempotency import IdempotencyCache
+from core.metrics import WEBHOOK_LATENCY
+from core.profiler import ProfiledRoute
+from core.responses import FastJSONResponse
+from core.shared_store import get_shared_store
+from services.carrier_history import TRUSTED_SOURCE, get_carrier_history
+from services.negotiation_stats import equipment_of, lane_of
+from typing import Optional
+import hashlib
 import logging
 import json
+import threading
+import time
 
 logger = logging.getLogger(__name__)
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
+
+_idempotency = None
+_idempotency_lock = threading.Lock()
+
+def get_webhook_idempotency() -> IdempotencyCache:
+    global _idempotency
+    if _idempotency is None:
+        with _idempotency_lock:
+            if _idempotency is None:
+                _idempotency = IdempotencyCache(
+                    "webhook_idempotency", ttl=Config.IDEMPOTENCY_TTL_SECONDS,
+                    max_entries=Config.IDEMPOTENCY_MAX_ENTRIES, wait_timeout=Config.IDEMPOTENCY_WAIT_SECONDS,
+                    shared_store=get_shared_store())
+    return _idempotency
+
+memory.register("webhook_idempotency", lambda: _idempotency.memory_usage() if _idempotency is not None else None)
+
+def idempotency_key_for(payload: dict, header_key: Optional[str]) -> Optional[str]:
+    """The Idempotency-Key header, else a hash of the payload when it carries a call_id"""
+    if header_key:
+        return f"key:{header_key}"
+    if payload.get("call_id"):
+        canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+        return "call:" + hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    return None
 
 @router.post("/webhook/happyrobot")
-async def happyrobot_webhook(payload: dict):
+def happyrobot_webhook(payload: dict, response: Response, idempotency_key: Optional[str] = Header(None)):
+    # Plain def: verification, negotiation and logging block, so run in the threadpool
+    # instead of stalling the event loop for every other call
+    started = time.perf_counter()
+    key = idempotency_key_for(payload, idempotency_key)
+    headers = {}
+    replayed = False
+    if key is None:
+        result = process_call(payload)
+    else:
+        # Platform retries replay the first result instead of verifying, negotiating and logging again
+        result, replayed = get_webhook_idempotency().run(key, lambda: process_call(payload))
+        if replayed:
+            logger.info(f"♻️ Replaying result for retried webhook ({key[:16]})")
+            headers["Idempotent-Replayed"] = "true"
+    if not replayed:
+        load = result.get("load") or {}
+        # Labelled by the board's lane, not the caller's wording, to keep the label set bounded
+        lane = lane_of(load.get("origin"), load.get("destination")) if load else "none"
+        equipment = equipment_of(load.get("equipment_type")) if load else "none"
+        WEBHOOK_LATENCY.observe(time.perf_counter() - started, lane, equipment)
+    # The response echoes the full load; skip jsonable_encoder when FAST_JSON is on
+    if Config.FAST_JSON:
+        return FastJSONResponse(result, headers=headers)
+    response.headers.update(headers)
+    return result
+
+def process_call(payload: dict) -> dict:
+    """Verify the carrier, pick and hold a load, negotiate and log; returns the webhook result"""
     # Log the complete incoming payload for debugging
     logger.info(f"🚀 WEBHOOK Request Payload: {json.dumps(payload, indent=2)}")
     
@@ -31,9 +98,18 @@ async def happyrobot_webhook(payload: dict):
     initial_offer = payload.get("initial_offer")
     call_transcript = payload.get("call_transcript", "")
 
-    logger.info(f"🔍 Verifying MC number: {mc_number}")
-    mc_status = agent.verify_mc(mc_number)
-    logger.info(f"✅ MC Verification Result: {json.dumps(mc_status, indent=2)}")
+    # Repeat callers verified recently skip the FMCSA round trip
+    history = get_carrier_history().get(mc_number) if mc_number else None
+    now = time.time()
+    if history is not None and history.verified_within(Config.CARRIER_REVERIFY_HOURS * 3600, now):
+        verified_at = history.last_verified_at
+        mc_status = {"eligible": True, "mc_number": mc_number, "status": "recently_verified", "verified_at": verified_at}
+        logger.info(f"♻️ MC {mc_number} verified {int(now - verified_at)}s ago; skipping FMCSA lookup")
+    else:
+        logger.info(f"🔍 Verifying MC number: {mc_number}")
+        verified_at = now
+        mc_status = agent.verify_mc(mc_number)
+        logger.info(f"✅ MC Verification Result: {json.dumps(mc_status, indent=2)}")
     
     if not mc_status.get("eligible"):
         rejection_response = {"status": "rejected", "reason": "MC not eligible", "mc_details": mc_status}
@@ -41,23 +117,66 @@ async def happyrobot_webhook(payload: dict):
         return rejection_response
 
     logger.info(f"🚛 Searching loads: equipment={equipment_type}, origin={origin}, destination={destination}")
-    loads = agent.search_loads(equipment_type=equipment_type, origin=origin, destination=destination)
+    try:
+        windows = parse_time_windows(payload)
+    except HTTPException as e:
+        # Spoken dates don't always transcribe to ISO; search without the window rather than fail the call
+        logger.warning(f"⚠️ Ignoring time window: {e.detail}")
+        windows = {}
+    loads = agent.search_loads(equipment_type=equipment_type, origin=origin, destination=destination, **windows)
     if not loads:
         no_loads_response = {"status": "no_loads_found", "search_criteria": {"equipment_type": equipment_type, "origin": origin, "destination": destination}}
         logger.info(f"📭 WEBHOOK Result: {json.dumps(no_loads_response, indent=2)}")
         return no_loads_response
-    chosen_load = loads[0]
+    # Negotiate the top candidates at once so an offer that misses one load can still close another
+    candidates = loads[:Config.NEGOTIATION_CANDIDATES]
+    if initial_offer is None and history is not None:
+        # No offer on the call: open with what this carrier has accepted before, per load
+        seeded = [history.expected_rate(load["loadboard_rate"]) for load in candidates]
+        if any(offer is not None for offer in seeded):
+            # Loads history can't price (no board rate) aren't seeded: they get the caller's own offer
+            initial_offer = [initial_offer if offer is None else offer for offer in seeded]
+            logger.info(f"📈 Seeding offers from carrier history: {seeded}")
+    
+    logger.info(f"💰 Negotiating {len(candidates)} candidate loads with initial offer: {initial_offer}")
+    ranked = agent.negotiate_candidates(candidates, initial_offer)
+    
+    # Hold the best candidate no other call holds, so concurrent calls don't book it too
+    chosen_load, hold_token = agent.hold_load([load for load, _ in ranked], holder=mc_number)
+    if chosen_load is None:
+        no_loads_response = {"status": "no_loads_found", "search_criteria": {"equipment_type": equipment_type, "origin": origin, "destination": destination}}
+        logger.info(f"📭 WEBHOOK Result (all matches held by other calls): {json.dumps(no_loads_response, indent=2)}")
+        return no_loads_response
+    negotiation = next(result for load, result in ranked if load is chosen_load)
+    alternatives = [{
+        "load_id": load["load_id"],
+        "origin": load.get("origin"),
+        "destination": load.get("destination"),
+        "loadboard_rate": load["loadboard_rate"],
+        "accepted": result["accepted"],
+        "final_rate": result["final_rate"],
+        "rounds": len(result["history"])
+    } for load, result in ranked if load is not chosen_load]
     
     # Log the load that was selected
     logger.info(f"🚚 Selected load: {json.dumps(chosen_load, indent=2)}")
-    
-    # Handle negotiation
-    logger.info(f"💰 Starting negotiation with initial offer: {initial_offer}")
-    negotiation = agent.negotiate(chosen_load, initial_offer=initial_offer)
     logger.info(f"📝 Negotiation result: {json.dumps(negotiation, indent=2)}")
+
+    try:
+        outcome = agent.classify_outcome(negotiation)
+        sentiment = agent.classify_sentiment(call_transcript)
+    except Exception:
+        agent.release_load(chosen_load, hold_token)
+        raise
     
-    outcome = agent.classify_outcome(negotiation)
-    sentiment = agent.classify_sentiment(call_transcript)
+    # A closed deal books the load; otherwise it goes back on the board
+    if outcome == "Deal Closed":
+        booked = agent.confirm_load(chosen_load, hold_token)
+        if not booked:
+            logger.warning(f"⌛ Hold on load {chosen_load['load_id']} lapsed before the deal closed")
+    else:
+        booked = False
+        agent.release_load(chosen_load, hold_token)
     
     log_data = {
         "mc_number": mc_number,
@@ -67,14 +186,20 @@ async def happyrobot_webhook(payload: dict):
         "sentiment": sentiment,
         "equipment_type": equipment_type,
         "origin": origin,
-        "destination": destination
+        "destination": destination,
+        "loadboard_rate": chosen_load["loadboard_rate"],
+        "lane": lane_of(chosen_load.get("origin"), chosen_load.get("destination")),
+        "candidates": len(ranked),
+        "verified_at": verified_at,
+        # Lets carrier history trust verified_at (the public /log_negotiation strips it)
+        "source": TRUSTED_SOURCE
     }
     
     # Log the negotiation data for analytics
     logger.info(f"📊 Logging negotiation data: {json.dumps(log_data, indent=2)}")
     agent.log_negotiation(log_data)
     
-    transfer_to_sales_rep = outcome == "Deal Closed"
+    transfer_to_sales_rep = booked
     
     final_response = {
         "status": "processed",
@@ -82,7 +207,9 @@ async def happyrobot_webhook(payload: dict):
         "negotiation": negotiation,
         "outcome": outcome,
         "sentiment": sentiment,
-        "transfer_to_sales_rep": transfer_to_sales_rep
+        "transfer_to_sales_rep": transfer_to_sales_rep,
+        "alternatives": alternatives,
+        "carrier_history": history.to_dict() if history is not None else None
     }
     
     logger.info(f"🎉 WEBHOOK Final Result: {json.dumps(final_response, indent=2)}")
@@ -0,0 +1,10 @@
+# Benchmarks package init
+import os
+
+# Benchmarks import the app; give it a self-contained environment
+os.environ.setdefault("API_KEY", "bench-api-key")
+os.environ.setdefault("FMCSA_API_TOKEN", "bench-token")
+os.environ.setdefault("ENVIRONMENT", "testing")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+# The agent's fallback /verify_mc self-call hits a closed port instead of a real server
+os.environ.setdefault("API_URL", "http://127.0.0.1:9")
@@ -0,0 +1,28 @@
+"""
+Benchmark: negotiation loop (single load and top-5 candidates) and transcript sentiment classification
+"""
+from benchmarks.harness import measure
+
+SHORT_TRANSCRIPT = "Thanks, that rate works for me."
+LONG_TRANSCRIPT = " ".join([
+    "Hi, this is Mike from Blue Line Trucking calling about the Chicago to Dallas load.",
+    "I'm empty Thursday morning and the rate is a bit low for that lane, honestly it's terrible.",
+    "If you can meet me in the middle I'd be happy to take it, appreciate your help.",
+] * 10)
+
+
+def collect(quick: bool = False):
+    from agent import CarrierAgent, warm_sentiment
+    from api.negotiation import negotiate_rate
+    from benchmarks.harness import make_loads
+
+    warm_sentiment()
+    agent = CarrierAgent()
+    candidates = make_loads(5)
+    return {
+        "negotiate.accept_first_round": measure(lambda: negotiate_rate(2000, 2050, 3)),
+        "negotiate.max_rounds_fail": measure(lambda: negotiate_rate(2000, 3000, 3)),
+        "negotiate.top5_candidates": measure(lambda: agent.negotiate_candidates(candidates, 2000)),
+        "sentiment.short": measure(lambda: agent.classify_sentiment(SHORT_TRANSCRIPT)),
+        "sentiment.long": measure(lambda: agent.classify_sentiment(LONG_TRANSCRIPT)),
+    }
@@ -0,0 +1,62 @@
+"""
+Benchmark: per-request API key authentication overhead
+
+Measures keyring lookup (valid and invalid keys), the token-bucket check,
+and the full ``get_api_key`` dependency for a valid key. ``benchmarks.run``
+gates these against the baseline; ``run()`` also fails if a valid request's
+authentication stops costing microseconds.
+
+Usage: python -m benchmarks.bench_auth
+"""
+import json
+import time
+
+from core.rate_limit import TokenBucket
+from core.security import KeyRing, get_api_key, hash_api_key, keyring
+
+
+class _Request:
+    """Minimal stand-in for starlette's Request (only .state is used)"""
+    class state:
+        pass
+
+
+# Per-request budget for lookup plus rate-limit check
+BUDGET_US = 50
+
+
+def _per_call_us(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def run(iterations: int = 100_000):
+    ring = KeyRing()
+    for i in range(50):
+        ring.add(f"integration-{i}", hash_api_key(f"key-{i}"), 1e9, 1e9)
+    unbounded = TokenBucket(1e9, 1e9)
+    # Benchmark the real dependency with a key whose bucket never throttles
+    keyring.add("benchmark", hash_api_key("benchmark-key"), 1e9, 1e9)
+    request = _Request()
+
+    results = {
+        "lookup_valid_us": _per_call_us(lambda: ring.lookup("key-7"), iterations),
+        "lookup_invalid_us": _per_call_us(lambda: ring.lookup("not-a-key"), iterations),
+        "token_bucket_us": _per_call_us(unbounded.try_acquire, iterations),
+        "get_api_key_us": _per_call_us(lambda: get_api_key(request, "benchmark-key"), iterations),
+    }
+    over = {name: us for name, us in results.items() if us >= BUDGET_US}
+    if over:
+        raise RuntimeError(f"Authentication over the {BUDGET_US}µs budget: {over}")
+    return results
+
+
+def collect(quick: bool = False):
+    """Seconds per operation, for benchmarks.run"""
+    return {f"auth.{name[:-3]}": us / 1e6 for name, us in run(20_000 if quick else 100_000).items()}
+
+
+if __name__ == "__main__":
+    print(json.dumps({name: round(value, 3) for name, value in run().items()}, indent=2))
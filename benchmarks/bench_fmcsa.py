@@ -0,0 +1,26 @@
+"""
+Benchmark: FMCSAService.verify_mc_number cache hits and misses against the local stub
+"""
+from benchmarks.harness import measure
+
+
+def collect(quick: bool = False):
+    from services.fmcsa import FMCSAService
+    from tools.fmcsa_stub import start_stub
+
+    server, _, base_url = start_stub(latency="fixed:0")
+    try:
+        service = FMCSAService()
+        service.base_url = base_url
+        service.verify_mc_number("123456")
+
+        def miss():
+            service._cache.clear()
+            service.verify_mc_number("123456")
+
+        return {
+            "fmcsa.verify.cache_hit": measure(lambda: service.verify_mc_number("123456")),
+            "fmcsa.verify.cache_miss_stub": measure(miss, repeat=3),
+        }
+    finally:
+        server.shutdown()
@@ -0,0 +1,81 @@
+"""
+Benchmark: get_loads / search_loads filtering at 1k, 10k and 100k loads, and
+memory of the columnar LoadTable against the list-of-dicts LoadStore
+(``memory.*`` results are bytes, not seconds)
+"""
+import io
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from unittest.mock import patch
+
+from benchmarks.harness import make_loads, measure, retained_bytes
+
+
+@contextmanager
+def seeded_loads(loads):
+    """Serve a synthetic board instead of data/loads.json (bookings go to a throwaway WAL)"""
+    import api.loads
+    from services.load_repository import LoadRepository
+    from services.load_table import LoadTable
+    with tempfile.TemporaryDirectory() as tmp:
+        # No snapshot file yet, so the repository keeps the table it's given until it compacts
+        repository = LoadRepository(os.path.join(tmp, "loads.json"))
+        repository.table = LoadTable.from_records(loads)
+        originals = api.loads.get_loads_store, api.loads.get_load_repository
+        api.loads.get_loads_store = lambda: repository.table
+        api.loads.get_load_repository = lambda: repository
+        try:
+            yield
+        finally:
+            api.loads.get_loads_store, api.loads.get_load_repository = originals
+
+
+def collect(quick: bool = False):
+    from fastapi import Response
+    from fastapi.testclient import TestClient
+    from api import loads
+    from core.config import Config
+    from core.security import hash_api_key, keyring
+    from main import app
+
+    def get_loads(**filters):
+        # Called directly, so pass what FastAPI would inject
+        return loads.get_loads(Response(), if_none_match=None, **filters)
+
+    client = TestClient(app)
+    # Its own unthrottled key: the default key keeps the production rate limit
+    keyring.add("benchmark", hash_api_key("benchmark-key"), 1e9, 1e9)
+    headers = {"X-API-Key": "benchmark-key"}
+    body = {"equipment_type": "Reefer", "origin": "Chicago", "destination": "Dallas"}
+    results = {}
+    for n in ((1_000, 10_000) if quick else (1_000, 10_000, 100_000)):
+        with seeded_loads(make_loads(n)):
+            results[f"get_loads.equipment.{n}"] = measure(lambda: get_loads(equipment_type="Reefer"))
+            results[f"get_loads.lane.{n}"] = measure(
+                lambda: get_loads(equipment_type="Reefer", origin="Chicago", destination="Dallas"))
+            results[f"get_loads.pickup_window.{n}"] = measure(
+                lambda: get_loads(available_from=datetime(2025, 9, 10, 6), available_to=datetime(2025, 9, 10, 12)))
+            results[f"search_loads.http.{n}"] = measure(
+                lambda: client.post("/search_loads", json=body, headers=headers))
+            results[f"get_loads.http.equipment.{n}"] = measure(
+                lambda: client.get("/loads", params={"equipment_type": "Reefer"}, headers=headers))
+            with patch.object(Config, "FAST_JSON", True):
+                results[f"get_loads.http_fast_json.equipment.{n}"] = measure(
+                    lambda: client.get("/loads", params={"equipment_type": "Reefer"}, headers=headers))
+    results.update(collect_memory(quick))
+    return results
+
+
+def collect_memory(quick: bool = False):
+    from services.load_store import LoadStore, ingest
+    from services.load_table import LoadTable
+
+    results = {}
+    for n in ((10_000,) if quick else (10_000, 100_000)):
+        board = "\n".join(json.dumps(load) for load in make_loads(n))
+        results[f"memory.list_of_dicts.{n}"] = retained_bytes(lambda: ingest(io.StringIO(board), LoadStore()))
+        results[f"memory.load_table.{n}"] = retained_bytes(lambda: ingest(io.StringIO(board), LoadTable()))
+    return results
@@ -0,0 +1,35 @@
+"""
+Benchmark: /metrics over negotiation logs of 10k to 10M lines
+
+``get_metrics.N`` is a scrape once the log has been indexed (the steady
+state); ``negotiation_stats.build.N`` is the one streaming pass a fresh
+process makes over an existing log.
+"""
+import os
+import tempfile
+
+from benchmarks.harness import measure, write_negotiation_log
+
+
+def collect(quick: bool = False):
+    import services.negotiation_stats
+    from api.negotiation import get_metrics
+    from services.negotiation_stats import NegotiationStats
+
+    sizes = (10_000, 100_000) if quick else (10_000, 100_000, 1_000_000, 10_000_000)
+    results = {}
+    original = services.negotiation_stats._stats
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "negotiations.log")
+        try:
+            for lines in sizes:
+                write_negotiation_log(path, lines)
+                if lines <= 100_000:
+                    results[f"negotiation_stats.build.{lines}"] = measure(
+                        lambda: NegotiationStats(path).summary(), repeat=3, min_time=0.05)
+                services.negotiation_stats._stats = NegotiationStats(path)
+                get_metrics()
+                results[f"get_metrics.{lines}"] = measure(get_metrics, repeat=3, min_time=0.05)
+        finally:
+            services.negotiation_stats._stats = original
+    return results
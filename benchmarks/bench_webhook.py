@@ -0,0 +1,48 @@
+"""
+Benchmark: full /webhook/happyrobot round trips against the local FMCSA stub
+"""
+import os
+import tempfile
+
+from benchmarks.bench_loads import seeded_loads
+from benchmarks.harness import make_loads, measure
+
+PAYLOAD = {
+    "mc_number": "123456",
+    "equipment_type": "Reefer",
+    "origin": "Chicago",
+    "destination": "Dallas",
+    "initial_offer": 2100,
+    "call_transcript": "Thanks, that works for me.",
+}
+
+
+def collect(quick: bool = False):
+    from fastapi.testclient import TestClient
+    import api.negotiation
+    from main import app
+    from services.fmcsa import get_fmcsa_service
+    from tools.fmcsa_stub import start_stub
+
+    server, _, base_url = start_stub(latency="fixed:0")
+    service = get_fmcsa_service()
+    original_url, service.base_url = service.base_url, base_url
+    original_log = api.negotiation.NEGOTIATIONS_LOG
+    client = TestClient(app)
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            api.negotiation.NEGOTIATIONS_LOG = os.path.join(tmp, "negotiations.log")
+            with seeded_loads(make_loads(1_000)):
+                client.post("/webhook/happyrobot", json=PAYLOAD)
+                results["webhook.eligible_cached_mc"] = measure(
+                    lambda: client.post("/webhook/happyrobot", json=PAYLOAD), repeat=3)
+                rejected = {**PAYLOAD, "mc_number": "700007"}
+                results["webhook.rejected_cached_mc"] = measure(
+                    lambda: client.post("/webhook/happyrobot", json=rejected), repeat=3)
+    finally:
+        api.negotiation.NEGOTIATIONS_LOG = original_log
+        service.base_url = original_url
+        service._cache.clear()
+        server.shutdown()
+    return results
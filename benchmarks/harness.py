@@ -0,0 +1,110 @@
+"""
+Benchmark harness helpers: timing, synthetic datasets and baseline comparison
+"""
+import json
+import os
+import random
+import statistics
+import timeit
+import tracemalloc
+from typing import Callable, Dict, List
+
+EQUIPMENT = ["Dry Van", "Reefer", "Flatbed", "Step Deck", "Power Only"]
+CITIES = [
+    "Chicago, IL", "Dallas, TX", "Atlanta, GA", "Miami, FL", "Los Angeles, CA", "Phoenix, AZ",
+    "Denver, CO", "Seattle, WA", "St. Louis, MO", "Memphis, TN", "Houston, TX", "Newark, NJ",
+    "Columbus, OH", "Kansas City, MO", "Salt Lake City, UT", "Charlotte, NC",
+]
+COMMODITIES = ["Electronics", "Produce", "Steel", "Furniture", "Paper", "Beverages"]
+
+
+def measure(fn: Callable[[], object], repeat: int = 5, min_time: float = 0.2) -> float:
+    """Median seconds per call over ``repeat`` runs of an auto-ranged loop"""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    # autorange targets 0.2s; scale so each run lasts roughly min_time
+    number = max(1, int(number * min_time / 0.2))
+    return statistics.median(t / number for t in timer.repeat(repeat=repeat, number=number))
+
+
+def retained_bytes(build: Callable[[], object]) -> int:
+    """Bytes still allocated by ``build()``'s result once it returns"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        retained = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del result
+    return retained
+
+
+def make_loads(n: int, seed: int = 42) -> List[Dict]:
+    """Synthetic loads with the same shape as data/loads.json"""
+    rng = random.Random(seed)
+    loads = []
+    for i in range(n):
+        origin, destination = rng.sample(CITIES, 2)
+        day = rng.randint(1, 28)
+        loads.append({
+            "load_id": f"L{i:06d}",
+            "origin": origin,
+            "destination": destination,
+            "pickup_datetime": f"2025-09-{day:02d}T{rng.randint(6, 18):02d}:00:00",
+            "delivery_datetime": f"2025-10-{day:02d}T{rng.randint(6, 18):02d}:00:00",
+            "equipment_type": rng.choice(EQUIPMENT),
+            "loadboard_rate": rng.randint(800, 4000),
+            "notes": "Synthetic benchmark load",
+            "weight": rng.randint(5000, 45000),
+            "commodity_type": rng.choice(COMMODITIES),
+            "num_of_pieces": rng.randint(1, 40),
+            "miles": rng.randint(100, 2500),
+            "dimensions": "48x102x110",
+        })
+    return loads
+
+
+def write_negotiation_log(path: str, lines: int, seed: int = 42):
+    """Write ``lines`` webhook-style negotiation records (repeating a pre-built block)"""
+    rng = random.Random(seed)
+    block = []
+    for _ in range(min(lines, 10_000)):
+        accepted = rng.random() < 0.5
+        block.append(json.dumps({
+            "mc_number": str(rng.randint(100000, 999999)),
+            "load_id": f"L{rng.randint(0, 99999):06d}",
+            "accepted": accepted,
+            "final_rate": rng.randint(800, 4000) if accepted else None,
+            "history": [],
+            "outcome": "Deal Closed" if accepted else "No Deal",
+            "sentiment": rng.choice(["Positive", "Neutral", "Negative"]),
+            "equipment_type": rng.choice(EQUIPMENT),
+            "origin": rng.choice(CITIES),
+            "destination": rng.choice(CITIES),
+        }) + "\n")
+    chunk = "".join(block)
+    with open(path, "w") as f:
+        written = 0
+        while written + len(block) <= lines:
+            f.write(chunk)
+            written += len(block)
+        f.writelines(block[: lines - written])
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], threshold: float) -> List[Dict]:
+    """Benchmarks slower than baseline by more than ``threshold`` (fraction)"""
+    regressions = []
+    for name, seconds in sorted(results.items()):
+        base = baseline.get(name)
+        if base and seconds > base * (1 + threshold):
+            regressions.append({"benchmark": name, "baseline": base, "current": seconds,
+                                "change": round(seconds / base - 1, 3)})
+    return regressions
+
+
+def load_json(path: str) -> Dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,92 @@
+"""
+Benchmark suite runner
+
+Runs every hot-path benchmark, writes machine-readable results and compares
+them against a stored baseline. Exits non-zero if any benchmark regressed by
+more than the threshold.
+
+Usage:
+    python -m benchmarks.run --quick                      # compare against baseline
+    python -m benchmarks.run --only loads,fmcsa           # subset
+    python -m benchmarks.run --quick --update-baseline    # record a new baseline
+
+Baselines are machine-specific: record them on the hardware that gates releases.
+Regressions accepted on purpose keep their re-recorded value and a reason
+under ``accepted`` in the baseline file (left untouched by --update-baseline).
+"""
+import argparse
+import importlib
+import json
+import logging
+import os
+import platform
+import sys
+import time
+
+import benchmarks  # noqa: F401  (sets up the benchmark environment)
+from benchmarks.harness import compare, load_json
+
+SUITES = ["auth", "loads", "fmcsa", "agent", "metrics", "webhook"]
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def run_suites(names, quick: bool):
+    results = {}
+    for name in names:
+        module = importlib.import_module(f"benchmarks.bench_{name}")
+        started = time.perf_counter()
+        suite_results = module.collect(quick=quick)
+        results.update(suite_results)
+        print(f"  {name}: {len(suite_results)} benchmarks in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run hot-path benchmarks")
+    parser.add_argument("--quick", action="store_true", help="Smaller datasets (CI-friendly)")
+    parser.add_argument("--only", default=None, help=f"Comma-separated subset of: {', '.join(SUITES)}")
+    parser.add_argument("--output", default=None, help="Write results JSON here")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--update-baseline", action="store_true", help="Overwrite the baseline with these results")
+    args = parser.parse_args()
+
+    names = args.only.split(",") if args.only else SUITES
+    unknown = set(names) - set(SUITES)
+    if unknown:
+        parser.error(f"Unknown suites: {', '.join(sorted(unknown))}")
+
+    # Log formatting still runs; only handler output is suppressed
+    logging.disable(logging.INFO)
+    results = run_suites(names, args.quick)
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "quick": args.quick,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "results": {name: results[name] for name in sorted(results)},
+    }
+
+    if args.update_baseline:
+        baseline = load_json(args.baseline)
+        baseline.setdefault("results", {}).update(report["results"])
+        baseline["meta"] = report["meta"]
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+    else:
+        report["regressions"] = compare(results, load_json(args.baseline).get("results", {}), args.threshold)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if report.get("regressions"):
+        print(f"❌ {len(report['regressions'])} benchmark(s) regressed by more than {args.threshold:.0%}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
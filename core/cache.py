@@ -0,0 +1,70 @@
+"""
+Cache Module
+Bounded in-process LRU with the same dict-like interface as ``SharedCache``
+
+Entries past ``max_entries`` are evicted least recently used first (and
+counted), so a cache keyed by caller input can't grow without bound on a
+long-running worker. Expiry stays with the caller, which stores timestamps
+alongside values and drops stale entries on read.
+"""
+import threading
+from collections import OrderedDict
+
+from core.metrics import CACHE_EVICTIONS
+
+
+class BoundedCache:
+    """Thread-safe LRU mapping holding at most ``max_entries`` items"""
+
+    def __init__(self, name: str, max_entries: int):
+        self.name = name
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        try:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        except KeyError:
+            return default
+
+    def __getitem__(self, key):
+        # Reads skip the lock: OrderedDict's C methods are atomic under the GIL, and
+        # an entry evicted between the two calls is just a miss
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+        if evicted:
+            CACHE_EVICTIONS.inc(self.name, amount=evicted)
+
+    def __delitem__(self, key):
+        with self._lock:
+            del self._entries[key]
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._entries.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def items(self):
+        """Snapshot of the entries, oldest first"""
+        with self._lock:
+            return list(self._entries.items())
@@ -0,0 +1,169 @@
+"""
+Circuit Breaker Module
+Fail fast when an upstream is down, and size timeouts from its recent latency
+
+A breaker is CLOSED while calls succeed. ``failure_threshold`` consecutive
+failures (errors, timeouts or calls slower than ``latency_budget``) OPEN it,
+and every call is rejected immediately until ``reset_timeout`` has passed.
+The breaker then goes HALF_OPEN and lets a single probe through: success
+closes it, failure re-opens it for another ``reset_timeout``.
+
+Only breakers passed to ``register`` are reported by ``breaker_states`` and
+exported as gauges; extra instances (tests, benchmarks) stay private.
+"""
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from core.metrics import CIRCUIT_STATE, CIRCUIT_TRANSITIONS
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+# Numeric encoding for the circuit_breaker_state gauge
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class LatencyTracker:
+    """Sliding window of recent successful call latencies"""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Nearest-rank percentile (0 < q <= 1), or None with no samples"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, max(0, int(round(q * len(samples))) - 1))]
+
+
+class CircuitBreaker:
+    """Thread-safe three-state circuit breaker with an adaptive timeout"""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 latency_budget: Optional[float] = None, min_timeout: float = 0.5,
+                 max_timeout: float = 5.0, timeout_multiplier: float = 3.0, min_samples: int = 20):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.latency_budget = latency_budget
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_multiplier = timeout_multiplier
+        self.min_samples = min_samples
+        self.latencies = LatencyTracker()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+        self._registered = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _transition(self, state: str):
+        # Caller holds self._lock
+        if state == self._state:
+            return
+        self._state = state
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        if self._registered:
+            CIRCUIT_STATE.set(STATE_VALUES[state], self.name)
+            CIRCUIT_TRANSITIONS.inc(self.name, state)
+
+    def _maybe_half_open(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._transition(HALF_OPEN)
+            self._probe_in_flight = False
+
+    def allow_request(self) -> bool:
+        """Whether a call may go upstream now; in HALF_OPEN only one probe at a time"""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return True
+            # A probe that never reported back (caller crashed) doesn't block forever
+            if self._state == HALF_OPEN and (
+                    not self._probe_in_flight or time.monotonic() - self._probe_started > self.reset_timeout):
+                self._probe_in_flight = True
+                self._probe_started = time.monotonic()
+                return True
+            return False
+
+    def record_success(self, latency: float):
+        if self.latency_budget is not None and latency > self.latency_budget:
+            # Answers slower than the budget are as bad as no answer for callers
+            self.record_failure()
+            return
+        self.latencies.record(latency)
+        with self._lock:
+            self._failures = 0
+            self._probe_in_flight = False
+            self._transition(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            # Failures while already OPEN (calls admitted before it opened) don't extend the window
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._transition(OPEN)
+
+    def timeout(self) -> float:
+        """Per-attempt timeout: a multiple of recent p99 latency, clamped to [min, max]"""
+        if len(self.latencies) < self.min_samples:
+            return self.max_timeout
+        p99 = self.latencies.percentile(0.99)
+        return min(self.max_timeout, max(self.min_timeout, p99 * self.timeout_multiplier))
+
+    def retry_after(self) -> float:
+        """Seconds until an OPEN breaker will allow a probe"""
+        with self._lock:
+            if self._state != OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def to_dict(self) -> Dict:
+        p50, p99 = self.latencies.percentile(0.5), self.latencies.percentile(0.99)
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "retry_after_seconds": round(self.retry_after(), 3),
+            "timeout_seconds": round(self.timeout(), 3),
+            "latency_p50_seconds": round(p50, 4) if p50 is not None else None,
+            "latency_p99_seconds": round(p99, 4) if p99 is not None else None,
+        }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def register(breaker: CircuitBreaker) -> CircuitBreaker:
+    """Report ``breaker`` in health checks and metrics under its name (replacing any earlier one)"""
+    with breaker._lock:
+        breaker._registered = True
+        CIRCUIT_STATE.set(STATE_VALUES[breaker._state], breaker.name)
+    _breakers[breaker.name] = breaker
+    return breaker
+
+
+def breaker_states() -> Dict[str, Dict]:
+    """State of every registered breaker in this process, for health reporting"""
+    return {name: breaker.to_dict() for name, breaker in list(_breakers.items())}
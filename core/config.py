@@ -13,17 +13,84 @@ class Config:
     
     # API Configuration
     API_KEY = os.getenv("API_KEY")
+    # Extra per-integration keys: "name:sha256hex[:rate[:burst]],..." (see core/security.py)
+    API_KEYS = os.getenv("API_KEYS", "")
+    API_RATE_LIMIT = float(os.getenv("API_RATE_LIMIT", 50))  # requests/second per key
+    API_RATE_BURST = float(os.getenv("API_RATE_BURST", 100))
     API_URL = os.getenv("API_URL", "http://localhost:8000")
     PORT = int(os.getenv("PORT", 8000))
     
     # FMCSA Integration
     FMCSA_API_TOKEN = os.getenv("FMCSA_API_TOKEN")
-    FMCSA_BASE_URL = "https://mobile.fmcsa.dot.gov/qc/services/carriers"
+    # Overridable so load tests can point at tools/fmcsa_stub.py
+    FMCSA_BASE_URL = os.getenv("FMCSA_BASE_URL", "https://mobile.fmcsa.dot.gov/qc/services/carriers")
+    # Bulk verification fan-out
+    FMCSA_BULK_CONCURRENCY = int(os.getenv("FMCSA_BULK_CONCURRENCY", 8))
+    FMCSA_BULK_RATE_LIMIT = float(os.getenv("FMCSA_BULK_RATE_LIMIT", 10))  # calls/second
+    FMCSA_BULK_MAX_ITEMS = int(os.getenv("FMCSA_BULK_MAX_ITEMS", 10000))
+    # Upstream protection: total time budget per verification, circuit breaker, timeouts
+    FMCSA_DEADLINE_SECONDS = float(os.getenv("FMCSA_DEADLINE_SECONDS", 6))
+    FMCSA_BREAKER_FAILURES = int(os.getenv("FMCSA_BREAKER_FAILURES", 5))
+    FMCSA_BREAKER_RESET_SECONDS = float(os.getenv("FMCSA_BREAKER_RESET_SECONDS", 30))
+    FMCSA_LATENCY_BUDGET = float(os.getenv("FMCSA_LATENCY_BUDGET", 3))  # slower calls count as failures
+    FMCSA_TIMEOUT_MIN = float(os.getenv("FMCSA_TIMEOUT_MIN", 0.5))
+    FMCSA_TIMEOUT_MAX = float(os.getenv("FMCSA_TIMEOUT_MAX", 5))
+    # Per-worker verification/profile cache (single-worker mode); least recently used entries go first
+    FMCSA_CACHE_MAX_ENTRIES = int(os.getenv("FMCSA_CACHE_MAX_ENTRIES", 10000))
+    FMCSA_CACHE_TTL_SECONDS = float(os.getenv("FMCSA_CACHE_TTL_SECONDS", 300))
+    # Offline census snapshot (services/census.py); ignored if the file doesn't exist
+    CENSUS_SNAPSHOT_PATH = os.getenv(
+        "CENSUS_SNAPSHOT_PATH",
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "census.snapshot")
+    )
+    CENSUS_MAX_AGE_DAYS = float(os.getenv("CENSUS_MAX_AGE_DAYS", 7))
+    # Carriers verified within this window (per the negotiation log) aren't re-checked with FMCSA
+    CARRIER_REVERIFY_HOURS = float(os.getenv("CARRIER_REVERIFY_HOURS", 12))
+    
+    # Load board: JSON array or NDJSON, streamed into the in-memory store
+    LOADS_PATH = os.getenv(
+        "LOADS_PATH",
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "loads.json")
+    )
+    
+    # Load changes go to <LOADS_PATH>.wal and are folded back into the file every N changes
+    LOADS_COMPACT_EVERY = int(os.getenv("LOADS_COMPACT_EVERY", 1000))
+    # Opt-in: loads are deleted once their pickup time (server local time) is this far in the past.
+    # Off by default: the sample board's pickups are all in the past and would be wiped on startup
+    LOAD_EXPIRY_ENABLED = os.getenv("LOAD_EXPIRY_ENABLED", "false").lower() in ("1", "true", "yes")
+    LOAD_EXPIRY_GRACE_MINUTES = float(os.getenv("LOAD_EXPIRY_GRACE_MINUTES", 0))
+    # A load is held for one caller while negotiating; abandoned holds lapse after this
+    LOAD_HOLD_SECONDS = float(os.getenv("LOAD_HOLD_SECONDS", 120))
+    # The webhook negotiates this many of the best-matching loads and picks the best deal
+    NEGOTIATION_CANDIDATES = int(os.getenv("NEGOTIATION_CANDIDATES", 5))
+    # Webhook retries with the same Idempotency-Key (or payload + call_id) replay the first result
+    IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", 600))
+    IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", 10000))
+    IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", 30))
+    # Opt-in traffic capture for tools/replay.py: sampled, sanitized webhook and /search_loads requests
+    CAPTURE_PATH = os.getenv("CAPTURE_PATH", "")
+    CAPTURE_SAMPLE_RATE = float(os.getenv("CAPTURE_SAMPLE_RATE", 1.0))
+    CAPTURE_MAX_RECORDS = int(os.getenv("CAPTURE_MAX_RECORDS", 100000))
+    # Key for pseudonymizing MC numbers and call ids (defaults to API_KEY)
+    CAPTURE_SALT = os.getenv("CAPTURE_SALT", "")
+    # Opt-in: serve load lists and webhook results via core.responses.FastJSONResponse
+    FAST_JSON = os.getenv("FAST_JSON", "false").lower() in ("1", "true", "yes")
     
     # Application Settings
     ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
     
+    # Startup: "background" warms heavy dependencies after /health is up,
+    # "eager" warms them before serving, "lazy" loads them on first use only
+    STARTUP_MODE = os.getenv("STARTUP_MODE", "background").lower()
+    
+    # Multi-worker mode: caches and metrics are shared through a local SQLite store
+    WORKERS = int(os.getenv("WORKERS", 1))
+    SHARED_STATE_PATH = os.getenv(
+        "SHARED_STATE_PATH",
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "shared_state.db")
+    )
+    
     # Validation
     @classmethod
     def validate(cls):
@@ -46,6 +113,11 @@ class Config:
         """Check if running in production environment"""
         return cls.ENVIRONMENT.lower() == "production"
     
+    @classmethod
+    def is_multi_worker(cls):
+        """Check if the API runs as several uvicorn worker processes"""
+        return cls.WORKERS > 1
+    
     @classmethod
     def is_development(cls):
         """Check if running in development environment"""
@@ -0,0 +1,151 @@
+"""
+Idempotency Module
+Replay completed responses for retried requests instead of re-running them
+
+A request carrying an idempotency key runs once. The response is kept for
+``ttl`` seconds in a bounded LRU, and retries with the same key get that
+response back. A retry that arrives while the original is still running
+waits for it (up to ``wait_timeout``) instead of starting a second run.
+Failed runs are not cached, so the next retry runs again.
+
+With several workers a retry can land on a different process, so completed
+responses are also written to the SharedStore; in-flight waiting is per
+worker. SQLite reads and writes happen outside the cache lock (the in-flight
+entry already keeps a key's local retries waiting), so keyed requests never
+queue behind each other's disk I/O.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from core.memory import deep_sizeof
+from core.metrics import CACHE_REQUESTS
+from core.shared_store import SharedStore
+
+# How often completed runs past their TTL are deleted from the SharedStore
+SHARED_PRUNE_SECONDS = 60.0
+
+
+class _InFlight:
+    __slots__ = ("done", "result", "ok")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.ok = False
+
+
+class IdempotencyCache:
+    """Completed results by key (LRU + TTL), plus the runs still in progress"""
+
+    def __init__(self, name: str, ttl: float = 600.0, max_entries: int = 10_000, wait_timeout: float = 30.0,
+                 shared_store: Optional[SharedStore] = None):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.wait_timeout = wait_timeout
+        self.shared_store = shared_store
+        self._completed = OrderedDict()  # key -> (result, expires_at)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._next_prune = 0.0
+
+    def __len__(self) -> int:
+        return len(self._completed)
+
+    def memory_usage(self) -> Dict:
+        """Completed responses held in this worker, and runs in progress"""
+        with self._lock:
+            completed = list(self._completed.values())
+            in_flight = len(self._in_flight)
+        return {"entries": len(completed), "max_entries": self.max_entries, "in_flight": in_flight,
+                "bytes": deep_sizeof(completed)}
+
+    def _lookup(self, key: str, now: float):
+        # Caller holds self._lock
+        entry = self._completed.get(key)
+        if entry is not None:
+            if entry[1] > now:
+                self._completed.move_to_end(key)
+                return entry
+            del self._completed[key]
+        return None
+
+    def _remember(self, key: str, entry: Tuple):
+        # Caller holds self._lock
+        self._completed[key] = entry
+        while len(self._completed) > self.max_entries:
+            self._completed.popitem(last=False)
+
+    def _shared_lookup(self, key: str, now: float):
+        # Called without self._lock: the caller owns the in-flight entry for this key
+        if self.shared_store is None:
+            return None
+        entry = self.shared_store.cache_get(self.name, key)
+        if entry is not None and entry[1] > now:
+            return tuple(entry)
+        return None
+
+    def _publish(self, key: str, entry: Tuple, now: float):
+        """Write a completed result for other workers (outside self._lock; disk I/O)"""
+        if self.shared_store is None:
+            return
+        self.shared_store.cache_set(self.name, key, list(entry))
+        # A full scan of the namespace, so only now and then
+        if now >= self._next_prune:
+            self._next_prune = now + SHARED_PRUNE_SECONDS
+            self.shared_store.cache_prune_expired(self.name, now)
+
+    def _finish(self, key: str, in_flight: _InFlight, entry: Optional[Tuple]):
+        """Record a result (if any) and wake the callers waiting on this key"""
+        if entry is not None:
+            in_flight.result, in_flight.ok = entry[0], True
+        with self._lock:
+            if entry is not None:
+                self._remember(key, entry)
+            self._in_flight.pop(key, None)
+        in_flight.done.set()
+
+    def run(self, key: str, compute: Callable[[], object]) -> Tuple[object, bool]:
+        """``compute()`` once per key; returns (result, replayed)"""
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            with self._lock:
+                entry = self._lookup(key, time.time())
+                if entry is not None:
+                    CACHE_REQUESTS.inc(self.name, "hit")
+                    return entry[0], True
+                in_flight = self._in_flight.get(key)
+                if in_flight is None:
+                    in_flight = self._in_flight[key] = _InFlight()
+                    break
+            # Someone else is computing this key: wait for their result
+            CACHE_REQUESTS.inc(self.name, "in_flight")
+            if not in_flight.done.wait(max(deadline - time.monotonic(), 0)):
+                # The original is stuck; don't hold the retry hostage
+                return compute(), False
+            if in_flight.ok:
+                return in_flight.result, True
+            # The original failed: loop round and take over
+
+        # We own the key, so local retries wait on in_flight while we check other workers' results
+        try:
+            entry = self._shared_lookup(key, time.time())
+        except BaseException:
+            self._finish(key, in_flight, None)
+            raise
+        if entry is not None:
+            self._finish(key, in_flight, entry)
+            CACHE_REQUESTS.inc(self.name, "hit")
+            return entry[0], True
+
+        CACHE_REQUESTS.inc(self.name, "miss")
+        entry = None
+        try:
+            result = compute()
+            entry = (result, time.time() + self.ttl)
+        finally:
+            self._finish(key, in_flight, entry)
+        self._publish(key, entry, time.time())
+        return result, False
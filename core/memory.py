@@ -0,0 +1,244 @@
+"""
+Memory Module
+Per-subsystem memory accounting and on-demand tracemalloc snapshots
+
+Subsystems that hold state for the life of a worker (caches, the load
+table, log-tail indexes) register a reporter returning entry counts and an
+estimate of the bytes they keep reachable. Sizes come from ``deep_sizeof``,
+which walks containers and object attributes once and samples large
+containers instead of visiting every item, so a report stays cheap enough
+to poll during a soak test. Reporters never construct a subsystem; one
+that hasn't been used yet reports ``None``.
+
+Allocation tracing is off until the first snapshot is taken, since
+tracemalloc slows every allocation. Snapshots are kept in a small bounded
+store and can be compared pairwise to see which lines grew.
+"""
+import gc
+import itertools
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import types
+import uuid
+from collections import OrderedDict, deque
+from typing import Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Items walked per container before extrapolating
+SAMPLE_ITEMS = 1000
+DEFAULT_FRAMES = 1
+MAX_FRAMES = 25
+MAX_STORED_SNAPSHOTS = 10
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Shared, not owned: never walked into
+_OPAQUE = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType,
+           types.CodeType, types.FrameType, threading.Thread)
+_ATOMIC = (str, bytes, bytearray, int, float, complex, bool, type(None), memoryview, range)
+
+
+def deep_sizeof(obj, sample: int = SAMPLE_ITEMS) -> int:
+    """Approximate bytes reachable from ``obj``; objects shared within it are counted once
+
+    Containers with more than ``sample`` items are estimated from their first
+    ``sample`` items. NumPy arrays count their data buffer (``sys.getsizeof``
+    includes it for arrays that own their data).
+    """
+    return _sizeof(obj, set(), sample)
+
+
+def _sizeof(o, seen: set, sample: int) -> int:
+    # A module-level function, not a closure: a recursive closure is a reference
+    # cycle that would keep ``seen`` alive until the next GC pass
+    if id(o) in seen or isinstance(o, _OPAQUE):
+        return 0
+    seen.add(id(o))
+    total = sys.getsizeof(o, 0)
+    if isinstance(o, _ATOMIC):
+        return total
+    if isinstance(o, dict):
+        children, length = itertools.chain.from_iterable(o.items()), 2 * len(o)
+    elif isinstance(o, (list, tuple, set, frozenset, deque)):
+        children, length = o, len(o)
+    else:
+        children = []
+        if hasattr(o, "__dict__"):
+            children.append(o.__dict__)
+        for cls in type(o).__mro__:
+            for name in getattr(cls, "__slots__", ()):
+                if hasattr(o, name):
+                    children.append(getattr(o, name))
+        length = len(children)
+    try:
+        # Copy what's walked: other threads may be mutating the container
+        walked = list(itertools.islice(children, sample))
+    except RuntimeError:
+        return total
+    child_bytes = sum(_sizeof(child, seen, sample) for child in walked)
+    if walked and length > len(walked):
+        child_bytes = child_bytes * length // len(walked)
+    return total + child_bytes
+
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size of this process, where the platform exposes it"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss_bytes() -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+_reporters: "OrderedDict[str, Callable[[], Optional[Dict]]]" = OrderedDict()
+
+
+def register(name: str, reporter: Callable[[], Optional[Dict]]):
+    """Register a subsystem reporter; it returns a dict of counts/bytes, or None if not in use"""
+    _reporters[name] = reporter
+
+
+def process_stats() -> Dict:
+    stats = {
+        "pid": os.getpid(),
+        "rss_bytes": rss_bytes(),
+        "peak_rss_bytes": peak_rss_bytes(),
+        "threads": threading.active_count(),
+        "gc_counts": gc.get_count(),
+        "gc_uncollectable": len(gc.garbage),
+    }
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        stats["traced_bytes"], stats["traced_peak_bytes"] = current, peak
+    return stats
+
+
+def report() -> Dict:
+    """Process stats plus every registered subsystem's footprint"""
+    subsystems = {}
+    for name, reporter in _reporters.items():
+        started = time.perf_counter()
+        try:
+            usage = reporter()
+        except Exception as e:
+            logger.warning(f"Memory reporter {name} failed: {e}")
+            usage = {"error": str(e)}
+        if usage is not None:
+            usage["report_seconds"] = round(time.perf_counter() - started, 4)
+        subsystems[name] = usage
+    return {"process": process_stats(), "subsystems": subsystems}
+
+
+def _location(frame) -> str:
+    filename = frame.filename
+    if filename.startswith(REPO_DIR + os.sep):
+        filename = os.path.relpath(filename, REPO_DIR)
+    return f"{filename}:{frame.lineno}"
+
+
+def _stat_dict(stat) -> Dict:
+    entry = {
+        "location": _location(stat.traceback[0]),
+        "size_bytes": stat.size,
+        "count": stat.count,
+    }
+    if len(stat.traceback) > 1:
+        entry["traceback"] = [_location(frame) for frame in stat.traceback]
+    if isinstance(stat, tracemalloc.StatisticDiff):
+        entry["size_diff_bytes"] = stat.size_diff
+        entry["count_diff"] = stat.count_diff
+    return entry
+
+
+class SnapshotStore:
+    """Bounded store of tracemalloc snapshots, retrievable by id"""
+
+    def __init__(self, max_snapshots: int = MAX_STORED_SNAPSHOTS):
+        self.max_snapshots = max_snapshots
+        self._snapshots = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, frames: int = DEFAULT_FRAMES, label: str = "") -> Dict:
+        """Start tracing if needed and snapshot what's been traced so far"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            logger.info(f"tracemalloc started with {frames} frame(s) per allocation")
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+        snapshot_id = uuid.uuid4().hex[:12]
+        meta = {
+            "snapshot_id": snapshot_id,
+            "label": label,
+            "taken_at": time.time(),
+            "frames": tracemalloc.get_traceback_limit(),
+            "traced_bytes": sum(trace.size for trace in snapshot.traces),
+            "rss_bytes": rss_bytes(),
+        }
+        with self._lock:
+            self._snapshots[snapshot_id] = (meta, snapshot)
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        return meta
+
+    def get(self, snapshot_id: str):
+        with self._lock:
+            return self._snapshots.get(snapshot_id)
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            return [meta for meta, _ in self._snapshots.values()]
+
+    def top(self, snapshot_id: str, group_by: str = "lineno", limit: int = 25) -> Optional[Dict]:
+        """Largest allocation sites in one snapshot"""
+        entry = self.get(snapshot_id)
+        if entry is None:
+            return None
+        meta, snapshot = entry
+        stats = snapshot.statistics(group_by)
+        return {**meta, "group_by": group_by, "top": [_stat_dict(stat) for stat in stats[:limit]]}
+
+    def diff(self, first_id: str, second_id: str, group_by: str = "lineno", limit: int = 25) -> Optional[Dict]:
+        """Allocation sites ranked by growth from ``first_id`` to ``second_id``"""
+        first, second = self.get(first_id), self.get(second_id)
+        if first is None or second is None:
+            return None
+        stats = second[1].compare_to(first[1], group_by)
+        return {
+            "from": first[0],
+            "to": second[0],
+            "group_by": group_by,
+            "size_diff_bytes": sum(stat.size_diff for stat in stats),
+            "top": [_stat_dict(stat) for stat in stats[:limit]],
+        }
+
+    def clear(self):
+        """Drop every snapshot and stop tracing"""
+        with self._lock:
+            self._snapshots.clear()
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+snapshots = SnapshotStore()
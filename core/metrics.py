@@ -0,0 +1,388 @@
+"""
+Metrics Module
+Prometheus-style instrumentation for HappyRobot Inbound Carrier API
+
+Recording is lock-light: every thread writes into its own shard, so
+``inc``/``observe`` never contend on a shared lock. Shards are merged only
+when the metrics endpoint is scraped. Quantile sketches are the exception:
+they are observed once per webhook call and take a plain lock. In multi-worker mode each worker
+publishes ``REGISTRY.export()`` to the shared store and the scraping worker
+merges its peers' totals into the rendered output.
+"""
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+from core import memory
+from core.sketch import DEFAULT_QUANTILES, QuantileSketch
+
+# Latency buckets in seconds (Prometheus client defaults)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Buckets for small counts such as search matches or negotiation rounds
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100, 250, 1000)
+
+
+def _format_labels(labelnames: Tuple[str, ...], labelvalues: Tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float):
+        if value == float("inf"):
+            return "+Inf"
+        return repr(value)
+    return str(value)
+
+
+class _Metric:
+    """Base class holding per-thread shards of label tuple -> value"""
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+        # Totals published by other workers, only set during a merged render
+        self._peer_totals = []
+
+    def _shard(self) -> Dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = {}
+            # Only taken once per thread, never on the recording hot path
+            with self._shards_lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def _snapshots(self, include_peers: bool = True):
+        with self._shards_lock:
+            shards = list(self._shards)
+        # dict.copy() is atomic under the GIL, so a writer can't break iteration
+        snapshots = [shard.copy() for shard in shards]
+        if include_peers:
+            snapshots.extend(self._peer_totals)
+        return snapshots
+
+    def export(self):
+        """JSON-serializable local totals for merging across workers (None if not mergeable)"""
+        return None
+
+    def reset(self):
+        """Clear all recorded values (used by tests)"""
+        for shard in list(self._shards):
+            shard.clear()
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._render_samples())
+        return "\n".join(lines)
+
+    def _render_samples(self):
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter"""
+    kind = "counter"
+
+    def inc(self, *labelvalues, amount=1):
+        shard = self._shard()
+        shard[labelvalues] = shard.get(labelvalues, 0) + amount
+
+    def collect(self, include_peers: bool = True) -> Dict[Tuple, float]:
+        totals = {}
+        for snapshot in self._snapshots(include_peers):
+            for labels, value in snapshot.items():
+                totals[labels] = totals.get(labels, 0) + value
+        return totals
+
+    def export(self):
+        return [[list(labels), value] for labels, value in self.collect(include_peers=False).items()]
+
+    def value(self, *labelvalues) -> float:
+        return self.collect().get(labelvalues, 0)
+
+    def _render_samples(self):
+        for labels, value in sorted(self.collect().items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    """Cumulative bucket histogram"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labelvalues):
+        shard = self._shard()
+        row = shard.get(labelvalues)
+        if row is None:
+            # Bucket counts, then +Inf, then sum
+            row = shard[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+        row[bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    def _merged_rows(self, include_peers: bool = True) -> Dict[Tuple, list]:
+        merged = {}
+        for snapshot in self._snapshots(include_peers):
+            for labels, row in snapshot.items():
+                row = list(row)
+                if labels in merged:
+                    merged[labels] = [a + b for a, b in zip(merged[labels], row)]
+                else:
+                    merged[labels] = row
+        return merged
+
+    def export(self):
+        return [[list(labels), row] for labels, row in self._merged_rows(include_peers=False).items()]
+
+    def collect(self) -> Dict[Tuple, Dict]:
+        results = {}
+        for labels, row in self._merged_rows().items():
+            cumulative, running = [], 0
+            for count in row[:-1]:
+                running += count
+                cumulative.append(running)
+            results[labels] = {"buckets": cumulative, "count": running, "sum": row[-1]}
+        return results
+
+    def _render_samples(self):
+        bounds = [_format_value(float(b)) for b in self.buckets] + ["+Inf"]
+        for labels, data in sorted(self.collect().items()):
+            for bound, count in zip(bounds, data["buckets"]):
+                le = 'le="' + bound + '"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {count}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(float(data['sum']))}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {data['count']}"
+
+
+class Gauge(_Metric):
+    """Point-in-time value computed by a callback at scrape time"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 callback: Optional[Callable[[], Dict[Tuple, float]]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._callback = callback
+        self._values = {}
+
+    def set(self, value, *labelvalues):
+        self._values[labelvalues] = value
+
+    def collect(self) -> Dict[Tuple, float]:
+        values = dict(self._values)
+        if self._callback is not None:
+            try:
+                values.update(self._callback())
+            except Exception:
+                pass
+        return values
+
+    def _render_samples(self):
+        for labels, value in sorted(self.collect().items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Sketch(_Metric):
+    """Streaming quantiles per label set (see core/sketch.py), rendered as a summary"""
+    kind = "summary"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 quantiles: Sequence[float] = DEFAULT_QUANTILES, relative_accuracy: float = 0.01):
+        super().__init__(name, documentation, labelnames)
+        self.quantiles = tuple(quantiles)
+        self.relative_accuracy = relative_accuracy
+        # Observed once per call, not per row or per request, so a plain lock (and one
+        # sketch per label set rather than per thread) is cheap enough
+        self._sketches: Dict[Tuple, QuantileSketch] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        with self._lock:
+            sketch = self._sketches.get(labelvalues)
+            if sketch is None:
+                sketch = self._sketches[labelvalues] = QuantileSketch(self.relative_accuracy)
+            sketch.add(value)
+
+    def export(self):
+        with self._lock:
+            return [[list(labels), sketch.to_dict()] for labels, sketch in self._sketches.items()]
+
+    def collect(self, include_peers: bool = True, peer_exports=()) -> Dict[Tuple, QuantileSketch]:
+        """Merged sketches by label set; ``peer_exports`` are registry exports from other workers"""
+        with self._lock:
+            merged = {labels: sketch.copy() for labels, sketch in self._sketches.items()}
+        peers = list(self._peer_totals) if include_peers else []
+        peers.extend({tuple(labels): data for labels, data in export.get(self.name, [])} for export in peer_exports)
+        for totals in peers:
+            for labels, data in totals.items():
+                sketch = QuantileSketch.from_dict(data)
+                if labels in merged:
+                    merged[labels].merge(sketch)
+                else:
+                    merged[labels] = sketch
+        return merged
+
+    def reset(self):
+        with self._lock:
+            self._sketches.clear()
+
+    def _render_samples(self):
+        for labels, sketch in sorted(self.collect().items()):
+            for q in self.quantiles:
+                quantile = 'quantile="' + f"{q:g}" + '"'
+                value = _format_value(float(sketch.quantile(q)))
+                yield f"{self.name}{_format_labels(self.labelnames, labels, quantile)} {value}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(float(sketch.sum))}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {sketch.count}"
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together in the text exposition format"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._render_lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, labelnames=(), callback=None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, callback))
+
+    def sketch(self, name, documentation, labelnames=(), quantiles=DEFAULT_QUANTILES) -> Sketch:
+        return self.register(Sketch(name, documentation, labelnames, quantiles))
+
+    def get(self, name) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def memory_usage(self) -> Dict:
+        """Label sets and per-thread shards held by this worker's metrics"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            "metrics": len(metrics),
+            "shards": sum(len(metric._shards) for metric in metrics),
+            "bytes": memory.deep_sizeof(metrics),
+        }
+
+    def export(self) -> Dict:
+        """Local totals of every mergeable metric, for publishing to other workers"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        exported = {}
+        for metric in metrics:
+            samples = metric.export()
+            if samples is not None:
+                exported[metric.name] = samples
+        return exported
+
+    def render(self, peer_exports=()) -> str:
+        """Render all metrics, merging in counters/histograms/sketches exported by peer workers"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        with self._render_lock:
+            for metric in metrics:
+                metric._peer_totals = [
+                    {tuple(labels): value for labels, value in export.get(metric.name, [])}
+                    for export in peer_exports
+                ]
+            try:
+                return "\n".join(metric.render() for metric in metrics) + "\n"
+            finally:
+                for metric in metrics:
+                    metric._peer_totals = []
+
+
+REGISTRY = MetricsRegistry()
+memory.register("metrics", REGISTRY.memory_usage)
+
+
+def _resident_memory():
+    rss = memory.rss_bytes()
+    return {(): rss} if rss is not None else {}
+
+
+# Process
+PROCESS_RESIDENT_MEMORY = REGISTRY.gauge(
+    "process_resident_memory_bytes", "Resident set size of the worker answering the scrape",
+    callback=_resident_memory)
+
+# HTTP layer
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route and status",
+    ("method", "route", "status"))
+TRAFFIC_CAPTURE_RECORDS = REGISTRY.counter(
+    "traffic_capture_records_total", "Requests offered to the traffic capture by result", ("result",))
+
+# FMCSA upstream
+FMCSA_REQUEST_DURATION = REGISTRY.histogram(
+    "fmcsa_request_duration_seconds", "FMCSA API call latency by outcome", ("outcome",))
+FMCSA_RETRIES = REGISTRY.counter(
+    "fmcsa_retries_total", "FMCSA API retries by reason", ("reason",))
+FMCSA_FALLBACKS = REGISTRY.counter(
+    "fmcsa_fallbacks_total", "Verifications answered by a fallback", ("reason",))
+CIRCUIT_STATE = REGISTRY.gauge(
+    "circuit_breaker_state", "Circuit breaker state (0=closed, 1=half-open, 2=open)", ("breaker",))
+CIRCUIT_TRANSITIONS = REGISTRY.counter(
+    "circuit_breaker_transitions_total", "Circuit breaker state changes", ("breaker", "state"))
+CIRCUIT_REJECTIONS = REGISTRY.counter(
+    "circuit_breaker_rejections_total", "Calls short-circuited by an open breaker", ("breaker",))
+CACHE_REQUESTS = REGISTRY.counter(
+    "cache_requests_total", "Cache lookups by cache and result", ("cache", "result"))
+CACHE_EVICTIONS = REGISTRY.counter(
+    "cache_evictions_total", "Entries evicted from bounded caches to stay under their size limit", ("cache",))
+
+
+def _cache_hit_ratios():
+    totals = {}
+    for (cache, result), value in CACHE_REQUESTS.collect().items():
+        hits, lookups = totals.get(cache, (0, 0))
+        totals[cache] = (hits + (value if result == "hit" else 0), lookups + value)
+    return {(cache,): hits / lookups for cache, (hits, lookups) in totals.items() if lookups}
+
+
+CACHE_HIT_RATIO = REGISTRY.gauge(
+    "cache_hit_ratio", "Fraction of cache lookups served from cache", ("cache",),
+    callback=_cache_hit_ratios)
+
+# Business level
+LOAD_SEARCH_MATCHES = REGISTRY.histogram(
+    "load_search_matches", "Number of loads matched per search", ("endpoint",),
+    buckets=COUNT_BUCKETS)
+LOADS_EXPIRED = REGISTRY.counter(
+    "loads_expired_total", "Loads removed from the board after their pickup time passed")
+LOAD_RESERVATIONS = REGISTRY.counter(
+    "load_reservations_total", "Load hold attempts and their outcomes", ("result",))
+WEBHOOK_LATENCY = REGISTRY.sketch(
+    "webhook_latency_seconds", "Webhook processing time by the chosen load's lane and equipment",
+    ("lane", "equipment_type"))
+NEGOTIATION_ROUNDS = REGISTRY.histogram(
+    "negotiation_rounds", "Negotiation rounds per negotiation by outcome", ("source", "outcome"),
+    buckets=COUNT_BUCKETS)
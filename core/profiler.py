@@ -0,0 +1,198 @@
+"""
+Profiler Module
+In-process sampling profiler for hot-path analysis in production
+
+The sampler walks ``sys._current_frames()`` from a background thread at a
+fixed interval and aggregates identical stacks. Nothing runs while no
+profile is active, so idle overhead is zero.
+
+A per-request profile samples only the threads handling that request: the
+event loop thread that runs the middleware, plus whichever threadpool
+thread runs a sync endpoint (routes built with ``ProfiledRoute`` register
+it through a context variable). Per-request and whole-process sessions
+share one lock, so they never overlap.
+"""
+import contextvars
+import functools
+import inspect
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional
+
+from fastapi.routing import APIRoute
+
+from core import memory
+
+DEFAULT_INTERVAL = 0.005  # 5ms between samples
+MAX_DURATION = 60  # seconds
+MAX_STORED_PROFILES = 20
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Collects folded stacks from the given threads, or from every thread except its own"""
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL, thread_ids: Optional[Iterable[int]] = None):
+        self.interval = interval
+        # None samples the whole process; a set can grow while the profile runs
+        self.thread_ids = set(thread_ids) if thread_ids is not None else None
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.time() - self.started_at if self.started_at else 0.0
+        return self
+
+    def add_thread(self, thread_id: int):
+        if self.thread_ids is not None:
+            self.thread_ids.add(thread_id)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.is_set():
+            frames = sys._current_frames()
+            if self.thread_ids is not None:
+                frames = {thread_id: frames[thread_id] for thread_id in list(self.thread_ids) if thread_id in frames}
+            for thread_id, frame in frames.items():
+                if thread_id == own_id:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                # Root first, as expected by flamegraph tooling
+                self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+            self._stop.wait(self.interval)
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's folded format, ready for flamegraph.pl or speedscope"""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+    def to_dict(self) -> Dict:
+        return {
+            "samples": self.samples,
+            "interval_ms": self.interval * 1000,
+            "duration_seconds": round(self.duration, 3),
+            "stacks": dict(self.stacks.most_common()),
+        }
+
+
+# Only one whole-process profile at a time; concurrent samplers skew each other
+_session_lock = threading.Lock()
+
+
+def profile_for(seconds: float, interval: float = DEFAULT_INTERVAL) -> Optional[SamplingProfiler]:
+    """Run a sampling profile for ``seconds``; returns None if one is already running"""
+    if not _session_lock.acquire(blocking=False):
+        return None
+    try:
+        profiler = SamplingProfiler(interval).start()
+        time.sleep(min(max(seconds, 0), MAX_DURATION))
+        return profiler.stop()
+    finally:
+        _session_lock.release()
+
+
+# Profiler for the request being handled in this context, if it asked for one
+_request_profiler: contextvars.ContextVar = contextvars.ContextVar("request_profiler", default=None)
+
+
+@contextmanager
+def profile_request(interval: float = DEFAULT_INTERVAL):
+    """Profile the threads handling the current request; yields None if a session is already running"""
+    if not _session_lock.acquire(blocking=False):
+        yield None
+        return
+    profiler = SamplingProfiler(interval, thread_ids=[threading.get_ident()])
+    token = _request_profiler.set(profiler)
+    try:
+        yield profiler.start()
+    finally:
+        profiler.stop()
+        _request_profiler.reset(token)
+        _session_lock.release()
+
+
+def _register_thread():
+    profiler = _request_profiler.get()
+    if profiler is not None:
+        profiler.add_thread(threading.get_ident())
+
+
+class ProfiledRoute(APIRoute):
+    """APIRoute whose endpoint tells a per-request profile which thread runs it"""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        if inspect.iscoroutinefunction(endpoint):
+            @functools.wraps(endpoint)
+            async def profiled(*args, **kw):
+                _register_thread()
+                return await endpoint(*args, **kw)
+        else:
+            # Sync endpoints run in the threadpool, which copies the request's context
+            @functools.wraps(endpoint)
+            def profiled(*args, **kw):
+                _register_thread()
+                return endpoint(*args, **kw)
+        super().__init__(path, profiled, **kwargs)
+
+
+class ProfileStore:
+    """Bounded store of per-request profiles, retrievable by id"""
+
+    def __init__(self, max_profiles: int = MAX_STORED_PROFILES):
+        self.max_profiles = max_profiles
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profiler: SamplingProfiler, description: str) -> str:
+        profile_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._profiles[profile_id] = (description, profiler)
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+        return profile_id
+
+    def get(self, profile_id: str):
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def memory_usage(self) -> Dict:
+        with self._lock:
+            profiles = list(self._profiles.values())
+        return {"entries": len(profiles), "max_entries": self.max_profiles, "bytes": memory.deep_sizeof(profiles)}
+
+    def list(self):
+        with self._lock:
+            return [
+                {"profile_id": pid, "request": desc, "samples": prof.samples,
+                 "duration_seconds": round(prof.duration, 3)}
+                for pid, (desc, prof) in self._profiles.items()
+            ]
+
+
+request_profiles = ProfileStore()
+memory.register("request_profiles", request_profiles.memory_usage)
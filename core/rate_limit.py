@@ -0,0 +1,46 @@
+"""
+Rate Limiting Module
+Token-bucket rate limiter with O(1) checks
+"""
+import threading
+import time
+
+
+class TokenBucket:
+    """Refills ``rate`` tokens per second up to ``capacity``; each request takes one"""
+
+    __slots__ = ("rate", "capacity", "_tokens", "_updated", "_lock")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take tokens if available; never blocks"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1.0, deadline: float = None) -> bool:
+        """Block until tokens are available (or the monotonic deadline passes)"""
+        while not self.try_acquire(tokens):
+            wait = self.retry_after(tokens)
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+        return True
+
+    def retry_after(self, tokens: float = 1.0) -> float:
+        """Seconds until ``tokens`` will be available"""
+        with self._lock:
+            available = min(self.capacity, self._tokens + (time.monotonic() - self._updated) * self.rate)
+            missing = tokens - available
+        return max(missing / self.rate, 0.0) if self.rate > 0 else float("inf")
@@ -0,0 +1,52 @@
+"""
+Responses Module
+Fast JSON responses that skip FastAPI's response validation and jsonable_encoder
+
+``FastJSONResponse`` renders exactly the bytes FastAPI's default
+``JSONResponse`` would (compact separators, UTF-8, ``ensure_ascii=False``),
+so switching a route over never changes the API. Large load lists are
+rendered from ``JSONFragments``: per-load byte strings serialized once and
+cached by the load table, so a response is a single ``b",".join``.
+
+orjson is deliberately not used: it formats some floats differently
+(``1e16`` vs ``1e+16``), which would break byte compatibility.
+"""
+import json
+from typing import Any, Iterable
+
+from fastapi.responses import JSONResponse
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize like starlette's JSONResponse.render"""
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class JSONFragments:
+    """A JSON array assembled from already-serialized elements"""
+
+    __slots__ = ("fragments",)
+
+    def __init__(self, fragments: Iterable[bytes]):
+        self.fragments = list(fragments)
+
+    def __len__(self) -> int:
+        return len(self.fragments)
+
+    def render(self) -> bytes:
+        return b"[" + b",".join(self.fragments) + b"]"
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse for plain JSON data or JSONFragments, bypassing jsonable_encoder"""
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, JSONFragments):
+            return content.render()
+        return dumps(content)
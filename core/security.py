@@ -1,10 +1,120 @@
-from fastapi import Depends, HTTPException
+"""
+Security Module
+API key authentication against a hashed keyring with per-key rate limiting
+
+Keys are configured as SHA-256 digests (``API_KEYS``), so plaintext keys
+never need to live in the environment. Each key has its own token bucket.
+The legacy single ``API_KEY`` is registered as the ``default`` key.
+"""
+import hashlib
+import hmac
+import sys
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from fastapi import Depends, HTTPException, Request
 from fastapi.security.api_key import APIKeyHeader
 from core.config import Config
+from core.metrics import REGISTRY
+from core.rate_limit import TokenBucket
 
 api_key_header = APIKeyHeader(name="X-API-Key")
 
-def get_api_key(api_key: str = Depends(api_key_header)):
-    if api_key != Config.API_KEY:
+AUTH_REJECTIONS = REGISTRY.counter(
+    "auth_rejections_total", "Rejected API requests by reason and key", ("reason", "key"))
+
+
+def hash_api_key(api_key: str) -> str:
+    """Hex SHA-256 digest used to store keys in API_KEYS"""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class ApiKeyEntry:
+    name: str
+    digest: bytes
+    bucket: TokenBucket = field(repr=False)
+
+
+class KeyRing:
+    """Hashed API keys with O(1) lookup and constant-time comparison"""
+
+    def __init__(self):
+        # Keyed by digest only: presented keys are hashed on every lookup and
+        # never kept, so a memory dump can't recover them
+        self._by_digest: Dict[bytes, ApiKeyEntry] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, digest_hex: str, rate: float, burst: float):
+        digest = bytes.fromhex(digest_hex)
+        with self._lock:
+            self._by_digest[digest] = ApiKeyEntry(name, digest, TokenBucket(rate, burst))
+
+    def lookup(self, api_key: Optional[str]) -> Optional[ApiKeyEntry]:
+        if not api_key:
+            return None
+        digest = hashlib.sha256(api_key.encode("utf-8")).digest()
+        # Indexing by digest reveals nothing useful about the key; the final
+        # comparison is still done in constant time
+        entry = self._by_digest.get(digest)
+        if entry is None or not hmac.compare_digest(entry.digest, digest):
+            return None
+        return entry
+
+    def names(self):
+        return [entry.name for entry in self._by_digest.values()]
+
+
+def _parse_api_keys(spec: str):
+    """Parse ``name:sha256hex[:rate[:burst]]`` entries separated by commas"""
+    for item in filter(None, (part.strip() for part in (spec or "").split(","))):
+        parts = item.split(":")
+        if len(parts) < 2:
+            raise ValueError(f"Invalid API_KEYS entry (expected name:sha256[:rate[:burst]]): {parts[0]}")
+        rate = float(parts[2]) if len(parts) > 2 else Config.API_RATE_LIMIT
+        burst = float(parts[3]) if len(parts) > 3 else max(Config.API_RATE_BURST, rate)
+        yield parts[0], parts[1], rate, burst
+
+
+def build_keyring() -> KeyRing:
+    keyring = KeyRing()
+    if Config.API_KEY:
+        keyring.add("default", hash_api_key(Config.API_KEY), Config.API_RATE_LIMIT, Config.API_RATE_BURST)
+    for name, digest_hex, rate, burst in _parse_api_keys(Config.API_KEYS):
+        keyring.add(name, digest_hex, rate, burst)
+    return keyring
+
+
+keyring = build_keyring()
+
+
+def is_valid_api_key(api_key: str) -> bool:
+    """Check an API key outside of FastAPI dependency injection (e.g. in middleware)"""
+    return keyring.lookup(api_key) is not None
+
+
+def get_api_key(request: Request, api_key: str = Depends(api_key_header)):
+    entry = keyring.lookup(api_key)
+    if entry is None:
+        AUTH_REJECTIONS.inc("invalid_key", "unknown")
         raise HTTPException(status_code=403, detail="Invalid API Key")
+    if not entry.bucket.try_acquire():
+        AUTH_REJECTIONS.inc("rate_limited", entry.name)
+        retry_after = max(1, int(entry.bucket.retry_after() + 0.999))
+        raise HTTPException(
+            status_code=429,
+            detail=f"Rate limit exceeded for API key '{entry.name}'",
+            headers={"Retry-After": str(retry_after)},
+        )
+    request.state.api_key_name = entry.name
     return api_key
+
+
+if __name__ == "__main__":
+    # Usage: python -m core.security hash <api-key>
+    if len(sys.argv) == 3 and sys.argv[1] == "hash":
+        print(hash_api_key(sys.argv[2]))
+    else:
+        print("Usage: python -m core.security hash <api-key>")
+        sys.exit(1)
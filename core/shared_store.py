@@ -0,0 +1,248 @@
+"""
+Shared Store Module
+Cross-process state for multi-worker deployments
+
+With ``WORKERS > 1`` every uvicorn worker is a separate process, so in-memory
+caches and metrics would be split per worker. This module coordinates them
+through a local SQLite database (WAL mode) and serializes log appends with
+an advisory file lock.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX development machines
+    fcntl = None
+
+# Workers that haven't published metrics for this long are considered gone
+WORKER_STALE_SECONDS = 300
+
+
+class SharedStore:
+    """SQLite-backed key/value and metrics store shared by all workers on a host"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS worker_metrics ("
+                " worker_id TEXT PRIMARY KEY, payload TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            # expires_at NULL = confirmed (booked), never expires
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS reservations ("
+                " load_id TEXT PRIMARY KEY, token TEXT NOT NULL, holder TEXT, expires_at REAL)"
+            )
+
+    @contextmanager
+    def _connection(self):
+        # sqlite3 connections can't be shared across threads; keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        yield conn
+
+    # Cache
+    def cache_get(self, namespace: str, key: str):
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT value FROM cache WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def cache_set(self, namespace: str, key: str, value):
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value) VALUES (?, ?, ?)",
+                (namespace, key, json.dumps(value)),
+            )
+
+    def cache_delete(self, namespace: str, key: str):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def cache_prune_expired(self, namespace: str, now: float):
+        """Drop entries stored as [value, expires_at] whose expiry has passed"""
+        with self._connection() as conn:
+            conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND json_extract(value, '$[1]') <= ?", (namespace, now)
+            )
+
+    def cache_len(self, namespace: str) -> int:
+        with self._connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM cache WHERE namespace = ?", (namespace,)).fetchone()[0]
+
+    # Metrics
+    def publish_metrics(self, worker_id: str, export: Dict):
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO worker_metrics (worker_id, payload, updated_at) VALUES (?, ?, ?)",
+                (worker_id, json.dumps(export), time.time()),
+            )
+
+    def peer_metrics(self, exclude_worker_id: Optional[str] = None) -> List[Dict]:
+        cutoff = time.time() - WORKER_STALE_SECONDS
+        with self._connection() as conn:
+            conn.execute("DELETE FROM worker_metrics WHERE updated_at < ?", (cutoff,))
+            rows = conn.execute("SELECT worker_id, payload FROM worker_metrics").fetchall()
+        return [json.loads(payload) for worker_id, payload in rows if worker_id != exclude_worker_id]
+
+    # Reservations: each statement is atomic, so these are compare-and-set across workers
+    def reserve(self, load_id: str, token: str, holder: Optional[str], expires_at: float, now: float) -> bool:
+        """Hold a load unless someone else holds it; True if the hold was taken"""
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "INSERT INTO reservations (load_id, token, holder, expires_at) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (load_id) DO UPDATE SET"
+                " token = excluded.token, holder = excluded.holder, expires_at = excluded.expires_at"
+                " WHERE reservations.expires_at <= ?",
+                (load_id, token, holder, expires_at, now),
+            )
+            return cursor.rowcount == 1
+
+    def confirm_reservation(self, load_id: str, token: str, now: float) -> bool:
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "UPDATE reservations SET expires_at = NULL WHERE load_id = ? AND token = ? AND expires_at > ?",
+                (load_id, token, now),
+            )
+            return cursor.rowcount == 1
+
+    def release_reservation(self, load_id: str, token: str) -> bool:
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "DELETE FROM reservations WHERE load_id = ? AND token = ? AND expires_at IS NOT NULL",
+                (load_id, token),
+            )
+            return cursor.rowcount == 1
+
+    def settle_reservation(self, load_id: str, token: str) -> bool:
+        """Drop a confirmed booking once the load is off the board"""
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "DELETE FROM reservations WHERE load_id = ? AND token = ? AND expires_at IS NULL",
+                (load_id, token),
+            )
+            return cursor.rowcount == 1
+
+    def active_reservations(self, now: float) -> List[str]:
+        """Ids of held or booked loads (read-only; lapsed rows are skipped, not deleted)"""
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT load_id FROM reservations WHERE expires_at IS NULL OR expires_at > ?", (now,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def prune_reservations(self, now: float) -> int:
+        """Delete lapsed holds; returns how many were dropped"""
+        with self._connection() as conn:
+            return conn.execute("DELETE FROM reservations WHERE expires_at <= ?", (now,)).rowcount
+
+
+class SharedCache:
+    """Dict-like view over one SharedStore cache namespace"""
+
+    def __init__(self, store: SharedStore, namespace: str):
+        self.store = store
+        self.namespace = namespace
+
+    def get(self, key, default=None):
+        value = self.store.cache_get(self.namespace, key)
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        value = self.store.cache_get(self.namespace, key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.store.cache_set(self.namespace, key, value)
+
+    def __delitem__(self, key):
+        self.store.cache_delete(self.namespace, key)
+
+    def __contains__(self, key) -> bool:
+        return self.store.cache_get(self.namespace, key) is not None
+
+    def __len__(self) -> int:
+        return self.store.cache_len(self.namespace)
+
+
+def append_line(path: str, line: str):
+    """Append one line under an exclusive advisory lock so workers never interleave writes"""
+    if not line.endswith("\n"):
+        line += "\n"
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            f.write(line)
+            f.flush()
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_shared_store() -> Optional[SharedStore]:
+    """Process-wide SharedStore, or None when running a single worker"""
+    global _store
+    from core.config import Config
+    if not Config.is_multi_worker():
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SharedStore(Config.SHARED_STATE_PATH)
+    return _store
+
+
+def exchange_metrics(registry) -> List[Dict]:
+    """Publish this worker's metric totals and return its live peers' (none with one worker)"""
+    store = get_shared_store()
+    if store is None:
+        return []
+    # Publish our own totals first so the next scrape on another worker sees them
+    worker_id = str(os.getpid())
+    store.publish_metrics(worker_id, registry.export())
+    return store.peer_metrics(exclude_worker_id=worker_id)
+
+
+def start_metrics_publisher(registry, interval: float = 5.0) -> Optional[threading.Thread]:
+    """Periodically publish this worker's metric totals so peers can merge them"""
+    store = get_shared_store()
+    if store is None:
+        return None
+    worker_id = str(os.getpid())
+
+    def run():
+        while True:
+            try:
+                store.publish_metrics(worker_id, registry.export())
+            except Exception:
+                pass
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name="metrics-publisher", daemon=True)
+    thread.start()
+    return thread
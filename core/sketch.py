@@ -0,0 +1,182 @@
+"""
+Sketch Module
+Mergeable streaming quantiles with bounded memory
+
+``QuantileSketch`` is a relative-error sketch in the style of DDSketch:
+values fall into logarithmically spaced bins, so any quantile is returned
+within ``relative_accuracy`` of the true value no matter how many samples
+were added. Adding a sample is one ``log`` and a dict increment; merging two
+sketches (from two threads, workers or hosts) just adds bin counts, so
+merged results are exactly what one sketch over all samples would give.
+Serialized sketches are small JSON documents for the shared store.
+
+Memory is bounded by the dynamic range of the values: with 1% accuracy,
+rates from $1 to $100k take at most ~580 bins. Past ``max_bins`` the
+smallest magnitudes are folded together, losing accuracy only at the
+bottom of the range.
+"""
+import math
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99)
+# Magnitudes below this are counted as zero
+MIN_VALUE = 1e-9
+
+
+class QuantileSketch:
+    """Streaming quantiles within ``relative_accuracy`` of the true value"""
+
+    __slots__ = ("relative_accuracy", "max_bins", "_gamma", "_log_gamma", "_positive", "_negative",
+                 "zeros", "count", "sum", "min", "max", "_summary")
+
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 2048):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._positive: Dict[int, int] = {}
+        self._negative: Dict[int, int] = {}
+        self.zeros = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._summary = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _key(self, magnitude: float) -> int:
+        return math.ceil(math.log(magnitude) / self._log_gamma)
+
+    def _value(self, key: int) -> float:
+        return 2 * self._gamma ** key / (self._gamma + 1)
+
+    def add(self, value: float, count: int = 1):
+        if value > MIN_VALUE:
+            bins, key = self._positive, self._key(value)
+        elif value < -MIN_VALUE:
+            bins, key = self._negative, self._key(-value)
+        else:
+            bins = None
+            self.zeros += count
+        if bins is not None:
+            bins[key] = bins.get(key, 0) + count
+            if len(bins) > self.max_bins:
+                self._collapse(bins)
+        self.count += count
+        self.sum += value * count
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self._summary = None
+
+    def _collapse(self, bins: Dict[int, int]):
+        # Fold the smallest magnitudes into one bin
+        keys = sorted(bins)
+        excess = len(bins) - self.max_bins
+        floor = keys[excess]
+        for key in keys[:excess]:
+            bins[floor] += bins.pop(key)
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """Fold ``other``'s samples into this sketch"""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Can't merge sketches with different relative accuracy")
+        for mine, theirs in ((self._positive, other._positive), (self._negative, other._negative)):
+            # copy(): other may still be receiving samples on another thread
+            for key, count in theirs.copy().items():
+                mine[key] = mine.get(key, 0) + count
+            if len(mine) > self.max_bins:
+                self._collapse(mine)
+        self.zeros += other.zeros
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._summary = None
+        return self
+
+    def copy(self) -> "QuantileSketch":
+        return QuantileSketch(self.relative_accuracy, self.max_bins).merge(self)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        # The extremes are tracked exactly
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        rank = q * (self.count - 1)
+        seen = 0
+        # Most negative first: large negative keys are the largest magnitudes
+        for key in sorted(self._negative, reverse=True):
+            seen += self._negative[key]
+            if seen > rank:
+                return max(-self._value(key), self.min)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for key in sorted(self._positive):
+            seen += self._positive[key]
+            if seen > rank:
+                return min(self._value(key), self.max)
+        return self.max
+
+    def summary(self, quantiles: Sequence[float] = DEFAULT_QUANTILES) -> Dict:
+        """count, mean and pNN values; cached until the next add or merge"""
+        cached = self._summary
+        if cached is not None and cached[0] == tuple(quantiles):
+            return cached[1]
+        result = {"count": self.count, "mean": round(self.sum / self.count, 4) if self.count else None}
+        for q in quantiles:
+            value = self.quantile(q)
+            result[f"p{q * 100:g}"] = round(value, 4) if value is not None else None
+        self._summary = (tuple(quantiles), result)
+        return result
+
+    def to_dict(self) -> Dict:
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "positive": sorted(self._positive.copy().items()),
+            "negative": sorted(self._negative.copy().items()),
+            "zeros": self.zeros,
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "QuantileSketch":
+        sketch = cls(data["relative_accuracy"])
+        sketch._positive = {int(key): count for key, count in data["positive"]}
+        sketch._negative = {int(key): count for key, count in data["negative"]}
+        sketch.zeros = data["zeros"]
+        sketch.count = data["count"]
+        sketch.sum = data["sum"]
+        if sketch.count:
+            sketch.min, sketch.max = data["min"], data["max"]
+        return sketch
+
+
+def merged(sketches: Iterable[QuantileSketch]) -> Optional[QuantileSketch]:
+    """One sketch over all of ``sketches`` (None if there are none)"""
+    total = None
+    for sketch in sketches:
+        total = sketch.copy() if total is None else total.merge(sketch)
+    return total
+
+
+def summaries_by_label(sketches: Dict[Tuple, QuantileSketch], labelnames: Sequence[str]) -> Dict:
+    """Summaries over all label sets, then per value of each label"""
+    overall = merged(sketches.values())
+    result = {"all": overall.summary() if overall is not None else None}
+    for position, name in enumerate(labelnames):
+        groups: Dict[str, list] = {}
+        for labels, sketch in sketches.items():
+            groups.setdefault(labels[position], []).append(sketch)
+        result[f"by_{name}"] = {value: merged(group).summary() for value, group in sorted(groups.items())}
+    return result
@@ -0,0 +1,238 @@
+"""
+Traffic Capture Module
+Record webhook and load-search traffic for offline replay (tools/replay.py)
+
+With ``CAPTURE_PATH`` set, a sample of ``/webhook/happyrobot`` and
+``/search_loads`` requests is written to a JSON-lines file (gzip when the
+path ends in ``.gz``): arrival time, method, path, sanitized body, status,
+latency and a digest of the response. The request path only pays for a
+``put_nowait`` on a bounded queue; sanitizing, hashing and writing happen on
+a background thread, and records are dropped (and counted) rather than
+queued without bound when the writer falls behind.
+
+Sanitizing keeps what drives behavior and drops what identifies people:
+MC numbers, call ids and idempotency keys are replaced by keyed hashes
+(so repeat callers and retries still look like repeats), phone numbers and
+e-mail addresses are masked in transcripts and contact fields are dropped,
+at any depth of the payload (carrier objects, transcript turns).
+"""
+import atexit
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from core.metrics import TRAFFIC_CAPTURE_RECORDS
+
+logger = logging.getLogger(__name__)
+
+# Endpoints worth replaying: the call path and the agent's load search
+CAPTURED_PATHS = frozenset({"/webhook/happyrobot", "/search_loads"})
+
+# Payload fields dropped outright
+DROPPED_FIELDS = frozenset({"carrier_name", "caller_name", "contact_name", "phone", "phone_number", "email"})
+# Payload fields replaced by a keyed hash
+PSEUDONYMIZED_FIELDS = frozenset({"call_id"})
+# Response fields that differ run to run and are left out of the digest
+VOLATILE_FIELDS = frozenset({"verified_at", "last_verified_at", "timestamp"})
+
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+_PHONE = re.compile(r"\+?\(?\d[\d\s().-]{8,}\d")
+
+
+class Sanitizer:
+    """Keyed, deterministic scrubbing of captured request payloads"""
+
+    def __init__(self, salt: str):
+        self._key = (salt or "").encode("utf-8")
+
+    def _digest(self, value) -> str:
+        return hmac.new(self._key, str(value).encode("utf-8"), hashlib.sha256).hexdigest()
+
+    def token(self, value) -> str:
+        return self._digest(value)[:16]
+
+    def mc_number(self, value):
+        """A stable six-digit stand-in, keeping the caller's int/str type"""
+        if value is None or value == "":
+            return value
+        pseudonym = 100000 + int(self._digest(str(value).strip()), 16) % 900000
+        return pseudonym if isinstance(value, (int, float)) else str(pseudonym)
+
+    def payload(self, body):
+        """Scrubbed copy of a JSON body; nested objects (carrier, transcript turns) included"""
+        if isinstance(body, dict):
+            clean = {}
+            for key, value in body.items():
+                if key in DROPPED_FIELDS:
+                    continue
+                if key == "mc_number" and not isinstance(value, (dict, list)):
+                    value = self.mc_number(value)
+                elif key in PSEUDONYMIZED_FIELDS and value is not None:
+                    value = self.token(value)
+                else:
+                    value = self.payload(value)
+                clean[key] = value
+            return clean
+        if isinstance(body, list):
+            return [self.payload(value) for value in body]
+        if isinstance(body, str):
+            return _PHONE.sub("<phone>", _EMAIL.sub("<email>", body))
+        return body
+
+
+def _strip_volatile(value):
+    if isinstance(value, dict):
+        return {k: _strip_volatile(v) for k, v in value.items() if k not in VOLATILE_FIELDS}
+    if isinstance(value, list):
+        return [_strip_volatile(v) for v in value]
+    return value
+
+
+def response_digest(content: bytes) -> str:
+    """Hash of a response body, ignoring key order and per-run fields such as verification times"""
+    try:
+        canonical = json.dumps(_strip_volatile(json.loads(content)), sort_keys=True, separators=(",", ":"))
+        content = canonical.encode("utf-8")
+    except ValueError:
+        pass
+    return hashlib.sha1(content).hexdigest()
+
+
+def open_capture(path: str, mode: str = "rt"):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode, encoding="utf-8")
+    return open(path, mode.replace("t", ""), encoding="utf-8")
+
+
+def read_capture(paths: Iterable[str]) -> List[Dict]:
+    """Records from one or more capture files (one per worker), in arrival order
+
+    A capture cut off mid-write (a killed process leaves a gzip stream
+    without its trailer, or a partial last line) yields what was complete.
+    """
+    records = []
+    for path in paths:
+        try:
+            with open_capture(path) as f:
+                for line in f:
+                    if line.endswith("\n"):
+                        records.append(json.loads(line))
+        except (EOFError, gzip.BadGzipFile):
+            logger.warning(f"Capture {path} ends mid-write; using the complete records")
+    records.sort(key=lambda record: record["ts"])
+    return records
+
+
+def write_capture(path: str, records: Iterable[Dict]):
+    with open_capture(path, "wt") as f:
+        for record in records:
+            f.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+
+class TrafficRecorder:
+    """Background writer for sampled requests; see the module docstring"""
+
+    def __init__(self, path: str, salt: str = "", sample_rate: float = 1.0, max_records: int = 100_000,
+                 queue_size: int = 10_000, flush_interval: float = 1.0):
+        self.path = path
+        self.sanitizer = Sanitizer(salt)
+        self.sample_rate = sample_rate
+        self.max_records = max_records
+        self.flush_interval = flush_interval
+        self.written = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._file = open_capture(path, "at")
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="traffic-capture", daemon=True)
+        self._thread.start()
+
+    def wants(self, path: str) -> bool:
+        if path not in CAPTURED_PATHS or self.written >= self.max_records or self._closed.is_set():
+            return False
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def record(self, ts: float, method: str, path: str, query: str, idempotency_key: Optional[str],
+               body: bytes, status: int, latency: float, content: bytes):
+        """Queue a finished request; never blocks the caller"""
+        try:
+            self._queue.put_nowait((ts, method, path, query, idempotency_key, body, status, latency, content))
+        except queue.Full:
+            TRAFFIC_CAPTURE_RECORDS.inc("dropped")
+
+    def _encode(self, ts, method, path, query, idempotency_key, body, status, latency, content) -> Dict:
+        try:
+            payload = self.sanitizer.payload(json.loads(body)) if body else None
+        except ValueError:
+            payload = None  # not JSON: the API rejected it anyway, and raw bytes may hold anything
+        record = {"ts": round(ts, 6), "method": method, "path": path}
+        if query:
+            record["query"] = query
+        if idempotency_key:
+            record["idempotency_key"] = self.sanitizer.token(idempotency_key)
+        record.update({"body": payload, "status": status, "latency_ms": round(latency * 1000, 3),
+                       "response": response_digest(content)})
+        return record
+
+    def _run(self):
+        pending = 0
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+            if item is not None and self.written < self.max_records:
+                try:
+                    self._file.write(json.dumps(self._encode(*item), separators=(",", ":")) + "\n")
+                    self.written += 1
+                    pending += 1
+                    TRAFFIC_CAPTURE_RECORDS.inc("written")
+                except Exception as e:
+                    logger.warning(f"Traffic capture failed to write a record: {e}")
+                    TRAFFIC_CAPTURE_RECORDS.inc("dropped")
+            if pending and (item is None or self._queue.empty()):
+                self._file.flush()
+                pending = 0
+            if self._closed.is_set() and self._queue.empty():
+                return
+
+    def close(self, timeout: float = 5.0):
+        """Drain what's queued and finish the file"""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._thread.join(timeout)
+        self._file.close()
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_traffic_recorder() -> Optional[TrafficRecorder]:
+    """Process-wide recorder, or None when CAPTURE_PATH is unset"""
+    global _recorder
+    from core.config import Config
+    if not Config.CAPTURE_PATH:
+        return None
+    if _recorder is None:
+        with _recorder_lock:
+            if _recorder is None:
+                path = Config.CAPTURE_PATH
+                if Config.is_multi_worker():
+                    # One file per worker; tools/replay.py merges them by arrival time
+                    root, ext = os.path.splitext(path[:-3] if path.endswith(".gz") else path)
+                    path = f"{root}.{os.getpid()}{ext}" + (".gz" if path.endswith(".gz") else "")
+                _recorder = TrafficRecorder(
+                    path, salt=Config.CAPTURE_SALT or Config.API_KEY or "",
+                    sample_rate=Config.CAPTURE_SAMPLE_RATE, max_records=Config.CAPTURE_MAX_RECORDS)
+                atexit.register(_recorder.close)
+                logger.info(f"🎥 Capturing traffic to {path} (sample rate {Config.CAPTURE_SAMPLE_RATE})")
+    return _recorder
@@ -0,0 +1,51 @@
+"""
+Warmup Module
+Loads heavy dependencies (TextBlob/NLTK, FMCSA session, load file) off the
+request path so the server can answer /health immediately after boot.
+"""
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+_tasks: List[Tuple[str, Callable[[], object]]] = []
+_state: Dict = {"status": "pending", "duration_seconds": None, "tasks": {}}
+_lock = threading.Lock()
+
+
+def register(name: str, task: Callable[[], object]):
+    """Register a warmup task; tasks run in registration order"""
+    _tasks.append((name, task))
+
+
+def warm_all():
+    """Run every registered task, recording timing and failures per task"""
+    with _lock:
+        if _state["status"] in ("running", "done"):
+            return
+        _state["status"] = "running"
+    started = time.perf_counter()
+    for name, task in _tasks:
+        task_started = time.perf_counter()
+        try:
+            task()
+            _state["tasks"][name] = {"ok": True, "seconds": round(time.perf_counter() - task_started, 3)}
+        except Exception as e:
+            logger.warning(f"Warmup task {name} failed: {e}")
+            _state["tasks"][name] = {"ok": False, "error": str(e)}
+    _state["duration_seconds"] = round(time.perf_counter() - started, 3)
+    _state["status"] = "done"
+    logger.info(f"🔥 Warmup finished in {_state['duration_seconds']}s")
+
+
+def start_background() -> threading.Thread:
+    """Warm in a daemon thread so startup doesn't wait on it"""
+    thread = threading.Thread(target=warm_all, name="warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def status() -> Dict:
+    return {"status": _state["status"], "duration_seconds": _state["duration_seconds"], "tasks": dict(_state["tasks"])}
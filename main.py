@@ -1,10 +1,16 @@
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Response
 import os
 import logging
 import json
 import time
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
+from core.metrics import HTTP_REQUEST_DURATION
+from core.profiler import profile_request, request_profiles
+from core.security import is_valid_api_key
+from core.traffic_capture import get_traffic_recorder
+from core import warmup
 
 # Load environment variables from .env file
 load_dotenv()
@@ -16,12 +22,53 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="HappyRobot Inbound Carrier API")
+def _warm_sentiment():
+    from agent import warm_sentiment
+    warm_sentiment()
+
+def _warm_fmcsa():
+    from services.fmcsa import get_fmcsa_service
+    get_fmcsa_service().session
+
+def _warm_loads():
+    from api.loads import get_loads_store
+    get_loads_store()
+
+def _warm_negotiation_log():
+    # Both indexes build in one streaming pass over the whole log the first time
+    from services.carrier_history import get_carrier_history
+    from services.negotiation_stats import get_negotiation_stats
+    get_negotiation_stats().refresh()
+    get_carrier_history().refresh()
+
+warmup.register("loads", _warm_loads)
+warmup.register("fmcsa", _warm_fmcsa)
+warmup.register("negotiation_log", _warm_negotiation_log)
+warmup.register("sentiment", _warm_sentiment)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from core.config import Config
+    if Config.STARTUP_MODE == "eager":
+        warmup.warm_all()
+    elif Config.STARTUP_MODE == "background":
+        # /health answers while TextBlob/NLTK and friends load in the background
+        warmup.start_background()
+    if Config.LOAD_EXPIRY_ENABLED:
+        from services.load_expiry import start_expiry_sweeper
+        start_expiry_sweeper()
+    if Config.is_multi_worker():
+        from core.metrics import REGISTRY
+        from core.shared_store import start_metrics_publisher
+        start_metrics_publisher(REGISTRY)
+    yield
+
+app = FastAPI(title="HappyRobot Inbound Carrier API", lifespan=lifespan)
 
 # Simplified request logging middleware
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    start_time = time.time()
+    start_time = time.perf_counter()
     
     # Log basic request info
     logger.info(f"📥 {request.method} {request.url.path} from {request.client.host}")
@@ -29,9 +76,51 @@ async def log_requests(request: Request, call_next):
     response = await call_next(request)
     
     # Log response with timing
-    process_time = time.time() - start_time
+    process_time = time.perf_counter() - start_time
     logger.info(f"📤 {response.status_code} - {process_time:.2f}s")
     
+    # Label by route template (not raw path) to keep metric cardinality bounded
+    route = request.scope.get("route")
+    route_path = getattr(route, "path", "unmatched")
+    HTTP_REQUEST_DURATION.observe(process_time, request.method, route_path, str(response.status_code))
+    
+    return response
+
+# Opt-in traffic capture (CAPTURE_PATH) for replay against candidate builds with tools/replay.py
+@app.middleware("http")
+async def capture_traffic(request: Request, call_next):
+    recorder = get_traffic_recorder()
+    if recorder is None or not recorder.wants(request.url.path):
+        return await call_next(request)
+    
+    body = await request.body()
+    arrived_at = time.time()
+    start_time = time.perf_counter()
+    response = await call_next(request)
+    latency = time.perf_counter() - start_time
+    
+    # The body is needed for the response digest, so buffer it and hand back a plain response
+    content = b"".join([chunk async for chunk in response.body_iterator])
+    recorder.record(arrived_at, request.method, request.url.path, request.url.query,
+                    request.headers.get("Idempotency-Key"), body, response.status_code, latency, content)
+    return Response(content=content, status_code=response.status_code, headers=dict(response.headers))
+
+# Per-request profiling: send "X-Profile: 1" with a valid API key and fetch the
+# profile from /admin/profile/requests/{X-Profile-Id}. No cost when the header is absent.
+# Only this request's threads are sampled; skipped while another profile is running.
+@app.middleware("http")
+async def profile_requests(request: Request, call_next):
+    if not request.headers.get("X-Profile") or not is_valid_api_key(request.headers.get("X-API-Key")):
+        return await call_next(request)
+    
+    with profile_request() as profiler:
+        if profiler is None:
+            logger.info("🔬 Profiling session already running; serving request unprofiled")
+            return await call_next(request)
+        response = await call_next(request)
+    profile_id = request_profiles.add(profiler, f"{request.method} {request.url.path}")
+    response.headers["X-Profile-Id"] = profile_id
+    logger.info(f"🔬 Captured request profile {profile_id} ({profiler.samples} samples)")
     return response
 
 # Health check endpoint for Fly.io
@@ -39,6 +128,14 @@ async def log_requests(request: Request, call_next):
 def health_check():
     return {"status": "healthy"}
 
+# Upstream dependency health (kept off /health so an FMCSA outage doesn't fail Fly checks)
+@app.get("/health/upstreams")
+def upstream_health():
+    from core.circuit_breaker import breaker_states
+    states = breaker_states()
+    degraded = any(state["state"] != "closed" for state in states.values())
+    return {"status": "degraded" if degraded else "healthy", "upstreams": states}
+
 # Root endpoint
 @app.get("/")
 def read_root():
@@ -48,7 +145,7 @@ def read_root():
 # API info endpoint
 @app.get("/api_info")
 def api_info():
-    return {"message": "HappyRobot Inbound Carrier API", "status": "running"}
+    return {"message": "HappyRobot Inbound Carrier API", "status": "running", "warmup": warmup.status()}
 
 # Import routers with error handling
 try:
@@ -75,6 +172,18 @@ try:
 except Exception as e:
     print(f"Error loading auth router: {e}")
     
+try:
+    from api.monitoring import router as monitoring_router
+    app.include_router(monitoring_router)
+except Exception as e:
+    print(f"Error loading monitoring router: {e}")
+
+try:
+    from api.admin import router as admin_router
+    app.include_router(admin_router)
+except Exception as e:
+    print(f"Error loading admin router: {e}")
+
 # Import dashboard view router
 try:
     from api.dashboard_view import router as dashboard_router
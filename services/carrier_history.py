@@ -0,0 +1,136 @@
+"""
+Carrier History Module
+Per-MC index of past calls, built from the negotiation log
+
+Every processed webhook call appends a record to ``negotiations.log``. The
+index tails that file (from the last offset it read, like the load WAL; see
+services/log_tail.py) and folds each record into a small per-carrier summary: when the carrier was
+last verified, recent lanes, accepted rates and sentiment. A lookup is one
+``os.stat`` plus a dict access; a fresh process rebuilds the index in one
+streaming pass over the log.
+
+A verification time lets a repeat caller skip FMCSA, so it is only taken
+from records the webhook wrote itself (``source`` is ``TRUSTED_SOURCE``; the
+public ``/log_negotiation`` endpoint strips that field) and never from the
+future beyond a small clock-skew allowance.
+"""
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from core import memory
+from services.log_tail import LogTailIndex
+
+# Recent items kept per carrier
+RECENT = 10
+_SENTIMENT_SCORES = {"Positive": 1, "Neutral": 0, "Negative": -1}
+# Marker on records written by the webhook, the only ones whose verified_at is trusted
+TRUSTED_SOURCE = "webhook"
+# How far ahead of this server's clock a worker's verified_at may be
+CLOCK_SKEW_SECONDS = 60.0
+
+
+class CarrierHistory:
+    """What we know about one carrier from its previous calls"""
+
+    __slots__ = ("mc_number", "calls", "deals", "last_verified_at", "lanes", "rate_ratios", "sentiments")
+
+    def __init__(self, mc_number: str):
+        self.mc_number = mc_number
+        self.calls = 0
+        self.deals = 0
+        self.last_verified_at: Optional[float] = None
+        self.lanes = deque(maxlen=RECENT)
+        # final_rate / loadboard_rate of recent closed deals
+        self.rate_ratios = deque(maxlen=RECENT)
+        self.sentiments = deque(maxlen=RECENT)
+
+    def record(self, entry: Dict):
+        self.calls += 1
+        verified_at = entry.get("verified_at")
+        if (isinstance(verified_at, (int, float)) and entry.get("source") == TRUSTED_SOURCE
+                and verified_at <= time.time() + CLOCK_SKEW_SECONDS):
+            self.last_verified_at = max(self.last_verified_at or 0, verified_at)
+        if entry.get("origin") or entry.get("destination"):
+            self.lanes.append((entry.get("origin"), entry.get("destination")))
+        if entry.get("sentiment") in _SENTIMENT_SCORES:
+            self.sentiments.append(_SENTIMENT_SCORES[entry["sentiment"]])
+        if entry.get("accepted") and entry.get("final_rate"):
+            self.deals += 1
+            # Older records lack loadboard_rate; the broker's first offer is the board rate
+            rate = entry.get("loadboard_rate") or next(iter(entry.get("history") or []), {}).get("broker_offer")
+            if rate:
+                self.rate_ratios.append(entry["final_rate"] / rate)
+
+    def verified_within(self, seconds: float, now: float) -> bool:
+        return self.last_verified_at is not None and now - self.last_verified_at <= seconds
+
+    def expected_rate(self, loadboard_rate) -> Optional[int]:
+        """What this carrier's recent deals suggest they'll take for a load at this board rate"""
+        if not self.rate_ratios or not loadboard_rate:
+            return None
+        return int(round(loadboard_rate * sum(self.rate_ratios) / len(self.rate_ratios)))
+
+    def sentiment_trend(self) -> Optional[float]:
+        """Mean of recent sentiments (-1 negative .. 1 positive)"""
+        return round(sum(self.sentiments) / len(self.sentiments), 2) if self.sentiments else None
+
+    def to_dict(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "deals": self.deals,
+            "last_verified_at": self.last_verified_at,
+            "recent_lanes": [{"origin": o, "destination": d} for o, d in self.lanes],
+            "average_rate_ratio": round(sum(self.rate_ratios) / len(self.rate_ratios), 4) if self.rate_ratios else None,
+            "sentiment_trend": self.sentiment_trend(),
+        }
+
+
+class CarrierHistoryIndex(LogTailIndex):
+    """mc_number -> CarrierHistory, kept in step with an append-only JSON-lines log"""
+
+    def __init__(self, log_path: str):
+        super().__init__(log_path)
+        self._by_mc: Dict[str, CarrierHistory] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_mc)
+
+    def memory_usage(self) -> Dict:
+        return {"carriers": len(self), **super().memory_usage()}
+
+    def _reset(self):
+        self._by_mc = {}
+
+    def record(self, entry: Dict):
+        mc_number = entry.get("mc_number")
+        if not mc_number:
+            return  # e.g. /negotiate records, which have no carrier
+        mc_number = str(mc_number)
+        history = self._by_mc.get(mc_number)
+        if history is None:
+            history = self._by_mc[mc_number] = CarrierHistory(mc_number)
+        history.record(entry)
+
+    def get(self, mc_number) -> Optional[CarrierHistory]:
+        self.refresh()
+        return self._by_mc.get(str(mc_number))
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_carrier_history() -> CarrierHistoryIndex:
+    """Process-wide index over the negotiation log"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                from api.negotiation import NEGOTIATIONS_LOG
+                _index = CarrierHistoryIndex(NEGOTIATIONS_LOG)
+    return _index
+
+
+memory.register("carrier_history", lambda: _index.memory_usage() if _index is not None else None)
@@ -0,0 +1,320 @@
+"""
+Census Snapshot Module
+Offline FMCSA carrier census index for zero-latency eligibility checks
+
+A downloaded FMCSA census/authority CSV is compiled into a compact binary
+file: a sorted array of MC numbers plus parallel status-flag and
+out-of-service-date arrays. The file is memory-mapped and searched with
+bisect, so a lookup costs microseconds and the OS shares the pages between
+workers. Daily diff files are merged in a single linear pass.
+
+File layout (native byte order, checked on open):
+    header   magic(4s) version(H) byteorder(B) pad(x) count(I) as_of(Q)
+    mc       count * uint32, ascending
+    oos_day  count * uint16, days since 1970-01-01 (0 = not out of service)
+    flags    count * uint8
+
+Usage:
+    python -m services.census import carriers.csv [--as-of 2025-09-17]
+    python -m services.census apply-diff daily_diff.csv [--as-of 2025-09-18]
+    python -m services.census lookup 123456
+"""
+import argparse
+import csv
+import datetime
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"MCCS"
+VERSION = 1
+HEADER = struct.Struct("<4sHBxIQ")
+BYTEORDER = 0 if sys.byteorder == "little" else 1
+
+FLAG_ACTIVE = 0x01
+FLAG_OUT_OF_SERVICE = 0x02
+
+# Column names seen in FMCSA census/authority extracts, first match wins
+MC_COLUMNS = ("DOCKET_NUMBER", "MC_NUMBER", "MC_MX_FF_NUMBER", "DOCKET", "mc_number")
+STATUS_COLUMNS = ("STATUS_CODE", "OPERATING_STATUS", "CARRIER_OPERATION_STATUS", "COMMON_STAT", "status")
+OOS_COLUMNS = ("OOS_DATE", "OUT_OF_SERVICE_DATE", "oos_date")
+ACTION_COLUMNS = ("ACTION", "OP", "action")
+ACTIVE_STATUSES = {"A", "ACTIVE", "AUTHORIZED"}
+
+EPOCH = datetime.date(1970, 1, 1)
+
+
+def _pick_column(fieldnames, candidates) -> Optional[str]:
+    lookup = {name.strip().upper(): name for name in fieldnames or []}
+    for candidate in candidates:
+        if candidate.upper() in lookup:
+            return lookup[candidate.upper()]
+    return None
+
+
+def _parse_mc(value: str) -> Optional[int]:
+    digits = "".join(ch for ch in (value or "") if ch.isdigit())
+    return int(digits) if digits and int(digits) < 2 ** 32 else None
+
+
+def _parse_day(value: str) -> int:
+    value = (value or "").strip()
+    if not value:
+        return 0
+    for fmt in ("%Y-%m-%d", "%m/%d/%Y", "%Y%m%d", "%d-%b-%y"):
+        try:
+            return (datetime.datetime.strptime(value[:10], fmt).date() - EPOCH).days
+        except ValueError:
+            continue
+    # Unparseable but present: still out of service, date unknown
+    return 1
+
+
+def read_census_rows(path: str) -> Iterator[Tuple[int, int, int, bool]]:
+    """Stream (mc, flags, oos_day, deleted) tuples from a census or diff CSV"""
+    with open(path, newline="", encoding="utf-8-sig", errors="replace") as f:
+        reader = csv.DictReader(f)
+        mc_col = _pick_column(reader.fieldnames, MC_COLUMNS)
+        status_col = _pick_column(reader.fieldnames, STATUS_COLUMNS)
+        oos_col = _pick_column(reader.fieldnames, OOS_COLUMNS)
+        action_col = _pick_column(reader.fieldnames, ACTION_COLUMNS)
+        if mc_col is None:
+            raise ValueError(f"No MC/docket column found in {path}; expected one of {', '.join(MC_COLUMNS)}")
+        for row in reader:
+            mc = _parse_mc(row.get(mc_col))
+            if mc is None:
+                continue
+            deleted = action_col is not None and (row.get(action_col) or "").strip().upper() in ("D", "DELETE")
+            status = (row.get(status_col) or "").strip().upper() if status_col else "A"
+            oos_day = _parse_day(row.get(oos_col)) if oos_col else 0
+            flags = (FLAG_ACTIVE if status in ACTIVE_STATUSES else 0) | (FLAG_OUT_OF_SERVICE if oos_day else 0)
+            yield mc, flags, oos_day, deleted
+
+
+def _write_snapshot(path: str, records: Iterable[Tuple[int, int, int]], as_of: float):
+    """Write sorted (mc, flags, oos_day) records atomically (tmp file + rename)"""
+    mcs, days, flags = array("I"), array("H"), array("B")
+    for mc, flag, oos_day in records:
+        mcs.append(mc)
+        days.append(min(oos_day, 0xFFFF))
+        flags.append(flag)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, BYTEORDER, len(mcs), int(as_of)))
+        mcs.tofile(f)
+        days.tofile(f)
+        flags.tofile(f)
+    # Readers holding the old mapping keep a valid view until they reopen
+    os.replace(tmp_path, path)
+    return len(mcs)
+
+
+def import_census(csv_path: str, snapshot_path: str, as_of: float = None) -> int:
+    """Build a snapshot from a full census CSV; returns the record count"""
+    latest: Dict[int, Tuple[int, int]] = {}
+    for mc, flags, oos_day, deleted in read_census_rows(csv_path):
+        if deleted:
+            latest.pop(mc, None)
+        else:
+            latest[mc] = (flags, oos_day)
+    records = ((mc, *latest[mc]) for mc in sorted(latest))
+    count = _write_snapshot(snapshot_path, records, as_of or time.time())
+    logger.info(f"Census snapshot written: {count} carriers -> {snapshot_path}")
+    return count
+
+
+def apply_diff(diff_path: str, snapshot_path: str, as_of: float = None) -> Dict[str, int]:
+    """
+    Merge a daily diff (upserts, and deletes via an ACTION=D column) into the
+    snapshot with one linear pass over the existing arrays.
+    """
+    changes: Dict[int, Optional[Tuple[int, int]]] = {}
+    for mc, flags, oos_day, deleted in read_census_rows(diff_path):
+        changes[mc] = None if deleted else (flags, oos_day)
+    diff_keys = sorted(changes)
+    stats = {"updated": 0, "inserted": 0, "deleted": 0}
+
+    snapshot = CensusSnapshot(snapshot_path)
+
+    def merged():
+        i, j, n = 0, 0, len(snapshot)
+        while i < n or j < len(diff_keys):
+            if j >= len(diff_keys) or (i < n and snapshot.mcs[i] < diff_keys[j]):
+                yield snapshot.mcs[i], snapshot.flags[i], snapshot.oos_days[i]
+                i += 1
+                continue
+            mc = diff_keys[j]
+            existed = i < n and snapshot.mcs[i] == mc
+            change = changes[mc]
+            if change is None:
+                stats["deleted"] += existed
+            else:
+                stats["updated" if existed else "inserted"] += 1
+                yield mc, change[0], change[1]
+            i += existed
+            j += 1
+
+    try:
+        _write_snapshot(snapshot_path, merged(), as_of or time.time())
+    finally:
+        snapshot.close()
+    logger.info(f"Census diff applied: {stats}")
+    return stats
+
+
+class CensusSnapshot:
+    """Read-only, memory-mapped view of a census snapshot file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, byteorder, count, as_of = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"Not a census snapshot (or unsupported version): {path}")
+        if byteorder != BYTEORDER:
+            self.close()
+            raise ValueError(f"Census snapshot byte order does not match this machine: {path}")
+        self.count = count
+        self.as_of = as_of
+        self.mtime = os.path.getmtime(path)
+        self._view = view = memoryview(self._mmap)
+        offset = HEADER.size
+        self.mcs = view[offset:offset + 4 * count].cast("I")
+        offset += 4 * count
+        self.oos_days = view[offset:offset + 2 * count].cast("H")
+        offset += 2 * count
+        self.flags = view[offset:offset + count]
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        for name in ("mcs", "oos_days", "flags", "_view"):
+            view = getattr(self, name, None)
+            if view is not None:
+                view.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass
+        self._file.close()
+
+    def age_seconds(self) -> float:
+        return time.time() - self.as_of
+
+    def lookup(self, mc_number: int) -> Optional[Dict]:
+        """Binary search for an MC number; None if the carrier isn't in the census"""
+        index = bisect_left(self.mcs, mc_number)
+        if index >= self.count or self.mcs[index] != mc_number:
+            return None
+        flags = self.flags[index]
+        oos_day = self.oos_days[index]
+        return {
+            "active": bool(flags & FLAG_ACTIVE),
+            "out_of_service": bool(flags & FLAG_OUT_OF_SERVICE),
+            "out_of_service_date": (EPOCH + datetime.timedelta(days=oos_day)).isoformat() if oos_day > 1 else None,
+            "as_of": datetime.datetime.fromtimestamp(self.as_of, datetime.timezone.utc).date().isoformat(),
+        }
+
+
+class CensusIndex:
+    """Process-wide snapshot holder that reopens the file when it is replaced"""
+
+    RELOAD_CHECK_SECONDS = 60
+
+    def __init__(self, path: str, max_age_days: float):
+        self.path = path
+        self.max_age_seconds = max_age_days * 86400
+        self._snapshot = None
+        # monotonic() counts from boot, so 0.0 would skip the first load for a minute of uptime
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> Optional[CensusSnapshot]:
+        now = time.monotonic()
+        if now - self._checked_at >= self.RELOAD_CHECK_SECONDS:
+            with self._lock:
+                if now - self._checked_at >= self.RELOAD_CHECK_SECONDS:
+                    self._checked_at = now
+                    self._reload_if_changed()
+        return self._snapshot
+
+    def _reload_if_changed(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            self._snapshot = None
+            return
+        if self._snapshot is None or self._snapshot.mtime != mtime:
+            try:
+                # The old mapping is left to the GC; in-flight lookups may still use it
+                self._snapshot = CensusSnapshot(self.path)
+                logger.info(f"Loaded census snapshot with {len(self._snapshot)} carriers")
+            except (OSError, ValueError) as e:
+                logger.error(f"Failed to load census snapshot: {e}")
+                self._snapshot = None
+
+    def lookup(self, mc_number: str, allow_stale: bool = False) -> Optional[Dict]:
+        """Census record for a numeric MC string; stale snapshots only if allowed"""
+        snapshot = self.snapshot()
+        if snapshot is None or not mc_number.isdigit():
+            return None
+        if not allow_stale and snapshot.age_seconds() > self.max_age_seconds:
+            return None
+        return snapshot.lookup(int(mc_number))
+
+
+_index = None
+
+
+def get_census_index() -> CensusIndex:
+    global _index
+    if _index is None:
+        from core.config import Config
+        _index = CensusIndex(Config.CENSUS_SNAPSHOT_PATH, Config.CENSUS_MAX_AGE_DAYS)
+    return _index
+
+
+def _parse_as_of(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    return datetime.datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=datetime.timezone.utc).timestamp()
+
+
+def main():
+    from core.config import Config
+
+    parser = argparse.ArgumentParser(description="FMCSA census snapshot tools")
+    parser.add_argument("--snapshot", default=Config.CENSUS_SNAPSHOT_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("import", "apply-diff"):
+        cmd = sub.add_parser(name)
+        cmd.add_argument("csv_path")
+        cmd.add_argument("--as-of", default=None, help="Date the data was extracted (YYYY-MM-DD)")
+    lookup = sub.add_parser("lookup")
+    lookup.add_argument("mc_number")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        print(f"Imported {import_census(args.csv_path, args.snapshot, _parse_as_of(args.as_of))} carriers")
+    elif args.command == "apply-diff":
+        print(f"Applied diff: {apply_diff(args.csv_path, args.snapshot, _parse_as_of(args.as_of))}")
+    else:
+        snapshot = CensusSnapshot(args.snapshot)
+        mc = _parse_mc(args.mc_number)
+        print(snapshot.lookup(mc) if mc is not None else "Invalid MC number")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,18 @@
 import requests
 import os
 import time
-from typing import Dict, Optional
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, Optional
 import logging
+import threading
 from core.config import Config
+from core.circuit_breaker import CircuitBreaker, register as register_breaker
+from core.rate_limit import TokenBucket
+from services.census import get_census_index
+from core import memory
+from core.cache import BoundedCache
+from core.shared_store import SharedCache, get_shared_store
+from core.metrics import CACHE_REQUESTS, CIRCUIT_REJECTIONS, FMCSA_FALLBACKS, FMCSA_REQUEST_DURATION, FMCSA_RETRIES
 
 # Configure logging
 logging.basicConfig(level=getattr(logging, Config.LOG_LEVEL))
@@ -15,22 +24,81 @@ class FMCSAService:
         if not self.api_token:
             raise ValueError("FMCSA_API_TOKEN environment variable is required")
         self.base_url = Config.FMCSA_BASE_URL
-        self._cache = {}  # Simple in-memory cache
-        self._cache_ttl = 300  # 5 minutes cache
+        # In-memory LRU, or a SQLite-backed cache shared by all workers
+        shared_store = get_shared_store()
+        if shared_store:
+            self._cache = SharedCache(shared_store, "fmcsa")
+        else:
+            self._cache = BoundedCache("fmcsa", Config.FMCSA_CACHE_MAX_ENTRIES)
+        self._cache_ttl = Config.FMCSA_CACHE_TTL_SECONDS
+        self._session = None
+        # Shared by every bulk request in this process, so concurrent requests don't each get
+        # the full rate; with several workers each takes an equal share of it
+        self.bulk_bucket = TokenBucket(Config.FMCSA_BULK_RATE_LIMIT / max(1, Config.WORKERS),
+                                       Config.FMCSA_BULK_CONCURRENCY)
+        # Stops calling FMCSA while it's failing; also sizes per-attempt timeouts
+        self.breaker = CircuitBreaker(
+            "fmcsa",
+            failure_threshold=Config.FMCSA_BREAKER_FAILURES,
+            reset_timeout=Config.FMCSA_BREAKER_RESET_SECONDS,
+            latency_budget=Config.FMCSA_LATENCY_BUDGET,
+            min_timeout=Config.FMCSA_TIMEOUT_MIN,
+            max_timeout=Config.FMCSA_TIMEOUT_MAX,
+        )
+
+    @property
+    def session(self) -> requests.Session:
+        """HTTP session with connection pooling, created on first use"""
+        if self._session is None:
+            self._session = requests.Session()
+        return self._session
+
+    @staticmethod
+    def _clean_mc_number(mc_number) -> str:
+        """Normalize str/int/float MC numbers and strip an MC/MC- prefix"""
+        # Convert to string if it's a number
+        if isinstance(mc_number, (int, float)):
+            mc_number = str(int(mc_number))
+        elif not isinstance(mc_number, str):
+            mc_number = str(mc_number)
+        return mc_number.replace('MC-', '').replace('MC', '').strip()
 
-    def verify_mc_number(self, mc_number) -> Dict:
+    def _get_cached(self, clean_mc: str, prefix: str = "mc") -> Optional[Dict]:
+        """Fresh cached verification (or ``profile``) for a cleaned MC number, if any"""
+        key = f"{prefix}_{clean_mc}"
+        cached = self._cache.get(key)
+        if cached is not None:
+            cached_result, cached_time = cached
+            if time.time() - cached_time < self._cache_ttl:
+                return cached_result
+            # Stale: drop it now rather than hold it until it's refreshed or evicted
+            try:
+                del self._cache[key]
+            except KeyError:
+                pass
+        return None
+
+    def memory_usage(self) -> Dict:
+        """Entry count and bytes of the verification/profile cache"""
+        if isinstance(self._cache, SharedCache):
+            # Lives in the SQLite file, not in this process
+            return {"backend": "shared", "entries": len(self._cache)}
+        return {"backend": "memory", "entries": len(self._cache), "max_entries": self._cache.max_entries,
+                "bytes": memory.deep_sizeof(self._cache)}
+
+    def verify_mc_number(self, mc_number, deadline: Optional[float] = None) -> Dict:
         """
         Verify MC number using FMCSA API (docket-number endpoint)
         Accepts both string and numeric MC numbers
+        
+        ``deadline`` is a ``time.monotonic()`` timestamp by which the caller
+        needs an answer (default: ``FMCSA_DEADLINE_SECONDS`` from now). Retries
+        and timeouts are trimmed to fit it, falling back once it's spent.
         """
+        if deadline is None:
+            deadline = time.monotonic() + Config.FMCSA_DEADLINE_SECONDS
         try:
-            # Convert to string if it's a number
-            if isinstance(mc_number, (int, float)):
-                mc_number = str(int(mc_number))
-            elif not isinstance(mc_number, str):
-                mc_number = str(mc_number)
-            
-            clean_mc = mc_number.replace('MC-', '').replace('MC', '').strip()
+            clean_mc = self._clean_mc_number(mc_number)
             
             # Validate MC number format before API call
             if not clean_mc.isdigit():
@@ -44,11 +112,18 @@ class FMCSAService:
             
             # Check cache first
             cache_key = f"mc_{clean_mc}"
-            if cache_key in self._cache:
-                cached_result, cached_time = self._cache[cache_key]
-                if time.time() - cached_time < self._cache_ttl:
-                    logger.info(f"Using cached result for MC: {clean_mc}")
-                    return cached_result
+            cached_result = self._get_cached(clean_mc)
+            if cached_result is not None:
+                logger.info(f"Using cached result for MC: {clean_mc}")
+                CACHE_REQUESTS.inc("fmcsa", "hit")
+                return cached_result
+            CACHE_REQUESTS.inc("fmcsa", "miss")
+            
+            # A fresh census snapshot answers in microseconds; only misses go live
+            census_record = get_census_index().lookup(clean_mc)
+            if census_record is not None:
+                CACHE_REQUESTS.inc("census", "hit")
+                return self._census_result(clean_mc, census_record, "verified")
             url = f"{self.base_url}/docket-number/{clean_mc}?webKey={self.api_token}"
 
             headers = {
@@ -58,31 +133,50 @@ class FMCSAService:
 
             logger.info(f"Querying FMCSA API for MC: {clean_mc}")
             
-            # Retry logic for transient errors
+            # Retry logic for transient errors, bounded by the breaker and the deadline
             max_retries = 2
             for attempt in range(max_retries + 1):
+                remaining = deadline - time.monotonic()
+                if remaining < self.breaker.min_timeout:
+                    logger.warning(f"FMCSA deadline exhausted after {attempt} attempts for MC: {clean_mc}")
+                    return self._intelligent_fallback_verification(clean_mc, "Deadline exceeded")
+                if not self.breaker.allow_request():
+                    CIRCUIT_REJECTIONS.inc("fmcsa")
+                    logger.warning(f"FMCSA circuit open, skipping API call for MC: {clean_mc}")
+                    return self._intelligent_fallback_verification(clean_mc, "FMCSA circuit open")
                 try:
-                    start_time = time.time()
-                    response = requests.get(url, headers=headers, timeout=5)
-                    end_time = time.time()
+                    start_time = time.perf_counter()
+                    response = self.session.get(url, headers=headers, timeout=min(self.breaker.timeout(), remaining))
+                    end_time = time.perf_counter()
                     logger.info(f"FMCSA API response time: {end_time - start_time:.2f} seconds (attempt {attempt + 1})")
+                    FMCSA_REQUEST_DURATION.observe(end_time - start_time, str(response.status_code))
+                    if response.status_code >= 500:
+                        self.breaker.record_failure()
+                    else:
+                        self.breaker.record_success(end_time - start_time)
                     
                     # If we get a response, break out of retry loop
                     break
                     
                 except requests.exceptions.Timeout:
                     logger.warning(f"FMCSA API timeout on attempt {attempt + 1}")
+                    FMCSA_REQUEST_DURATION.observe(time.perf_counter() - start_time, "timeout")
+                    self.breaker.record_failure()
                     if attempt == max_retries:
                         logger.error(f"FMCSA API timeout after {max_retries + 1} attempts for MC: {clean_mc}")
                         return self._intelligent_fallback_verification(clean_mc, "API timeout after retries")
-                    time.sleep(0.5 * (attempt + 1))  # Exponential backoff
+                    FMCSA_RETRIES.inc("timeout")
+                    self._backoff(attempt, deadline)
                     
                 except requests.exceptions.RequestException as e:
                     logger.warning(f"FMCSA API request error on attempt {attempt + 1}: {str(e)}")
+                    FMCSA_REQUEST_DURATION.observe(time.perf_counter() - start_time, "error")
+                    self.breaker.record_failure()
                     if attempt == max_retries:
                         logger.error(f"FMCSA API request failed after {max_retries + 1} attempts: {str(e)}")
                         return self._intelligent_fallback_verification(clean_mc, f"Request error: {str(e)}")
-                    time.sleep(0.5 * (attempt + 1))  # Exponential backoff
+                    FMCSA_RETRIES.inc("error")
+                    self._backoff(attempt, deadline)
 
             if response.status_code == 200:
                 data = response.json()
@@ -132,6 +226,59 @@ class FMCSAService:
             logger.error(f"Unexpected error in FMCSA verification: {str(e)}")
             return self._intelligent_fallback_verification(clean_mc, f"Unexpected error: {str(e)}")
 
+    @staticmethod
+    def _backoff(attempt: int, deadline: float):
+        """Linear backoff between retries, never sleeping past the deadline"""
+        time.sleep(max(0.0, min(0.5 * (attempt + 1), deadline - time.monotonic())))
+
+    def verify_mc_numbers(self, mc_numbers: Iterable, max_concurrency: int = None,
+                          rate_limit: float = None) -> Iterator[Dict]:
+        """
+        Verify many MC numbers, yielding each result as soon as it is available
+        
+        Duplicates are dropped, cached and malformed numbers are yielded
+        immediately, and cache misses fan out to FMCSA with at most
+        ``max_concurrency`` calls in flight. Calls draw on the service's
+        process-wide ``bulk_bucket`` (``FMCSA_BULK_RATE_LIMIT``) unless a
+        ``rate_limit`` (calls/second) is given for this call alone. Only
+        in-flight lookups are held in memory.
+        """
+        max_concurrency = max(1, max_concurrency or Config.FMCSA_BULK_CONCURRENCY)
+        bucket = TokenBucket(rate_limit, max_concurrency) if rate_limit else self.bulk_bucket
+        seen = set()
+        misses = []
+        for mc_number in mc_numbers:
+            clean_mc = self._clean_mc_number(mc_number)
+            if clean_mc in seen:
+                continue
+            seen.add(clean_mc)
+            if not clean_mc.isdigit():
+                yield {**self.verify_mc_number(clean_mc), "source": "validation"}
+                continue
+            cached_result = self._get_cached(clean_mc)
+            if cached_result is not None:
+                CACHE_REQUESTS.inc("fmcsa", "hit")
+                yield {**cached_result, "source": "cache"}
+            else:
+                misses.append(clean_mc)
+
+        if not misses:
+            return
+        logger.info(f"Bulk verification: {len(seen)} unique MC numbers, {len(misses)} cache misses")
+        with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="fmcsa-bulk") as pool:
+            pending = set()
+            for clean_mc in misses:
+                if len(pending) >= max_concurrency:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield {**future.result(), "source": "fmcsa"}
+                bucket.acquire()
+                pending.add(pool.submit(self.verify_mc_number, clean_mc))
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield {**future.result(), "source": "fmcsa"}
+
     def _process_carrier_data(self, carrier: Dict, mc_number: str) -> Dict:
         """Process FMCSA API carrier data dict"""
         try:
@@ -152,7 +299,10 @@ class FMCSAService:
                 "dba_name": dba_name,
                 "operating_status": operating_status,
                 "out_of_service_date": out_of_service_date,
-                "status": "verified"
+                "status": "verified",
+                # Needed for the DOT-keyed profile endpoints; free in the docket response
+                "dot_number": carrier.get('dotNumber'),
+                "safety_rating": carrier.get('safetyRating')
             }
 
             if not eligible:
@@ -170,8 +320,45 @@ class FMCSAService:
             logger.error(f"Error processing carrier data: {str(e)}")
             return self._fallback_verification(mc_number)
 
+    def _census_result(self, mc_number: str, record: Dict, status: str) -> Dict:
+        """Eligibility decision from a census snapshot record"""
+        eligible = record["active"] and not record["out_of_service"]
+        result = {
+            "eligible": eligible,
+            "mc_number": mc_number,
+            "legal_name": None,
+            "dba_name": None,
+            "operating_status": "A" if record["active"] else "I",
+            "out_of_service_date": record["out_of_service_date"],
+            "status": status,
+            "source": "census_snapshot",
+            "census_as_of": record["as_of"]
+        }
+        if not eligible:
+            reasons = []
+            if not record["active"]:
+                reasons.append("Operating status: inactive")
+            if record["out_of_service"]:
+                reasons.append(f"Out of service since: {record['out_of_service_date'] or 'unknown date'}")
+            result["rejection_reason"] = "; ".join(reasons)
+        return result
+
+    def _census_fallback(self, mc_number: str, reason: str) -> Optional[Dict]:
+        """Answer from the census snapshot (even if stale) instead of guessing"""
+        record = get_census_index().lookup(mc_number, allow_stale=True) if mc_number.isdigit() else None
+        if record is None:
+            return None
+        FMCSA_FALLBACKS.inc("census")
+        result = self._census_result(mc_number, record, "census_fallback")
+        result["fallback_reason"] = reason
+        return result
+
     def _intelligent_fallback_verification(self, mc_number: str, reason: str) -> Dict:
         """Intelligent fallback when FMCSA API has server errors"""
+        census_result = self._census_fallback(mc_number, reason)
+        if census_result is not None:
+            return census_result
+        FMCSA_FALLBACKS.inc("intelligent")
         # More sophisticated validation for known patterns
         if not mc_number.isdigit():
             return {
@@ -207,6 +394,10 @@ class FMCSAService:
 
     def _fallback_verification(self, mc_number: str) -> Dict:
         """Basic fallback verification when API is unavailable"""
+        census_result = self._census_fallback(mc_number, "FMCSA API unavailable")
+        if census_result is not None:
+            return census_result
+        FMCSA_FALLBACKS.inc("basic")
         # Basic validation - check if MC number is numeric and reasonable length
         if mc_number.isdigit() and 4 <= len(mc_number) <= 7:
             return {
@@ -223,30 +414,134 @@ class FMCSAService:
                 "message": "Invalid MC number format"
             }
 
-    def get_carrier_safety_rating(self, mc_number: str) -> Optional[str]:
-        """Get carrier safety rating from FMCSA"""
-        try:
-            clean_mc = mc_number.replace('MC-', '').replace('MC', '').strip()
-            url = f"{self.base_url}/{clean_mc}/operation-classification"
+    def get_carrier_profile(self, mc_number, deadline: Optional[float] = None) -> Dict:
+        """
+        Eligibility decision plus safety rating, authority and operation
+        classification, normalized into one record cached under ``profile_{mc}``
+        
+        The docket lookup (itself cached) supplies the DOT number; the authority
+        and operation-classification endpoints are then fetched concurrently.
+        Profiles are only cached when every part was fetched successfully.
+        All three lookups share one ``deadline`` (as for ``verify_mc_number``).
+        """
+        clean_mc = self._clean_mc_number(mc_number)
+        cached_profile = self._get_cached(clean_mc, prefix="profile")
+        if cached_profile is not None:
+            CACHE_REQUESTS.inc("fmcsa_profile", "hit")
+            return cached_profile
+        CACHE_REQUESTS.inc("fmcsa_profile", "miss")
 
-            headers = {
-                'Authorization': f'Bearer {self.api_token}',
-                'Accept': 'application/json'
-            }
+        if deadline is None:
+            deadline = time.monotonic() + Config.FMCSA_DEADLINE_SECONDS
+        verification = self.verify_mc_number(clean_mc, deadline=deadline)
+        profile = {"safety_rating": None, "authority": None, "operation_classification": [], **verification}
+        dot_number = verification.get("dot_number")
+        if verification.get("status") != "verified" or not dot_number:
+            # Not found, census-only or fallback answers: nothing more to look up
+            profile["profile_complete"] = False
+            return profile
 
-            response = requests.get(url, headers=headers, timeout=10)
+        # Whatever the docket lookup left of the deadline, not a fresh one
+        authority_future = _profile_pool().submit(self._fetch_dot_resource, dot_number, "authority", deadline)
+        classification_future = _profile_pool().submit(
+            self._fetch_dot_resource, dot_number, "operation-classification", deadline)
+        authority, classification = authority_future.result(), classification_future.result()
 
-            if response.status_code == 200:
-                data = response.json()
-                safety_rating = data.get('content', {}).get('safetyRating')
-                return safety_rating
-            else:
-                return None
+        if authority is not None:
+            profile["authority"] = self._normalize_authority(authority)
+        if classification is not None:
+            profile["operation_classification"] = sorted({
+                item.get("operationClassDesc") for item in classification if item.get("operationClassDesc")
+            })
+        profile["profile_complete"] = authority is not None and classification is not None
+        if profile["profile_complete"]:
+            self._cache[f"profile_{clean_mc}"] = (profile, time.time())
+        return profile
+
+    def _fetch_dot_resource(self, dot_number, resource: str, deadline: float) -> Optional[list]:
+        """GET ``/{dot}/{resource}`` content (as a list), or None on any failure"""
+        remaining = deadline - time.monotonic()
+        if remaining < self.breaker.min_timeout or not self.breaker.allow_request():
+            return None
+        url = f"{self.base_url}/{dot_number}/{resource}?webKey={self.api_token}"
+        start_time = time.perf_counter()
+        try:
+            response = self.session.get(url, headers={'Accept': 'application/json'},
+                                        timeout=min(self.breaker.timeout(), remaining))
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"FMCSA {resource} lookup failed for DOT {dot_number}: {str(e)}")
+            FMCSA_REQUEST_DURATION.observe(time.perf_counter() - start_time, "error")
+            self.breaker.record_failure()
+            return None
+        elapsed = time.perf_counter() - start_time
+        FMCSA_REQUEST_DURATION.observe(elapsed, str(response.status_code))
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+            return None
+        self.breaker.record_success(elapsed)
+        if response.status_code == 404:
+            return []
+        if response.status_code != 200:
+            return None
+        try:
+            content = response.json().get('content') or []
+        except ValueError:
+            return None
+        return content if isinstance(content, list) else [content]
+
+    @staticmethod
+    def _normalize_authority(content: list) -> Dict:
+        """Collapse FMCSA carrierAuthority records into A/I/N status per authority type"""
+        # Active beats inactive beats none when several records disagree
+        rank = {"A": 0, "I": 1, "N": 2}
+        authority = {"common": "N", "contract": "N", "broker": "N", "authorized_for_hire": False}
+        for item in content:
+            record = item.get('carrierAuthority', item)
+            for key in ("common", "contract", "broker"):
+                status = (record.get(f"{key}AuthorityStatus") or "N").upper()
+                if rank.get(status, 2) < rank[authority[key]]:
+                    authority[key] = status
+            authority["authorized_for_hire"] = authority["authorized_for_hire"] or bool(record.get('authorizedForHire'))
+        return authority
 
+    def get_carrier_safety_rating(self, mc_number: str) -> Optional[str]:
+        """Get carrier safety rating from FMCSA (served from the carrier profile)"""
+        try:
+            return self.get_carrier_profile(mc_number).get("safety_rating")
         except Exception as e:
             logger.error(f"Error getting safety rating: {str(e)}")
             return None
 
+_profile_executor = None
+_profile_executor_lock = threading.Lock()
+
+def _profile_pool() -> ThreadPoolExecutor:
+    """Shared pool for concurrent profile sub-requests"""
+    global _profile_executor
+    if _profile_executor is None:
+        with _profile_executor_lock:
+            if _profile_executor is None:
+                _profile_executor = ThreadPoolExecutor(
+                    max_workers=2 * Config.FMCSA_BULK_CONCURRENCY, thread_name_prefix="fmcsa-profile")
+    return _profile_executor
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_fmcsa_service() -> FMCSAService:
+    """Process-wide FMCSAService, constructed lazily on first use"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                service = FMCSAService()
+                # /health/upstreams reports the breaker requests actually go through
+                register_breaker(service.breaker)
+                _service = service
+    return _service
+
+memory.register("fmcsa_cache", lambda: _service.memory_usage() if _service is not None else None)
+
 # Legacy function for backward compatibility
 def verify_mc_number(mc_number: str) -> bool:
     """Legacy function - returns boolean for backward compatibility"""
@@ -0,0 +1,82 @@
+"""
+Load Expiry Module
+Removes loads from the board once their pickup time has passed
+
+The load table keeps a min-heap of pickup times, so finding what is due is
+a peek at the top of the heap and each expired load costs one O(log n) pop;
+the board is never scanned. A daemon thread sleeps until the next pickup
+time (at most ``max_sleep`` seconds, so newly added loads are picked up)
+and deletes due loads through the repository, so the deletions are logged
+and replicated to other workers like any other change.
+
+Pickup times are naive local times, compared with the server's local clock
+minus a grace period.
+"""
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from core.metrics import LOADS_EXPIRED
+
+logger = logging.getLogger(__name__)
+
+
+class LoadExpirySweeper:
+    """Background thread deleting loads whose pickup time (plus grace) has passed"""
+
+    def __init__(self, get_repository: Callable, grace: timedelta = timedelta(0), max_sleep: float = 60.0,
+                 clock: Callable[[], datetime] = datetime.now):
+        self.get_repository = get_repository
+        self.grace = grace
+        self.max_sleep = max_sleep
+        self.clock = clock
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def sweep(self) -> int:
+        """Delete every load that is due now; returns how many"""
+        repository = self.get_repository()
+        repository.refresh()
+        expired = repository.expire(self.clock() - self.grace)
+        if expired:
+            LOADS_EXPIRED.inc(amount=len(expired))
+            logger.info(f"⏰ Expired {len(expired)} loads past pickup: {expired[:5]}")
+        return len(expired)
+
+    def seconds_until_next(self) -> float:
+        next_expiry = self.get_repository().table.next_expiry()
+        if next_expiry is None:
+            return self.max_sleep
+        due_in = (next_expiry + self.grace - self.clock()).total_seconds()
+        return min(self.max_sleep, max(due_in, 0.0))
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+                wait = self.seconds_until_next()
+            except Exception as e:
+                logger.warning(f"Load expiry sweep failed: {e}")
+                wait = self.max_sleep
+            # Several loads often share a pickup time; a short floor batches them into one sweep
+            self._stop.wait(max(wait, 1.0))
+
+    def start(self) -> threading.Thread:
+        self._thread = threading.Thread(target=self.run, name="load-expiry", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def start_expiry_sweeper() -> LoadExpirySweeper:
+    """Start the sweeper over the API's load repository"""
+    from api.loads import get_load_repository
+    from core.config import Config
+    sweeper = LoadExpirySweeper(get_load_repository, grace=timedelta(minutes=Config.LOAD_EXPIRY_GRACE_MINUTES))
+    sweeper.start()
+    return sweeper
@@ -0,0 +1,222 @@
+"""
+Load Repository Module
+Durable load board mutations: snapshot + write-ahead log + versioning
+
+The snapshot is the load board file (``LOADS_PATH``). Every create, update
+or delete is appended to a write-ahead log (``<snapshot>.wal``, one JSON
+op per line, fsynced) and applied to the in-memory ``LoadTable`` in O(1):
+no re-ingest, no index rebuild. After ``compact_every`` ops the table is
+written back as a new snapshot, the log is truncated and the table is
+rebuilt from its live rows, dropping the rows deletes left behind.
+
+Workers sharing the files stay in sync: a grown log is tailed from the last
+applied offset, and a replaced snapshot triggers a full reload. Appends and
+compaction hold an exclusive ``flock`` on the log.
+
+The board version is ``<snapshot mtime>.<ops applied since snapshot>``; all
+workers derive the same value from the same files, so it is used as the
+``ETag`` for ``/loads``.
+"""
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from services.load_store import ingest, validate_load
+from services.load_table import LoadTable
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX development machines
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COMPACT_EVERY = 1000
+
+
+class LoadNotFoundError(KeyError):
+    """No load with this id"""
+
+
+class LoadConflictError(ValueError):
+    """A load with this id already exists"""
+
+
+class LoadRepository:
+    """Owns the LoadTable for one snapshot/WAL pair"""
+
+    def __init__(self, snapshot_path: str, wal_path: Optional[str] = None,
+                 compact_every: int = DEFAULT_COMPACT_EVERY):
+        self.snapshot_path = snapshot_path
+        self.wal_path = wal_path or snapshot_path + ".wal"
+        self.compact_every = compact_every
+        self.table = LoadTable()
+        self.version = 0
+        self._snapshot_mtime_ns = None
+        self._wal_offset = 0
+        self._lock = threading.RLock()
+
+    # Reading
+    def _stat(self):
+        try:
+            snapshot_mtime_ns = os.stat(self.snapshot_path).st_mtime_ns
+        except FileNotFoundError:
+            snapshot_mtime_ns = None  # empty board until the first compaction writes one
+        try:
+            wal_size = os.stat(self.wal_path).st_size
+        except FileNotFoundError:
+            wal_size = 0
+        return snapshot_mtime_ns, wal_size
+
+    def is_current(self) -> bool:
+        """True if the files haven't changed since the table was last synced (two stat calls)"""
+        return self._stat() == (self._snapshot_mtime_ns, self._wal_offset)
+
+    def refresh(self) -> LoadTable:
+        """Bring the table up to date with the files and return it"""
+        if not self.is_current():
+            with self._lock:
+                self._sync()
+        return self.table
+
+    def _sync(self):
+        # Caller holds self._lock
+        snapshot_mtime_ns, wal_size = self._stat()
+        if snapshot_mtime_ns != self._snapshot_mtime_ns or wal_size < self._wal_offset:
+            table = LoadTable()
+            if snapshot_mtime_ns is not None:
+                table, report = ingest(self.snapshot_path, table)
+                logger.info(f"Ingested {len(table)} loads from {self.snapshot_path} ({report['rejected']} rejected)")
+            self.table, self.version, self._wal_offset = table, 0, 0
+            self._snapshot_mtime_ns = snapshot_mtime_ns
+        if wal_size > self._wal_offset:
+            self._replay_wal()
+
+    def _replay_wal(self):
+        """Apply complete log lines past the last applied offset"""
+        with open(self.wal_path, "rb") as f:
+            f.seek(self._wal_offset)
+            data = f.read()
+        # A writer may be mid-line; only consume up to the last newline
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            if line.strip():
+                self._apply(json.loads(line))
+        self._wal_offset += end
+
+    def _apply(self, op: Dict):
+        if op["op"] == "put":
+            self.table.add(validate_load(op["load"]))
+        elif op["op"] == "delete":
+            self.table.delete(op["load_id"])
+        self.version += 1
+
+    @property
+    def etag(self) -> str:
+        return f'"{self._snapshot_mtime_ns or 0:x}.{self.version}"'
+
+    # Writing
+    @contextmanager
+    def _wal_locked(self):
+        """Exclusive access to the log across threads and worker processes"""
+        with self._lock:
+            with open(self.wal_path, "ab") as wal:
+                if fcntl is not None:
+                    fcntl.flock(wal.fileno(), fcntl.LOCK_EX)
+                try:
+                    # Peers may have appended (or compacted) before we got the lock
+                    self._sync()
+                    yield wal
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(wal.fileno(), fcntl.LOCK_UN)
+
+    def _commit(self, wal, *ops: Dict):
+        """Append ops to the log with one fsync, then apply them"""
+        if os.fstat(wal.fileno()).st_size != self._wal_offset:
+            # Only a writer that crashed mid-line leaves bytes we didn't apply
+            logger.warning(f"Truncating torn write at the end of {self.wal_path}")
+            wal.truncate(self._wal_offset)
+        data = "".join(json.dumps(op, ensure_ascii=False) + "\n" for op in ops).encode("utf-8")
+        wal.write(data)
+        wal.flush()
+        os.fsync(wal.fileno())
+        for op in ops:
+            self._apply(op)
+        self._wal_offset += len(data)
+
+    def create(self, record: Dict) -> Dict:
+        load = validate_load(dict(record))
+        with self._wal_locked() as wal:
+            if self.table.get(load["load_id"]) is not None:
+                raise LoadConflictError(f"Load {load['load_id']} already exists")
+            self._commit(wal, {"op": "put", "load": load})
+        self._maybe_compact()
+        return self.table.get(load["load_id"])
+
+    def update(self, load_id: str, changes: Dict) -> Dict:
+        """Merge ``changes`` into a load; null removes an optional field"""
+        if changes.get("load_id", load_id) != load_id:
+            raise ValueError("load_id cannot be changed")
+        with self._wal_locked() as wal:
+            current = self.table.get(load_id)
+            if current is None:
+                raise LoadNotFoundError(load_id)
+            merged = {**current, **changes}
+            load = validate_load({k: v for k, v in merged.items() if v is not None})
+            self._commit(wal, {"op": "put", "load": load})
+        self._maybe_compact()
+        return self.table.get(load_id)
+
+    def delete(self, load_id: str):
+        with self._wal_locked() as wal:
+            if self.table.get(load_id) is None:
+                raise LoadNotFoundError(load_id)
+            self._commit(wal, {"op": "delete", "load_id": load_id})
+        self._maybe_compact()
+
+    def expire(self, now: datetime) -> List[str]:
+        """Delete every load whose pickup time is at or before ``now``; returns their ids"""
+        next_expiry = self.table.next_expiry()
+        if next_expiry is None or next_expiry > now:
+            return []  # nothing due: skip the file lock
+        with self._wal_locked() as wal:
+            expired = self.table.pop_expired(now)
+            if expired:
+                self._commit(wal, *({"op": "delete", "load_id": load_id} for load_id in expired))
+        self._maybe_compact()
+        return expired
+
+    def _maybe_compact(self):
+        if self.version >= self.compact_every:
+            self.compact()
+
+    def compact(self):
+        """Write the table back as the snapshot (same format) and truncate the log"""
+        with self._wal_locked() as wal:
+            if self.version == 0:
+                return
+            tmp_path = f"{self.snapshot_path}.tmp.{os.getpid()}"
+            loads = self.table.rows()
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                if self.snapshot_path.endswith((".ndjson", ".jsonl")):
+                    f.writelines(json.dumps(load, ensure_ascii=False) + "\n" for load in loads)
+                else:
+                    json.dump(loads, f, indent=2, ensure_ascii=False)
+                    f.write("\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            wal.truncate(0)
+            logger.info(f"Compacted {self.version} load changes into {self.snapshot_path}")
+            # Deleted and expired loads leave tombstoned rows that every search still
+            # scans; rebuild from the live rows written above (no re-read of the file)
+            if self.table.dead_rows:
+                self.table = LoadTable.from_records(loads)
+            self._snapshot_mtime_ns = os.stat(self.snapshot_path).st_mtime_ns
+            self._wal_offset = 0
+            self.version = 0
@@ -0,0 +1,251 @@
+"""
+Load Store Module
+Streaming ingestion of load boards into an indexed in-memory store
+
+TMS exports can hold hundreds of thousands of loads. Instead of
+``json.load`` on the whole file (the raw text plus every parsed object alive
+at once), records are decoded one at a time from a JSON array or NDJSON
+stream, validated against ``LOAD_SCHEMA`` and added to the store and its
+indexes immediately. Peak memory is the stored loads plus one read chunk.
+
+Usage:
+    python -m services.load_store check data/loads.json
+"""
+import argparse
+import json
+import logging
+import re
+import sys
+from bisect import insort
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+MAX_REPORTED_ERRORS = 20
+
+# field -> (accepted types, required), in data/loads.json field order
+LOAD_SCHEMA = {
+    "load_id": ((str,), True),
+    "origin": ((str,), True),
+    "destination": ((str,), True),
+    "pickup_datetime": ((str,), False),
+    "delivery_datetime": ((str,), False),
+    "equipment_type": ((str,), True),
+    "loadboard_rate": ((int, float), True),
+    "notes": ((str,), False),
+    "weight": ((int, float), False),
+    "commodity_type": ((str,), False),
+    "num_of_pieces": ((int,), False),
+    "miles": ((int, float), False),
+    "dimensions": ((str,), False),
+}
+# Low-cardinality fields whose strings are shared between records
+CATEGORICAL_FIELDS = ("origin", "destination", "equipment_type", "commodity_type", "dimensions")
+
+_WHITESPACE = re.compile(r"\s*")
+
+
+class LoadValidationError(ValueError):
+    """A record that doesn't match LOAD_SCHEMA"""
+
+
+def validate_load(record) -> Dict:
+    """Check a decoded record against LOAD_SCHEMA; unknown fields are kept as-is"""
+    if not isinstance(record, dict):
+        raise LoadValidationError(f"expected an object, got {type(record).__name__}")
+    for field, (types, required) in LOAD_SCHEMA.items():
+        value = record.get(field)
+        if value is None:
+            if required:
+                raise LoadValidationError(f"missing required field '{field}'")
+            continue
+        # bool is an int subclass but never a valid weight or rate
+        if isinstance(value, bool) or not isinstance(value, types):
+            raise LoadValidationError(
+                f"field '{field}' must be {'/'.join(t.__name__ for t in types)}, got {type(value).__name__}")
+    if not record["load_id"].strip():
+        raise LoadValidationError("field 'load_id' must not be empty")
+    # Each raw_decode call gets fresh key strings (json.load shares them across the
+    # whole document); intern keys and categorical values so records share them
+    return {
+        sys.intern(key): sys.intern(value) if key in CATEGORICAL_FIELDS and isinstance(value, str) else value
+        for key, value in record.items()
+    }
+
+
+class _StreamReader:
+    """Incremental JSON value decoder over a text stream"""
+
+    def __init__(self, f, chunk_size: int):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop consumed text so the buffer stays around one record plus one chunk
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character ("" at end of stream)"""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def decode(self):
+        self.peek()  # raw_decode doesn't skip leading whitespace
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # Most likely a record split across chunks
+                if self._fill():
+                    continue
+                raise
+            if end == len(self.buffer) and not self.eof and self._fill():
+                continue  # a trailing number may continue in the next chunk
+            self.pos = end
+            return value
+
+
+def iter_json_records(f, chunk_size: int = CHUNK_SIZE) -> Iterator:
+    """Yield the elements of a top-level JSON array, or the values of an NDJSON stream"""
+    reader = _StreamReader(f, chunk_size)
+    first = reader.peek()
+    if not first:
+        return
+    if first != "[":
+        while reader.peek():
+            yield reader.decode()
+        return
+    reader.pos += 1
+    if reader.peek() == "]":
+        return
+    while True:
+        yield reader.decode()
+        separator = reader.peek()
+        if separator == ",":
+            reader.pos += 1
+        elif separator == "]":
+            return
+        else:
+            raise ValueError(f"Expected ',' or ']' in JSON array, got {separator or 'end of file'!r}")
+
+
+class LoadStore:
+    """Loads in board order with load_id and equipment-type indexes"""
+
+    def __init__(self):
+        self.loads: List[Dict] = []
+        self._by_id: Dict[str, int] = {}
+        self._by_equipment: Dict[str, List[int]] = {}
+
+    @classmethod
+    def from_records(cls, records) -> "LoadStore":
+        """Build a store from already-validated records (tests, benchmarks)"""
+        store = cls()
+        for record in records:
+            store.add(record)
+        return store
+
+    def __len__(self) -> int:
+        return len(self.loads)
+
+    def add(self, load: Dict) -> bool:
+        """Insert a load, replacing any load with the same id; returns True if replaced"""
+        equipment = load["equipment_type"].lower()
+        position = self._by_id.get(load["load_id"])
+        if position is None:
+            position = len(self.loads)
+            self.loads.append(load)
+            self._by_id[load["load_id"]] = position
+            self._by_equipment.setdefault(equipment, []).append(position)
+            return False
+        previous = self.loads[position]["equipment_type"].lower()
+        self.loads[position] = load
+        if previous != equipment:
+            self._by_equipment[previous].remove(position)
+            insort(self._by_equipment.setdefault(equipment, []), position)
+        return True
+
+    def get(self, load_id: str) -> Optional[Dict]:
+        position = self._by_id.get(load_id)
+        return self.loads[position] if position is not None else None
+
+    def by_equipment(self, equipment_type: Optional[str] = None) -> List[Dict]:
+        """Loads with this equipment type (case-insensitive), in board order; all loads if None"""
+        if not equipment_type:
+            return self.loads
+        return [self.loads[i] for i in self._by_equipment.get(equipment_type.lower(), ())]
+
+    def search(self, equipment_type: Optional[str] = None, origin: Optional[str] = None,
+               destination: Optional[str] = None, exclude: Iterable[str] = ()) -> List[Dict]:
+        """Exact (case-insensitive) equipment match, substring origin/destination match"""
+        results = self.by_equipment(equipment_type)
+        if exclude:
+            results = [l for l in results if l["load_id"] not in exclude]
+        if origin:
+            results = [l for l in results if origin.lower() in l["origin"].lower()]
+        if destination:
+            results = [l for l in results if destination.lower() in l["destination"].lower()]
+        return results
+
+    def rows(self) -> List[Dict]:
+        return self.loads
+
+
+def ingest(source: Union[str, TextIO], store: Optional[LoadStore] = None,
+           chunk_size: int = CHUNK_SIZE) -> Tuple[LoadStore, Dict]:
+    """
+    Stream a JSON array or NDJSON file (path or text file object) into a LoadStore
+
+    Records failing validation are skipped and reported; malformed JSON
+    aborts the ingest with ``ValueError``.
+    """
+    store = store if store is not None else LoadStore()
+    report = {"loaded": 0, "replaced": 0, "rejected": 0, "errors": []}
+    f = open(source, encoding="utf-8") if isinstance(source, str) else source
+    try:
+        for index, record in enumerate(iter_json_records(f, chunk_size)):
+            try:
+                load = validate_load(record)
+            except LoadValidationError as e:
+                report["rejected"] += 1
+                if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                    report["errors"].append(f"record {index}: {e}")
+                continue
+            report["replaced" if store.add(load) else "loaded"] += 1
+    finally:
+        if isinstance(source, str):
+            f.close()
+    if report["rejected"]:
+        logger.warning(f"Load ingest skipped {report['rejected']} invalid records: {report['errors'][:3]}")
+    return store, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load board ingestion tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    check = sub.add_parser("check", help="Validate a JSON array / NDJSON board and report")
+    check.add_argument("path")
+    args = parser.parse_args()
+
+    store, report = ingest(args.path)
+    print(json.dumps({**report, "stored": len(store)}, indent=2))
+    sys.exit(1 if report["rejected"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,585 @@
+"""
+Load Table Module
+Compact columnar representation of the load board
+
+Loads are held column-wise instead of as one dict per load:
+
+- string fields are dictionary-encoded: each distinct value ("Dry Van",
+  "Chicago, IL") is stored once and rows hold an int32 code
+- free-text notes are nearly all distinct, so they are kept per row in an
+  object array rather than growing a dictionary that never shrinks
+- rate, weight, miles and piece counts are float64 arrays (NaN = missing),
+  with a per-row bit remembering which values were JSON floats
+- pickup/delivery times are datetime64[s] arrays (NaT = missing), with a
+  sorted index per column for time-window queries (built on the first
+  query, then kept in order by each add and delete) and a min-heap of
+  pickup times for expiry
+
+Searches are vectorized: a filter is resolved against the (small) category
+dictionary first and then applied to the code array as a mask. A time
+window narrows the search to the rows it covers first, so the other filters
+only look at those rows instead of the whole table. Origins and
+destinations that match nothing as typed are retried with fuzzy place
+matching (``services.place_match``) over the dictionary's distinct values. Rows are
+turned back into dicts only for the loads actually returned, with the same
+keys and types as the ingested JSON (schema fields in ``LOAD_SCHEMA`` order).
+Values that don't fit a column (unknown fields, explicit nulls,
+non-canonical timestamps) are kept per row.
+
+The repository writes to the live table while requests search it, so
+writes (``add``, ``delete``, ``pop_expired``) hold a write lock and queries
+a shared read lock: a query never sees a half-grown array or a half-written
+row, and queries don't block each other.
+"""
+import bisect
+import heapq
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from core.memory import deep_sizeof
+from core.responses import dumps
+from services.load_store import LOAD_SCHEMA
+from services.place_match import PlaceIndex, is_alias
+
+CATEGORICAL_COLUMNS = ("origin", "destination", "equipment_type", "commodity_type", "dimensions")
+TEXT_COLUMNS = ("notes",)
+NUMERIC_COLUMNS = ("loadboard_rate", "weight", "miles", "num_of_pieces")
+TIMESTAMP_COLUMNS = ("pickup_datetime", "delivery_datetime")
+FIELD_ORDER = tuple(LOAD_SCHEMA)
+
+# Timestamps stored as datetime64 must format back to exactly the same string
+_CANONICAL_TIMESTAMP = re.compile(r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}$")
+_NAT = np.datetime64("NaT", "s")
+_MISSING = object()
+INITIAL_CAPACITY = 1024
+_ROW_BITS = 32
+_ROW_MASK = (1 << _ROW_BITS) - 1
+# Serialized loads kept for fast JSON responses (LRU, ~400 bytes each)
+FRAGMENT_CACHE_SIZE = 50_000
+
+
+class _Dictionary:
+    """Distinct values of one string column, addressed by int32 code"""
+
+    __slots__ = ("values", "_codes", "_lower", "_array", "_places", "_places_lock")
+
+    def __init__(self):
+        self.values: List[str] = []
+        self._codes: Dict[str, int] = {}
+        self._lower: List[str] = []
+        self._array = None
+        self._places: Optional[PlaceIndex] = None
+        self._places_lock = threading.Lock()
+
+    def encode(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+            self._lower.append(value.lower())
+            self._array = None
+            if self._places is not None:
+                with self._places_lock:
+                    self._places.add(code, value)
+        return code
+
+    def decode(self, codes: np.ndarray) -> List[str]:
+        """Values for an array of codes (vectorized take); -1 codes decode to garbage"""
+        if not self.values:
+            return [None] * len(codes)
+        if self._array is None:
+            self._array = np.array(self.values, dtype=object)
+        return self._array[codes].tolist()
+
+    def codes_equal(self, query: str) -> np.ndarray:
+        query = query.lower()
+        return np.fromiter((i for i, v in enumerate(self._lower) if v == query), dtype=np.int32)
+
+    def codes_containing(self, query: str) -> np.ndarray:
+        query = query.lower()
+        return np.fromiter((i for i, v in enumerate(self._lower) if query in v), dtype=np.int32)
+
+    def codes_similar(self, query: str) -> np.ndarray:
+        """Codes of place names similar to ``query`` (typos, aliases, "St."/"Saint")"""
+        if self._places is None:
+            # Built on first use, then maintained by encode()
+            with self._places_lock:
+                if self._places is None:
+                    places = PlaceIndex()
+                    for code, value in enumerate(list(self.values)):
+                        places.add(code, value)
+                    self._places = places
+                # Values encoded while building
+                for code in range(len(self._places), len(self.values)):
+                    self._places.add(code, self.values[code])
+        return np.array([code for code, _ in self._places.match(query)], dtype=np.int32)
+
+
+class _ReadWriteLock:
+    """Any number of readers or one writer; a waiting writer holds off new readers"""
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writing = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writing or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writing or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+
+class LoadTable:
+    """Columnar load board; same interface as ``LoadStore``"""
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY, fragment_cache_size: int = FRAGMENT_CACHE_SIZE):
+        self._size = 0
+        # Public methods take it; the _-prefixed helpers they call assume it is held
+        self._rw = _ReadWriteLock()
+        self._fragments = OrderedDict()
+        self._fragment_cache_size = fragment_cache_size
+        self._fragments_lock = threading.Lock()
+        self._writes = 0
+        # Per timestamp column: sorted seconds << _ROW_BITS | row of live rows
+        self._time_indexes: Dict[str, List[int]] = {}
+        # Readers may race to build an index; writes already exclude readers
+        self._time_indexes_lock = threading.Lock()
+        # Min-heap of pickup seconds << _ROW_BITS | row, one int per entry
+        self._expiry: List[int] = []
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._extras: Dict[int, Dict] = {}
+        self._dictionaries = {name: _Dictionary() for name in CATEGORICAL_COLUMNS}
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._float_bits = np.zeros(capacity, dtype=np.uint8)
+        # Rows with a missing field or extras; materialized one field at a time
+        self._sparse = np.zeros(capacity, dtype=bool)
+        self._columns = {}
+        for name in CATEGORICAL_COLUMNS:
+            self._columns[name] = np.full(capacity, -1, dtype=np.int32)
+        for name in TEXT_COLUMNS:
+            self._columns[name] = np.full(capacity, None, dtype=object)
+        for name in NUMERIC_COLUMNS:
+            self._columns[name] = np.full(capacity, np.nan, dtype=np.float64)
+        for name in TIMESTAMP_COLUMNS:
+            self._columns[name] = np.full(capacity, _NAT, dtype="datetime64[s]")
+
+    @classmethod
+    def from_records(cls, records) -> "LoadTable":
+        """Build a table from already-validated records (tests, benchmarks)"""
+        table = cls()
+        for record in records:
+            table.add(record)
+        return table
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def capacity(self) -> int:
+        return len(self._alive)
+
+    def memory_usage(self) -> Dict:
+        """Rows, column arrays and cached JSON fragments, in bytes"""
+        column_bytes = sum(column.nbytes for column in self._columns.values())
+        column_bytes += self._alive.nbytes + self._float_bits.nbytes + self._sparse.nbytes
+        with self._fragments_lock:
+            fragments = list(self._fragments.values())
+        return {
+            "rows": len(self),
+            "capacity": self.capacity,
+            "column_bytes": column_bytes,
+            "fragments": len(fragments),
+            "fragment_bytes": sum(len(fragment) for fragment in fragments),
+            "bytes": deep_sizeof(self),
+        }
+
+    def _grow(self):
+        capacity = self.capacity * 2
+        self._alive = _resized(self._alive, capacity, False)
+        self._float_bits = _resized(self._float_bits, capacity, 0)
+        self._sparse = _resized(self._sparse, capacity, False)
+        for name, column in self._columns.items():
+            fill = (-1 if name in CATEGORICAL_COLUMNS else None if name in TEXT_COLUMNS
+                    else np.nan if name in NUMERIC_COLUMNS else _NAT)
+            self._columns[name] = _resized(column, capacity, fill)
+
+    def add(self, load: Dict) -> bool:
+        """Insert a validated load, replacing any load with the same id; returns True if replaced"""
+        with self._rw.write():
+            return self._add(load)
+
+    def _add(self, load: Dict) -> bool:
+        load_id = load["load_id"]
+        row = self._rows.get(load_id)
+        replaced = row is not None
+        if not replaced:
+            if self._size == self.capacity:
+                self._grow()
+            row = self._size
+            self._size += 1
+            self._ids.append(load_id)
+            self._rows[load_id] = row
+        if replaced:
+            self._unindex_times(row)
+        self._write_row(row, load)
+        self._index_times(row)
+        with self._fragments_lock:
+            self._fragments.pop(row, None)
+            self._writes += 1
+        return replaced
+
+    def delete(self, load_id: str) -> bool:
+        """Remove a load (its row is tombstoned, not reused); returns False if unknown"""
+        with self._rw.write():
+            row = self._rows.pop(load_id, None)
+            if row is None:
+                return False
+            self._unindex_times(row)
+            self._alive[row] = False
+            self._extras.pop(row, None)
+            with self._fragments_lock:
+                self._fragments.pop(row, None)
+                self._writes += 1
+            return True
+
+    @property
+    def dead_rows(self) -> int:
+        """Tombstoned rows still taking space (reclaimed by rebuilding the table)"""
+        return self._size - len(self._rows)
+
+    def _write_row(self, row: int, load: Dict):
+        extras = {}
+        float_bits = 0
+        sparse = any(name not in load for name in FIELD_ORDER)
+        for name in CATEGORICAL_COLUMNS:
+            value = load.get(name, _MISSING)
+            self._columns[name][row] = self._dictionaries[name].encode(value) if isinstance(value, str) else -1
+            if value is not _MISSING and not isinstance(value, str):
+                extras[name] = value
+        for name in TEXT_COLUMNS:
+            value = load.get(name, _MISSING)
+            self._columns[name][row] = value if isinstance(value, str) else None
+            if value is not _MISSING and not isinstance(value, str):
+                extras[name] = value
+        for bit, name in enumerate(NUMERIC_COLUMNS):
+            value = load.get(name, _MISSING)
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and abs(value) < 2 ** 53:
+                self._columns[name][row] = value
+                if isinstance(value, float):
+                    float_bits |= 1 << bit
+            else:
+                self._columns[name][row] = np.nan
+                if value is not _MISSING:
+                    extras[name] = value
+        for name in TIMESTAMP_COLUMNS:
+            value = load.get(name, _MISSING)
+            if isinstance(value, str) and _CANONICAL_TIMESTAMP.match(value):
+                self._columns[name][row] = np.datetime64(value, "s")
+            else:
+                # Other ISO forms still get a column value for time-window queries;
+                # the original string is kept for output
+                self._columns[name][row] = _parse_timestamp(value)
+                if value is not _MISSING:
+                    extras[name] = value
+        for name, value in load.items():
+            if name not in self._columns and name != "load_id":
+                extras[name] = value
+        self._float_bits[row] = float_bits
+        self._sparse[row] = sparse or bool(extras)
+        self._alive[row] = True
+        self._schedule_expiry(row)
+        if extras:
+            self._extras[row] = extras
+        else:
+            self._extras.pop(row, None)
+
+    def _schedule_expiry(self, row: int):
+        pickup = self._columns["pickup_datetime"][row]
+        if np.isnat(pickup):
+            return
+        heapq.heappush(self._expiry, max(int(pickup.astype(np.int64)), 0) << _ROW_BITS | row)
+        if len(self._expiry) > 2 * len(self._rows) + INITIAL_CAPACITY:
+            self._rebuild_expiry()
+
+    def _rebuild_expiry(self):
+        """Drop heap entries left behind by updates and deletes"""
+        rows = np.flatnonzero(self._alive[:self._size] & ~np.isnat(self._columns["pickup_datetime"][:self._size]))
+        seconds = np.maximum(self._columns["pickup_datetime"][rows].astype(np.int64), 0)
+        self._expiry = (seconds << _ROW_BITS | rows).tolist()
+        heapq.heapify(self._expiry)
+
+    def next_expiry(self) -> Optional[datetime]:
+        """Earliest scheduled pickup time (may belong to a since-changed load)"""
+        with self._rw.read():
+            if not self._expiry:
+                return None
+            return np.datetime64(self._expiry[0] >> _ROW_BITS, "s").astype(datetime)
+
+    def pop_expired(self, now: datetime) -> List[str]:
+        """Ids of loads whose pickup time is at or before ``now``, each returned once: O(log n) per load"""
+        limit = int(_to_datetime64(now).astype(np.int64))
+        expired = {}
+        with self._rw.write():
+            pickups = self._columns["pickup_datetime"]
+            while self._expiry and self._expiry[0] >> _ROW_BITS <= limit:
+                entry = heapq.heappop(self._expiry)
+                row = entry & _ROW_MASK
+                # Entries aren't removed on update/delete; skip ones that no longer match the row
+                if self._alive[row] and max(int(pickups[row].astype(np.int64)), 0) == entry >> _ROW_BITS:
+                    expired[self._ids[row]] = None
+        return list(expired)
+
+    def get(self, load_id: str) -> Optional[Dict]:
+        with self._rw.read():
+            row = self._rows.get(load_id)
+            return self._materialize(np.array([row]))[0] if row is not None else None
+
+    def _time_key(self, name: str, row: int) -> Optional[int]:
+        value = self._columns[name][row]
+        return None if np.isnat(value) else int(value.astype(np.int64)) << _ROW_BITS | row
+
+    def _index_times(self, row: int):
+        """Insert a freshly written row into the built time indexes (caller holds the lock)"""
+        for name, keys in self._time_indexes.items():
+            key = self._time_key(name, row)
+            if key is not None:
+                bisect.insort(keys, key)
+
+    def _unindex_times(self, row: int):
+        """Remove a row's current timestamps from the built time indexes (caller holds the lock)"""
+        for name, keys in self._time_indexes.items():
+            key = self._time_key(name, row)
+            if key is not None:
+                i = bisect.bisect_left(keys, key)
+                if i < len(keys) and keys[i] == key:
+                    del keys[i]
+
+    def rows_between(self, name: str, start=None, end=None) -> np.ndarray:
+        """Rows whose ``name`` timestamp is within [start, end] (either bound optional), in time order"""
+        with self._rw.read():
+            return self._rows_between(name, start, end)
+
+    def _rows_between(self, name: str, start=None, end=None) -> np.ndarray:
+        keys = self._time_indexes.get(name)
+        if keys is None:
+            with self._time_indexes_lock:
+                keys = self._time_indexes.get(name)
+                if keys is None:
+                    # First query on this column: one sort, then add/delete keep it in order
+                    column = self._columns[name][:self._size]
+                    rows = np.flatnonzero(self._alive[:self._size] & ~np.isnat(column))
+                    rows = rows[np.argsort(column[rows], kind="stable")]
+                    seconds = column[rows].astype(np.int64).tolist()
+                    keys = self._time_indexes[name] = [s << _ROW_BITS | r for s, r in zip(seconds, rows.tolist())]
+        lo = bisect.bisect_left(keys, int(_to_datetime64(start).astype(np.int64)) << _ROW_BITS) \
+            if start is not None else 0
+        hi = bisect.bisect_left(keys, int(_to_datetime64(end).astype(np.int64)) + 1 << _ROW_BITS) \
+            if end is not None else len(keys)
+        return np.array([key & _ROW_MASK for key in keys[lo:hi]], dtype=np.intp)
+
+    def _window_rows(self, available_from=None, available_to=None, deliver_by=None) -> Optional[np.ndarray]:
+        """Sorted rows inside every given time window, or None when no window is given"""
+        rows = None
+        for name, start, end in (("pickup_datetime", available_from, available_to),
+                                 ("delivery_datetime", None, deliver_by)):
+            if start is not None or end is not None:
+                window = np.sort(self._rows_between(name, start, end))
+                rows = window if rows is None else np.intersect1d(rows, window, assume_unique=True)
+        return rows
+
+    def _code_filters(self, equipment_type: Optional[str], origin: Optional[str], destination: Optional[str]):
+        """(column, matching codes) for each given category filter"""
+        if equipment_type:
+            yield "equipment_type", self._dictionaries["equipment_type"].codes_equal(equipment_type)
+        for name, query in (("origin", origin), ("destination", destination)):
+            if query:
+                dictionary = self._dictionaries[name]
+                # "LA" would be a substring of "Dallas": nicknames go straight to place matching
+                codes = dictionary.codes_containing(query) if not is_alias(query) else ()
+                if not len(codes):
+                    # Nothing contains the text as typed; fall back to fuzzy place matching
+                    codes = dictionary.codes_similar(query)
+                yield name, codes
+
+    def mask(self, equipment_type: Optional[str] = None, origin: Optional[str] = None,
+             destination: Optional[str] = None, exclude: Iterable[str] = (),
+             available_from=None, available_to=None, deliver_by=None) -> np.ndarray:
+        """
+        Boolean row mask: exact (case-insensitive) equipment, substring (else fuzzy) origin/destination,
+        pickup within [available_from, available_to], delivery no later than deliver_by
+        """
+        with self._rw.read():
+            return self._mask(equipment_type, origin, destination, exclude,
+                              available_from=available_from, available_to=available_to, deliver_by=deliver_by)
+
+    def _mask(self, equipment_type=None, origin=None, destination=None, exclude=(), **windows) -> np.ndarray:
+        mask = self._alive[:self._size].copy()
+        if exclude:
+            # Held loads: a handful of ids, so clear their rows rather than isin over all ids
+            mask[[self._rows[load_id] for load_id in exclude if load_id in self._rows]] = False
+        window = self._window_rows(**windows)
+        if window is not None:
+            in_window = np.zeros(len(mask), dtype=bool)
+            in_window[window] = True
+            mask &= in_window
+        for name, codes in self._code_filters(equipment_type, origin, destination):
+            mask &= np.isin(self._columns[name][:len(mask)], codes)
+        return mask
+
+    def find(self, equipment_type: Optional[str] = None, origin: Optional[str] = None,
+             destination: Optional[str] = None, exclude: Iterable[str] = (), **windows) -> np.ndarray:
+        """Row numbers of matching loads, in board order (``windows``: time filters of ``mask``)"""
+        with self._rw.read():
+            return self._find(equipment_type, origin, destination, exclude, **windows)
+
+    def _find(self, equipment_type=None, origin=None, destination=None, exclude=(), **windows) -> np.ndarray:
+        rows = self._window_rows(**windows)
+        if rows is None:
+            return np.flatnonzero(self._mask(equipment_type, origin, destination, exclude))
+        # A window already picked its rows out of the index; filter just those
+        rows = rows[self._alive[rows]]
+        if exclude:
+            rows = rows[~np.isin(rows, [self._rows[load_id] for load_id in exclude if load_id in self._rows])]
+        for name, codes in self._code_filters(equipment_type, origin, destination):
+            rows = rows[np.isin(self._columns[name][rows], codes)]
+        return rows
+
+    def search(self, equipment_type: Optional[str] = None, origin: Optional[str] = None,
+               destination: Optional[str] = None, exclude: Iterable[str] = (), **windows) -> List[Dict]:
+        """Matching loads as dicts, in board order; ``exclude`` drops loads by id"""
+        with self._rw.read():
+            return self._materialize(self._find(equipment_type, origin, destination, exclude, **windows))
+
+    def fragments(self, rows: np.ndarray) -> List[bytes]:
+        """Each row serialized as JSON bytes; cached until the load changes"""
+        rows = rows.tolist()
+        with self._fragments_lock:
+            writes = self._writes
+            cached = [self._fragments.get(row) for row in rows]
+            for row, fragment in zip(rows, cached):
+                if fragment is not None:
+                    self._fragments.move_to_end(row)
+        missing = [i for i, fragment in enumerate(cached) if fragment is None]
+        if missing:
+            with self._rw.read():
+                loads = self._materialize(np.array([rows[i] for i in missing], dtype=np.intp))
+            for i, load in zip(missing, loads):
+                cached[i] = dumps(load)
+            with self._fragments_lock:
+                # A write during materialization may have made these stale; don't cache them
+                if self._writes == writes:
+                    for i in missing:
+                        self._fragments[rows[i]] = cached[i]
+                    while len(self._fragments) > self._fragment_cache_size:
+                        self._fragments.popitem(last=False)
+        return cached
+
+    def rows(self) -> List[Dict]:
+        """Every load as a dict, in board order"""
+        with self._rw.read():
+            return self._materialize(np.flatnonzero(self._alive[:self._size]))
+
+    def _materialize(self, rows: np.ndarray) -> List[Dict]:
+        """Turn row numbers into dicts, converting whole columns at a time"""
+        rows = np.asarray(rows, dtype=np.intp)
+        columns = [[self._ids[i] for i in rows.tolist()]]
+        float_bits = np.bitwise_or.reduce(self._float_bits[rows]) if len(rows) else 0
+        for name in FIELD_ORDER[1:]:
+            column = self._columns[name][rows]
+            if name in CATEGORICAL_COLUMNS:
+                columns.append(self._dictionaries[name].decode(column))
+            elif name in TEXT_COLUMNS:
+                columns.append(column.tolist())
+            elif name in NUMERIC_COLUMNS:
+                bit = NUMERIC_COLUMNS.index(name)
+                if float_bits >> bit & 1:
+                    bits = self._float_bits[rows] >> bit & 1
+                    columns.append([v if b else int(v) for v, b in zip(column.tolist(), bits.tolist())])
+                else:
+                    columns.append(np.nan_to_num(column).astype(np.int64).tolist())
+            else:
+                columns.append(np.datetime_as_string(column, unit="s").tolist())
+
+        results = [dict(zip(FIELD_ORDER, values)) for values in zip(*columns)]
+        # Rows with missing fields or extras don't fit the dense fast path
+        for j in np.flatnonzero(self._sparse[rows]).tolist():
+            results[j] = self._materialize_row(int(rows[j]))
+        return results
+
+    def _materialize_row(self, row: int) -> Dict:
+        extras = self._extras.get(row, {})
+        load = {"load_id": self._ids[row]}
+        for name in FIELD_ORDER[1:]:
+            if name in extras:
+                load[name] = extras[name]
+                continue
+            value = self._columns[name][row]
+            if name in CATEGORICAL_COLUMNS:
+                if value >= 0:
+                    load[name] = self._dictionaries[name].values[value]
+            elif name in TEXT_COLUMNS:
+                if value is not None:
+                    load[name] = value
+            elif name in NUMERIC_COLUMNS:
+                if not np.isnan(value):
+                    is_float = self._float_bits[row] >> NUMERIC_COLUMNS.index(name) & 1
+                    load[name] = float(value) if is_float else int(value)
+            elif not np.isnat(value):
+                load[name] = str(value)
+        for name, value in extras.items():
+            load.setdefault(name, value)
+        return load
+
+
+def _parse_timestamp(value) -> np.datetime64:
+    """Any ISO 8601 string as datetime64 (local wall-clock time; offsets are dropped), else NaT"""
+    if not isinstance(value, str):
+        return _NAT
+    try:
+        return _to_datetime64(datetime.fromisoformat(value))
+    except ValueError:
+        return _NAT
+
+
+def _to_datetime64(value) -> np.datetime64:
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        value = value.replace(tzinfo=None)
+    return np.datetime64(value, "s")
+
+
+def _resized(array: np.ndarray, capacity: int, fill) -> np.ndarray:
+    grown = np.full(capacity, fill, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
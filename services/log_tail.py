@@ -0,0 +1,80 @@
+"""
+Log Tail Module
+Base for in-memory indexes kept in step with an append-only JSON-lines log
+
+An index remembers the byte offset it has read up to; ``refresh`` folds in
+only what was appended since (one ``os.stat`` when nothing changed) and
+starts over if the file shrank (rotated or truncated). A fresh process
+builds the index in one streaming pass. Partial last lines are left for the
+next refresh, since a writer may be mid-append.
+"""
+import abc
+import json
+import logging
+import os
+import threading
+from typing import Dict
+
+from core.memory import deep_sizeof
+
+logger = logging.getLogger(__name__)
+
+
+class LogTailIndex(abc.ABC):
+    """Subclasses implement ``record(entry)`` and ``_reset()``"""
+
+    def __init__(self, log_path: str):
+        self.log_path = log_path
+        # Complete lines read so far, parseable or not
+        self.lines = 0
+        self._offset = 0
+        self._lock = threading.Lock()
+
+    def _size(self) -> int:
+        try:
+            return os.stat(self.log_path).st_size
+        except FileNotFoundError:
+            return 0
+
+    def refresh(self):
+        """Fold in records appended since the last call (rebuild if the log was replaced)"""
+        if self._size() == self._offset:
+            return
+        with self._lock:
+            # Re-stat under the lock: another thread may have tailed past the size seen above,
+            # which would otherwise look like a truncated log and trigger a full rebuild
+            size = self._size()
+            if size < self._offset:
+                # Rotated or truncated: start over
+                self._reset()
+                self.lines, self._offset = 0, 0
+            if size > self._offset:
+                self._tail()
+
+    def _tail(self):
+        with open(self.log_path, "rb") as f:
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # a writer is mid-line; pick it up next time
+                self._offset += len(line)
+                self.lines += 1
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Skipping malformed line in {self.log_path}")
+                    continue
+                if isinstance(entry, dict):
+                    self.record(entry)
+
+    def memory_usage(self) -> Dict:
+        """Lines folded in and the bytes the index keeps for them"""
+        return {"lines": self.lines, "log_bytes_read": self._offset, "bytes": deep_sizeof(self)}
+
+    @abc.abstractmethod
+    def record(self, entry: Dict):
+        """Fold one parsed log record into the index"""
+
+    @abc.abstractmethod
+    def _reset(self):
+        """Drop everything recorded so far (the log is about to be re-read)"""
@@ -0,0 +1,142 @@
+"""
+Negotiation Stats Module
+Streaming rate, discount and round quantiles from the negotiation log
+
+Tails ``negotiations.log`` (services/log_tail.py) and folds every webhook
+call into quantile sketches (core/sketch.py) overall, per lane and per
+equipment type:
+
+- final_rate: agreed rate of closed deals
+- discount: (loadboard_rate - final_rate) / loadboard_rate of closed deals;
+  negative when the deal closed above the board rate
+- rounds: negotiation rounds per call
+
+Each record costs a few sketch updates and nothing is rescanned, so
+``/metrics`` stays cheap however long the log gets. Every worker tails the
+same log, so all workers report the same numbers.
+"""
+import threading
+from typing import Dict
+
+from core import memory
+from core.sketch import QuantileSketch
+from services.log_tail import LogTailIndex
+
+METRICS = ("final_rate", "discount", "rounds")
+# Distinct lanes / equipment types tracked individually; the rest are pooled as "other"
+MAX_LANES = 500
+MAX_EQUIPMENT_TYPES = 50
+
+
+def lane_of(origin, destination) -> str:
+    if not origin and not destination:
+        return "unknown"
+    return f"{origin or '?'} → {destination or '?'}"
+
+
+def equipment_of(equipment_type) -> str:
+    # Callers say "dry van", the board says "Dry Van"
+    return str(equipment_type).strip().title() if equipment_type else "unknown"
+
+
+class _Group:
+    __slots__ = ("calls", "deals", "sketches")
+
+    def __init__(self):
+        self.calls = 0
+        self.deals = 0
+        self.sketches = {metric: QuantileSketch() for metric in METRICS}
+
+    def add(self, rounds, final_rate, discount):
+        self.calls += 1
+        if rounds is not None:
+            self.sketches["rounds"].add(rounds)
+        if final_rate is not None:
+            self.deals += 1
+            self.sketches["final_rate"].add(final_rate)
+            if discount is not None:
+                self.sketches["discount"].add(discount)
+
+    def summary(self) -> Dict:
+        return {"calls": self.calls, "deals": self.deals,
+                **{metric: sketch.summary() for metric, sketch in self.sketches.items()}}
+
+
+class NegotiationStats(LogTailIndex):
+    """Quantile sketches over the webhook calls in a negotiation log"""
+
+    def __init__(self, log_path: str):
+        super().__init__(log_path)
+        self._reset()
+
+    def _reset(self):
+        self._all = _Group()
+        self._by_lane: Dict[str, _Group] = {}
+        self._by_equipment: Dict[str, _Group] = {}
+        self._summary = None
+
+    def memory_usage(self) -> Dict:
+        return {"lanes": len(self._by_lane), "equipment_types": len(self._by_equipment), **super().memory_usage()}
+
+    @staticmethod
+    def _group(groups: Dict[str, _Group], key: str, limit: int) -> _Group:
+        group = groups.get(key)
+        if group is None:
+            if len(groups) >= limit:
+                key = "other"
+                group = groups.get(key)
+            if group is None:
+                group = groups[key] = _Group()
+        return group
+
+    def record(self, entry: Dict):
+        if not entry.get("mc_number"):
+            return  # e.g. /negotiate records, which have no lane or carrier
+        history = entry.get("history")
+        rounds = len(history) if isinstance(history, list) else None
+        final_rate = entry.get("final_rate") if entry.get("accepted") else None
+        discount = None
+        if final_rate:
+            # Older records lack loadboard_rate; the broker's first offer is the board rate
+            rate = entry.get("loadboard_rate") or next(iter(history or []), {}).get("broker_offer")
+            if rate:
+                discount = (rate - final_rate) / rate
+        lane = entry.get("lane") or lane_of(entry.get("origin"), entry.get("destination"))
+        equipment = equipment_of(entry.get("equipment_type"))
+        for group in (self._all,
+                      self._group(self._by_lane, lane, MAX_LANES),
+                      self._group(self._by_equipment, equipment, MAX_EQUIPMENT_TYPES)):
+            group.add(rounds, final_rate, discount)
+
+    def summary(self) -> Dict:
+        """Counts and p50/p90/p99 overall, by lane and by equipment type"""
+        self.refresh()
+        with self._lock:
+            # Rebuilt only when lines were appended; per-sketch summaries are cached too
+            if self._summary is None or self._summary[0] != self.lines:
+                self._summary = (self.lines, {
+                    "negotiations": self.lines,
+                    **self._all.summary(),
+                    "by_lane": {lane: group.summary() for lane, group in sorted(self._by_lane.items())},
+                    "by_equipment_type": {
+                        equipment: group.summary() for equipment, group in sorted(self._by_equipment.items())},
+                })
+            return self._summary[1]
+
+
+_stats = None
+_stats_lock = threading.Lock()
+
+
+def get_negotiation_stats() -> NegotiationStats:
+    """Process-wide stats over the negotiation log"""
+    global _stats
+    if _stats is None:
+        with _stats_lock:
+            if _stats is None:
+                from api.negotiation import NEGOTIATIONS_LOG
+                _stats = NegotiationStats(NEGOTIATIONS_LOG)
+    return _stats
+
+
+memory.register("negotiation_stats", lambda: _stats.memory_usage() if _stats is not None else None)
@@ -0,0 +1,139 @@
+"""
+Place Match Module
+Typo-tolerant matching of spoken city names against the board's origins/destinations
+
+Origins and destinations arrive through speech-to-text ("Dalas", "St Louis",
+"Chi town"). Queries and board values are normalized the same way
+(lowercase, punctuation dropped, "saint" -> "st", nicknames -> city,
+state names -> postal codes) and compared by trigram similarity (Dice
+coefficient) of the city part. States, when both sides name one, must agree.
+
+``PlaceIndex`` maps each trigram to the places containing it, so a lookup
+only scores places sharing at least one trigram with the query.
+"""
+import re
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+# Places scoring below this Dice coefficient against the query don't match
+SIMILARITY_THRESHOLD = 0.6
+
+STATE_CODES = {
+    "alabama": "al", "alaska": "ak", "arizona": "az", "arkansas": "ar", "california": "ca",
+    "colorado": "co", "connecticut": "ct", "delaware": "de", "district of columbia": "dc",
+    "florida": "fl", "georgia": "ga", "hawaii": "hi", "idaho": "id", "illinois": "il",
+    "indiana": "in", "iowa": "ia", "kansas": "ks", "kentucky": "ky", "louisiana": "la",
+    "maine": "me", "maryland": "md", "massachusetts": "ma", "michigan": "mi", "minnesota": "mn",
+    "mississippi": "ms", "missouri": "mo", "montana": "mt", "nebraska": "ne", "nevada": "nv",
+    "new hampshire": "nh", "new jersey": "nj", "new mexico": "nm", "new york": "ny",
+    "north carolina": "nc", "north dakota": "nd", "ohio": "oh", "oklahoma": "ok", "oregon": "or",
+    "pennsylvania": "pa", "rhode island": "ri", "south carolina": "sc", "south dakota": "sd",
+    "tennessee": "tn", "texas": "tx", "utah": "ut", "vermont": "vt", "virginia": "va",
+    "washington": "wa", "west virginia": "wv", "wisconsin": "wi", "wyoming": "wy",
+}
+_STATE_VALUES = frozenset(STATE_CODES.values())
+
+# Nicknames and abbreviations callers use for cities (after normalization)
+CITY_ALIASES = {
+    "chi town": "chicago", "chitown": "chicago", "chi": "chicago",
+    "big d": "dallas", "dfw": "dallas",
+    "h town": "houston", "htown": "houston",
+    "atl": "atlanta", "hotlanta": "atlanta",
+    "nyc": "new york", "big apple": "new york", "the big apple": "new york",
+    "la": "los angeles", "l a": "los angeles",
+    "sf": "san francisco", "san fran": "san francisco",
+    "philly": "philadelphia", "nola": "new orleans", "vegas": "las vegas",
+    "kc": "kansas city", "stl": "st louis", "motown": "detroit", "motor city": "detroit",
+    "okc": "oklahoma city", "slc": "salt lake city", "indy": "indianapolis",
+}
+
+# Word-level spellings that should compare equal
+_WORD_ALIASES = {"saint": "st", "fort": "ft", "mount": "mt", "mtn": "mountain"}
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def _words(text: str) -> List[str]:
+    return [_WORD_ALIASES.get(word, word) for word in _NON_WORD.split(text.lower()) if word]
+
+
+def _split_state(words: List[str]) -> Tuple[List[str], Optional[str]]:
+    """Peel a trailing state (code or full name) off a place, if a city remains"""
+    for size in (3, 2, 1):
+        if len(words) > size:
+            tail = " ".join(words[-size:])
+            state = STATE_CODES.get(tail) or (tail if size == 1 and tail in _STATE_VALUES else None)
+            if state:
+                return words[:-size], state
+    return words, None
+
+
+def _normalize(text: str) -> Tuple[str, Optional[str]]:
+    if "," in text:
+        # Board values: "City, ST"
+        city, _, state = text.partition(",")
+        city_words, state_words = _words(city), _words(state)
+        state = " ".join(state_words)
+        state = STATE_CODES.get(state, state) or None
+    else:
+        whole = " ".join(_words(text))
+        if whole in CITY_ALIASES:
+            return CITY_ALIASES[whole], None
+        city_words, state = _split_state(_words(text))
+    city = " ".join(city_words)
+    return CITY_ALIASES.get(city, city), state
+
+
+# Callers repeat the same handful of cities; remember recent normalizations
+normalize_place = lru_cache(maxsize=1024)(_normalize)
+normalize_place.__doc__ = "(city, state) in canonical form: lowercase, aliases resolved, state as postal code"
+
+
+def is_alias(query: str) -> bool:
+    """Whether the whole query is a city nickname ("LA", "Chi town"), not text to search for"""
+    return " ".join(_words(query)) in CITY_ALIASES
+
+
+def trigrams(text: str) -> FrozenSet[str]:
+    padded = f"  {text} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class PlaceIndex:
+    """Trigram postings over distinct place strings, addressed by the caller's codes"""
+
+    def __init__(self):
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        self._places: Dict[int, Tuple[str, Optional[str], int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._places)
+
+    def add(self, code: int, value: str):
+        city, state = _normalize(value)
+        grams = trigrams(city)
+        self._places[code] = (city, state, len(grams))
+        for gram in grams:
+            self._postings[gram].append(code)
+
+    def match(self, query: str, threshold: float = SIMILARITY_THRESHOLD) -> List[Tuple[int, float]]:
+        """(code, score) of places similar to ``query``, best first"""
+        city, state = normalize_place(query)
+        if not city:
+            return []
+        grams = trigrams(city)
+        shared: Dict[int, int] = defaultdict(int)
+        for gram in grams:
+            for code in self._postings.get(gram, ()):
+                shared[code] += 1
+        matches = []
+        for code, count in shared.items():
+            place_city, place_state, place_grams = self._places[code]
+            if state and place_state and state != place_state:
+                continue
+            score = 2 * count / (len(grams) + place_grams)
+            if score >= threshold:
+                matches.append((code, score))
+        matches.sort(key=lambda match: -match[1])
+        return matches
@@ -0,0 +1,195 @@
+"""
+Reservations Module
+Atomic load holds so concurrent calls never negotiate the same load
+
+A call takes a hold on a load before negotiating (compare-and-set: it
+succeeds only if nobody else holds the load), confirms it when the deal
+closes, and releases it otherwise. Holds that are neither confirmed nor
+released (dropped call, crashed worker) lapse after a TTL. Searches skip
+every held or confirmed load.
+
+A confirmed booking only needs to outlive the moment it takes to delete the
+load from the board (``CarrierAgent.confirm_load`` does that through the
+load repository's WAL); it is then settled, so the book holds in-flight
+calls only. Lapsed holds are pruned as new holds are taken, never by the
+searches that read the book.
+
+Single worker: holds live in memory, sharded over striped locks so calls
+on different loads never contend. Several workers: holds live in the
+SharedStore SQLite database, where each operation is one atomic statement.
+"""
+import secrets
+import threading
+import time
+from typing import Dict, FrozenSet, Optional
+
+from core import memory
+from core.metrics import LOAD_RESERVATIONS
+from core.shared_store import SharedStore, get_shared_store
+
+DEFAULT_STRIPES = 64
+# How often the shared book deletes lapsed rows (searches already ignore them)
+SHARED_PRUNE_SECONDS = 30.0
+
+
+class _Hold:
+    __slots__ = ("token", "holder", "expires_at")
+
+    def __init__(self, token: str, holder: Optional[str], expires_at: Optional[float]):
+        self.token = token
+        self.holder = holder
+        self.expires_at = expires_at  # None once confirmed
+
+    def lapsed(self, now: float) -> bool:
+        return self.expires_at is not None and self.expires_at <= now
+
+
+class ReservationBook:
+    """In-process holds keyed by load_id, one lock per stripe"""
+
+    def __init__(self, stripes: int = DEFAULT_STRIPES, clock=time.monotonic):
+        self._stripes = [(threading.Lock(), {}) for _ in range(stripes)]
+        self._clock = clock
+
+    def _stripe(self, load_id: str):
+        return self._stripes[hash(load_id) % len(self._stripes)]
+
+    def hold(self, load_id: str, holder: Optional[str], ttl: float) -> Optional[str]:
+        """Hold a free (or lapsed) load; returns the hold token, or None if it's taken"""
+        now = self._clock()
+        lock, holds = self._stripe(load_id)
+        with lock:
+            current = holds.get(load_id)
+            if current is not None and not current.lapsed(now):
+                LOAD_RESERVATIONS.inc("conflict")
+                return None
+            # Prune this stripe while we have it; it only ever holds in-flight calls
+            lapsed = [other for other, hold in holds.items() if hold.lapsed(now)]
+            for other in lapsed:
+                del holds[other]
+            token = secrets.token_hex(8)
+            holds[load_id] = _Hold(token, holder, now + ttl)
+        if lapsed:
+            LOAD_RESERVATIONS.inc("expired", amount=len(lapsed))
+        LOAD_RESERVATIONS.inc("held")
+        return token
+
+    def confirm(self, load_id: str, token: str) -> bool:
+        """Turn a live hold into a booking; False if the hold lapsed or isn't ours"""
+        now = self._clock()
+        lock, holds = self._stripe(load_id)
+        with lock:
+            current = holds.get(load_id)
+            if current is None or current.token != token or current.lapsed(now):
+                LOAD_RESERVATIONS.inc("confirm_failed")
+                return False
+            current.expires_at = None
+        LOAD_RESERVATIONS.inc("confirmed")
+        return True
+
+    def release(self, load_id: str, token: str) -> bool:
+        """Give up an unconfirmed hold"""
+        return self._drop(load_id, token, confirmed=False)
+
+    def settle(self, load_id: str, token: str) -> bool:
+        """Forget a confirmed booking once the load has been taken off the board"""
+        return self._drop(load_id, token, confirmed=True)
+
+    def _drop(self, load_id: str, token: str, confirmed: bool) -> bool:
+        lock, holds = self._stripe(load_id)
+        with lock:
+            current = holds.get(load_id)
+            if current is None or current.token != token or (current.expires_at is None) != confirmed:
+                return False
+            del holds[load_id]
+        LOAD_RESERVATIONS.inc("settled" if confirmed else "released")
+        return True
+
+    def memory_usage(self) -> Dict:
+        """Live holds and bookings not yet settled"""
+        holds = [hold for _, stripe in self._stripes for hold in list(stripe.items())]
+        return {"backend": "memory", "holds": len(holds), "bytes": memory.deep_sizeof(holds)}
+
+    def held_ids(self) -> FrozenSet[str]:
+        """Loads held or booked right now (read-only; lapsed holds are skipped)"""
+        now = self._clock()
+        held = []
+        for lock, holds in self._stripes:
+            if not holds:
+                continue  # most stripes are empty; skip the lock
+            with lock:
+                held.extend(load_id for load_id, hold in holds.items() if not hold.lapsed(now))
+        return frozenset(held)
+
+
+class SharedReservationBook:
+    """ReservationBook interface over the cross-worker SharedStore"""
+
+    def __init__(self, store: SharedStore, clock=time.time, prune_every: float = SHARED_PRUNE_SECONDS):
+        # Wall-clock time: expiry timestamps are compared across processes
+        self.store = store
+        self._clock = clock
+        self._prune_every = prune_every
+        self._next_prune = 0.0
+
+    def _maybe_prune(self, now: float):
+        # Lapsed rows are ignored by reads and overwritten by reserve(); this only bounds the table
+        if now < self._next_prune:
+            return
+        self._next_prune = now + self._prune_every
+        expired = self.store.prune_reservations(now)
+        if expired:
+            LOAD_RESERVATIONS.inc("expired", amount=expired)
+
+    def hold(self, load_id: str, holder: Optional[str], ttl: float) -> Optional[str]:
+        token = secrets.token_hex(8)
+        now = self._clock()
+        self._maybe_prune(now)
+        if not self.store.reserve(load_id, token, holder, now + ttl, now):
+            LOAD_RESERVATIONS.inc("conflict")
+            return None
+        LOAD_RESERVATIONS.inc("held")
+        return token
+
+    def confirm(self, load_id: str, token: str) -> bool:
+        confirmed = self.store.confirm_reservation(load_id, token, self._clock())
+        LOAD_RESERVATIONS.inc("confirmed" if confirmed else "confirm_failed")
+        return confirmed
+
+    def release(self, load_id: str, token: str) -> bool:
+        released = self.store.release_reservation(load_id, token)
+        if released:
+            LOAD_RESERVATIONS.inc("released")
+        return released
+
+    def settle(self, load_id: str, token: str) -> bool:
+        settled = self.store.settle_reservation(load_id, token)
+        if settled:
+            LOAD_RESERVATIONS.inc("settled")
+        return settled
+
+    def memory_usage(self) -> Dict:
+        # Holds live in the SQLite file, not in this process
+        return {"backend": "shared"}
+
+    def held_ids(self) -> FrozenSet[str]:
+        # One read-only SELECT per search; pruning happens in hold()
+        return frozenset(self.store.active_reservations(self._clock()))
+
+
+_book = None
+_book_lock = threading.Lock()
+
+
+def get_reservation_book():
+    """Process-wide reservation book; shared through SQLite when running several workers"""
+    global _book
+    if _book is None:
+        with _book_lock:
+            if _book is None:
+                store = get_shared_store()
+                _book = SharedReservationBook(store) if store is not None else ReservationBook()
+    return _book
+
+
+memory.register("reservations", lambda: _book.memory_usage() if _book is not None else None)
@@ -0,0 +1,20 @@
+"""
+Tests for the benchmark harness (not the benchmarks themselves)
+"""
+from benchmarks.harness import compare, make_loads, write_negotiation_log
+
+def test_compare_flags_regressions_over_threshold():
+    """Only benchmarks slower than baseline * (1 + threshold) are reported"""
+    baseline = {"a": 1.0, "b": 1.0, "c": 1.0}
+    regressions = compare({"a": 1.2, "b": 1.3, "c": 0.5, "new": 9.0}, baseline, threshold=0.25)
+    assert [r["benchmark"] for r in regressions] == ["b"]
+    assert regressions[0]["change"] == 0.3
+
+def test_synthetic_datasets(tmp_path):
+    """Generated loads match the board schema and logs have the requested size"""
+    loads = make_loads(50)
+    assert len({l["load_id"] for l in loads}) == 50
+    assert set(loads[0]) >= {"load_id", "origin", "destination", "equipment_type", "loadboard_rate"}
+    path = tmp_path / "negotiations.log"
+    write_negotiation_log(str(path), 12_345)
+    assert sum(1 for _ in open(path)) == 12_345
@@ -0,0 +1,117 @@
+"""
+Tests for the per-carrier history index
+"""
+import json
+import os
+from unittest.mock import patch
+
+os.environ.setdefault("API_KEY", "test-api-key")
+os.environ.setdefault("FMCSA_API_TOKEN", "test-token")
+os.environ.setdefault("ENVIRONMENT", "testing")
+
+from benchmarks.harness import make_loads
+from services.carrier_history import CarrierHistoryIndex
+
+def _record(mc, accepted=True, final_rate=1800, rate=2000, sentiment="Positive", verified_at=1000.0, **extra):
+    return {"mc_number": mc, "load_id": "L1", "accepted": accepted, "final_rate": final_rate if accepted else None,
+            "history": [{"round": 1, "carrier_offer": final_rate, "broker_offer": rate}], "sentiment": sentiment,
+            "origin": "Chicago, IL", "destination": "Dallas, TX", "verified_at": verified_at, "source": "webhook",
+            **extra}
+
+def test_index_tails_the_log(tmp_path):
+    """Records are folded in as they're appended; partial lines wait; a truncated log is re-read"""
+    log = tmp_path / "negotiations.log"
+    index = CarrierHistoryIndex(str(log))
+    assert index.get("123") is None
+
+    with open(log, "w") as f:
+        f.write(json.dumps(_record("123", loadboard_rate=2000)) + "\n")
+        f.write(json.dumps({"load_id": "L9", "final_rate": 100, "rounds": 1}) + "\n")  # /negotiate record
+        f.write("not json\n")
+    history = index.get("123")
+    assert (history.calls, history.deals, history.last_verified_at) == (1, 1, 1000.0)
+    assert history.expected_rate(3000) == 2700 and len(index) == 1
+
+    with open(log, "a") as f:
+        f.write(json.dumps(_record(123, accepted=False, sentiment="Negative", verified_at=5000.0)) + "\n")
+        f.write(json.dumps(_record("123"))[:20])  # a writer mid-line
+    history = index.get("123")
+    assert (history.calls, history.deals, history.last_verified_at) == (2, 1, 5000.0)
+    assert history.sentiment_trend() == 0.0
+    assert history.verified_within(100, now=5050.0) and not history.verified_within(100, now=6000.0)
+    assert history.to_dict()["recent_lanes"] == [{"origin": "Chicago, IL", "destination": "Dallas, TX"}] * 2
+
+    log.write_text(json.dumps(_record("456")) + "\n")
+    assert index.get("123") is None and index.get("456").calls == 1
+
+def test_only_webhook_verifications_in_the_past_are_trusted(tmp_path):
+    """A far-future or self-reported verified_at never lets an MC skip FMCSA"""
+    import time
+    from fastapi.testclient import TestClient
+    import api.negotiation
+    from main import app
+
+    log = tmp_path / "negotiations.log"
+    index = CarrierHistoryIndex(str(log))
+    now = time.time()
+    with open(log, "w") as f:
+        f.write(json.dumps(_record("111", verified_at=now + 10 ** 9)) + "\n")
+        f.write(json.dumps(_record("222", verified_at=now, source=None)) + "\n")
+        f.write(json.dumps(_record("333", verified_at=now + 5)) + "\n")  # within clock skew
+    assert index.get("111").last_verified_at is None and not index.get("111").verified_within(3600, now)
+    assert index.get("222").last_verified_at is None
+    assert index.get("333").verified_within(3600, now + 10)
+
+    client = TestClient(app)
+    with patch.object(api.negotiation, "NEGOTIATIONS_LOG", str(log)):
+        posted = client.post("/log_negotiation", json=_record("444", verified_at=now),
+                             headers={"X-API-Key": os.environ["API_KEY"]})
+    assert posted.status_code == 200
+    assert index.get("444").calls == 1 and index.get("444").last_verified_at is None
+
+def test_stale_size_does_not_look_like_truncation(tmp_path):
+    """A size read before another thread tailed further is re-checked under the lock, not treated as a shrink"""
+    log = tmp_path / "negotiations.log"
+    log.write_text("".join(json.dumps(_record(str(mc))) + "\n" for mc in range(10)))
+    index = CarrierHistoryIndex(str(log))
+    index.refresh()
+    offset = index._offset
+    with patch.object(index, "_size", side_effect=[offset - 1, offset]), \
+            patch.object(index, "_reset", side_effect=AssertionError("rebuilt")):
+        index.refresh()
+    assert len(index) == 10 and index.lines == 10
+
+def test_webhook_uses_carrier_history(tmp_path):
+    """A recently verified repeat caller skips FMCSA and gets an offer seeded from past deals"""
+    from fastapi.testclient import TestClient
+    import api.negotiation
+    from agent import CarrierAgent
+    from main import app
+    from services.load_repository import LoadRepository
+    from services.reservations import ReservationBook
+
+    client = TestClient(app)
+    log = str(tmp_path / "negotiations.log")
+    snapshot = tmp_path / "loads.json"
+    snapshot.write_text(json.dumps([{**load, "equipment_type": "Dry Van", "loadboard_rate": 2000}
+                                    for load in make_loads(5)]))
+    payload = {"mc_number": 123456, "equipment_type": "Dry Van", "initial_offer": 2150}
+
+    with patch.object(api.negotiation, "NEGOTIATIONS_LOG", log), \
+            patch("services.carrier_history._index", CarrierHistoryIndex(log)), \
+            patch("api.loads.get_load_repository", return_value=LoadRepository(str(snapshot))), \
+            patch("services.reservations._book", ReservationBook()), \
+            patch.object(CarrierAgent, "classify_sentiment", return_value="Positive"), \
+            patch("services.fmcsa.FMCSAService.verify_mc_number", return_value={"eligible": True}) as verify:
+        first = client.post("/webhook/happyrobot", json=payload).json()
+        assert first["carrier_history"] is None and verify.call_count == 1
+
+        # 2150 vs 2000 closed at 2075; with no offer the carrier opens at 2075 again
+        second = client.post("/webhook/happyrobot", json={**payload, "initial_offer": None}).json()
+        assert verify.call_count == 1
+        assert second["carrier_history"]["calls"] == 1 and second["carrier_history"]["deals"] == 1
+        assert second["negotiation"]["history"][0]["carrier_offer"] == first["negotiation"]["final_rate"]
+
+        with patch("core.config.Config.CARRIER_REVERIFY_HOURS", 0):
+            client.post("/webhook/happyrobot", json=payload)
+        assert verify.call_count == 2
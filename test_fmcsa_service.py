@@ -0,0 +1,242 @@
+"""
+Tests for FMCSAService features, run offline against the local FMCSA stub
+"""
+import json
+import os
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("API_KEY", "test-api-key")
+os.environ.setdefault("FMCSA_API_TOKEN", "test-token")
+os.environ.setdefault("ENVIRONMENT", "testing")
+
+from main import app
+from services.fmcsa import FMCSAService
+from tools.fmcsa_stub import start_stub
+
+HEADERS = {"X-API-Key": os.environ["API_KEY"]}
+
+def test_bulk_verification_dedupes_and_streams():
+    """Bulk verification dedupes, serves cache hits first and fans out misses"""
+    server, stats, base_url = start_stub(latency="fixed:0.02")
+    try:
+        service = FMCSAService()
+        service.base_url = base_url
+        service.verify_mc_number("111111")
+        mc_numbers = ["111111", 222222, "MC-333333", "222222", "abc"] + [str(400000 + i) for i in range(20)]
+        results = list(service.verify_mc_numbers(mc_numbers, max_concurrency=4, rate_limit=1000))
+        assert len(results) == 24
+        assert results[0]["source"] == "cache" and results[0]["mc_number"] == "111111"
+        assert results[1]["status"] == "invalid_format"
+        assert {r["source"] for r in results[2:]} == {"fmcsa"}
+        assert stats.snapshot()["requests"] == 1 + 22
+    finally:
+        server.shutdown()
+
+def test_concurrent_bulk_requests_share_one_rate_limit():
+    """Two bulk requests at once draw on the service's bucket instead of each getting the full rate"""
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from core.rate_limit import TokenBucket
+    server, stats, base_url = start_stub(latency="fixed:0")
+    try:
+        service = FMCSAService()
+        service.base_url = base_url
+        service.bulk_bucket = TokenBucket(20, 1)
+        batches = [[str(600000 + 100 * batch + i) for i in range(10)] for batch in range(2)]
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            results = list(pool.map(lambda batch: list(service.verify_mc_numbers(batch, max_concurrency=4)), batches))
+        # 20 calls at 20/s from one bucket take ~0.95s; separate buckets would finish in ~0.45s
+        assert time.monotonic() - start >= 0.9
+        assert sum(map(len, results)) == 20 and stats.snapshot()["requests"] == 20
+    finally:
+        server.shutdown()
+
+def test_bulk_endpoint_returns_ndjson():
+    """/verify_mc/bulk streams one JSON object per line"""
+    def fake_bulk(self, mc_numbers, max_concurrency=None, rate_limit=None):
+        for mc in dict.fromkeys(mc_numbers):
+            yield {"mc_number": mc, "eligible": True, "source": "cache"}
+
+    with patch("services.fmcsa.FMCSAService.verify_mc_numbers", fake_bulk):
+        response = TestClient(app).post(
+            "/verify_mc/bulk", json={"mc_numbers": [123456, "123456", "654321"]},
+            headers=HEADERS,
+        )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [l["mc_number"] for l in lines] == ["123456", "654321"]
+
+def _write_csv(path, rows):
+    path.write_text("DOCKET_NUMBER,STATUS_CODE,OOS_DATE,ACTION\n" + "\n".join(rows) + "\n")
+
+def test_census_import_lookup_and_diff(tmp_path):
+    """CSV import builds a sorted mmap index; diffs update, insert and delete"""
+    from services.census import CensusSnapshot, apply_diff, import_census
+    census_csv, diff_csv, snapshot_path = tmp_path / "census.csv", tmp_path / "diff.csv", str(tmp_path / "census.snapshot")
+    _write_csv(census_csv, ["MC300000,A,,", "MC100000,A,,", "MC200000,I,,", "MC400000,A,2024-02-01,"])
+    assert import_census(str(census_csv), snapshot_path) == 4
+    snapshot = CensusSnapshot(snapshot_path)
+    assert list(snapshot.mcs) == [100000, 200000, 300000, 400000]
+    assert snapshot.lookup(400000)["out_of_service_date"] == "2024-02-01"
+    assert snapshot.lookup(999999) is None
+    snapshot.close()
+
+    _write_csv(diff_csv, ["MC200000,A,,", "MC250000,A,,", "MC300000,,,D"])
+    assert apply_diff(str(diff_csv), snapshot_path) == {"updated": 1, "inserted": 1, "deleted": 1}
+    snapshot = CensusSnapshot(snapshot_path)
+    assert list(snapshot.mcs) == [100000, 200000, 250000, 400000]
+    assert snapshot.lookup(200000)["active"] is True
+    snapshot.close()
+
+def test_verify_uses_census_snapshot_before_and_instead_of_fmcsa(tmp_path):
+    """Fresh snapshot hits skip FMCSA; during outages the snapshot replaces the guess"""
+    from services.census import CensusIndex, import_census
+    census_csv, snapshot_path = tmp_path / "census.csv", str(tmp_path / "census.snapshot")
+    _write_csv(census_csv, ["MC123456,A,,", "MC654321,I,,"])
+    import_census(str(census_csv), snapshot_path)
+    fresh = CensusIndex(snapshot_path, max_age_days=7)
+    stale = CensusIndex(snapshot_path, max_age_days=0)
+
+    server, stats, base_url = start_stub(error_rate=1.0)
+    try:
+        service = FMCSAService()
+        service.base_url = base_url
+        with patch("services.fmcsa.get_census_index", return_value=fresh):
+            result = service.verify_mc_number("654321")
+        assert result["eligible"] is False and result["source"] == "census_snapshot"
+        assert stats.snapshot()["requests"] == 0
+
+        with patch("services.fmcsa.get_census_index", return_value=stale):
+            result = service.verify_mc_number("654321")
+        assert stats.snapshot()["requests"] > 0
+        assert result["status"] == "census_fallback" and result["eligible"] is False
+    finally:
+        server.shutdown()
+
+def test_census_snapshot_loads_on_first_call_right_after_boot(tmp_path):
+    """The monotonic clock starts near zero on a fresh machine; the first lookup still opens the snapshot"""
+    from services.census import CensusIndex, import_census
+    census_csv, snapshot_path = tmp_path / "census.csv", str(tmp_path / "census.snapshot")
+    _write_csv(census_csv, ["MC123456,A,,"])
+    import_census(str(census_csv), snapshot_path)
+    with patch("services.census.time.monotonic", return_value=5.0):
+        assert CensusIndex(snapshot_path, max_age_days=7).snapshot() is not None
+
+def test_circuit_breaker_state_machine():
+    """Opens after consecutive failures, admits one half-open probe, closes on success"""
+    import time
+    from core.circuit_breaker import CircuitBreaker
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.05, latency_budget=1.0,
+                             min_timeout=0.1, max_timeout=5.0, min_samples=20)
+    assert breaker.timeout() == 5.0
+    breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.record_success(2.0)  # over the latency budget counts as a failure
+    assert breaker.state == "open" and not breaker.allow_request()
+
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    assert not breaker.allow_request()  # only one probe at a time
+    breaker.record_success(0.01)
+    assert breaker.state == "closed"
+
+    for _ in range(20):
+        breaker.record_success(0.01)
+    assert breaker.timeout() == 0.1  # 3 x p99 clamped to the minimum
+
+    breaker.record_failure()
+    breaker.record_failure()
+    time.sleep(0.03)
+    breaker.record_failure()  # a straggler reporting while OPEN doesn't restart the window
+    time.sleep(0.03)
+    assert breaker.allow_request()
+
+def test_health_reports_the_service_breaker():
+    """Extra FMCSAService instances don't replace the singleton's breaker in /health/upstreams"""
+    from core.circuit_breaker import breaker_states
+    from services.fmcsa import get_fmcsa_service
+    breaker = get_fmcsa_service().breaker
+    FMCSAService().breaker.record_failure()
+    assert breaker_states()["fmcsa"]["consecutive_failures"] == breaker._failures
+    assert "test" not in breaker_states()
+
+def test_open_circuit_and_deadline_skip_fmcsa():
+    """An open breaker answers without calling FMCSA; deadlines cap time spent on retries"""
+    import time
+    server, stats, base_url = start_stub(error_rate=1.0)
+    try:
+        service = FMCSAService()
+        service.base_url = base_url
+        for i in range(service.breaker.failure_threshold):
+            service.verify_mc_number(str(500000 + i))
+        assert service.breaker.state == "open"
+        calls = stats.snapshot()["requests"]
+        result = service.verify_mc_number("123457")
+        assert result["fallback_reason"] == "FMCSA circuit open"
+        assert stats.snapshot()["requests"] == calls
+    finally:
+        server.shutdown()
+
+    server, stats, base_url = start_stub(latency="fixed:2")
+    try:
+        service = FMCSAService()
+        service.base_url = base_url
+        start = time.monotonic()
+        result = service.verify_mc_number("123457", deadline=time.monotonic() + 0.8)
+        assert time.monotonic() - start < 1.5
+        assert result["status"] == "api_server_error"
+        assert result["fallback_reason"] in ("Deadline exceeded", "API timeout after retries")
+    finally:
+        server.shutdown()
+
+def test_carrier_profile_fetched_once_and_cached():
+    """Docket, authority and classification are combined and cached under one key"""
+    server, stats, base_url = start_stub(latency="fixed:0.05")
+    try:
+        service = FMCSAService()
+        service.base_url = base_url
+        with patch("services.fmcsa.get_fmcsa_service", return_value=service), \
+                patch("api.auth.get_fmcsa_service", return_value=service):
+            client = TestClient(app)
+            profile = client.post("/verify_mc", json={"mc_number": 123451}, headers=HEADERS).json()
+            assert stats.snapshot()["requests"] == 3
+            assert profile["eligible"] is True and profile["profile_complete"] is True
+            assert profile["safety_rating"] == "S"
+            assert profile["authority"] == {"common": "A", "contract": "N", "broker": "N", "authorized_for_hire": True}
+            assert profile["operation_classification"] == ["Authorized For Hire"]
+
+            rating = client.get("/carrier/123451/safety-rating", headers=HEADERS).json()
+            assert rating == {"mc_number": "123451", "safety_rating": "S"}
+            assert client.post("/verify_mc", json={"mc_number": "MC-123451"}, headers=HEADERS).json() == profile
+            assert stats.snapshot()["requests"] == 3
+
+            missing = client.post("/verify_mc", json={"mc_number": "123450"}, headers=HEADERS).json()
+            assert missing["status"] == "not_found" and missing["profile_complete"] is False
+    finally:
+        server.shutdown()
+
+def test_carrier_profile_shares_one_deadline():
+    """Authority and classification lookups get what verification left of the deadline, not a new one"""
+    import time
+    from core.config import Config
+    service = FMCSAService()
+    deadlines = []
+
+    def slow_verify(mc_number, deadline=None):
+        deadlines.append(deadline)
+        time.sleep(0.05)
+        return {"eligible": True, "mc_number": mc_number, "status": "verified", "dot_number": "42"}
+
+    def fetch(dot_number, resource, deadline):
+        deadlines.append(deadline)
+        return []
+
+    with patch.object(service, "verify_mc_number", side_effect=slow_verify), \
+            patch.object(service, "_fetch_dot_resource", side_effect=fetch):
+        assert service.get_carrier_profile("123451")["profile_complete"] is True
+    assert len(deadlines) == 3 and len(set(deadlines)) == 1
+    # Verification used 50ms of it; the fetches didn't start a fresh FMCSA_DEADLINE_SECONDS
+    assert deadlines[0] - time.monotonic() < Config.FMCSA_DEADLINE_SECONDS - 0.05
@@ -0,0 +1,119 @@
+"""
+Tests for idempotent webhook handling
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+os.environ.setdefault("API_KEY", "test-api-key")
+os.environ.setdefault("FMCSA_API_TOKEN", "test-token")
+os.environ.setdefault("ENVIRONMENT", "testing")
+
+from core.idempotency import IdempotencyCache
+from core.shared_store import SharedStore
+
+def test_results_replay_until_ttl_and_lru_bound():
+    cache = IdempotencyCache("test_idempotency", ttl=0.2, max_entries=2)
+    calls = []
+
+    def compute(value):
+        calls.append(value)
+        return {"value": value}
+
+    assert cache.run("a", lambda: compute(1)) == ({"value": 1}, False)
+    assert cache.run("a", lambda: compute(2)) == ({"value": 1}, True)
+    cache.run("b", lambda: compute(3))
+    cache.run("c", lambda: compute(4))  # evicts "a"
+    assert cache.run("a", lambda: compute(5)) == ({"value": 5}, False)
+    time.sleep(0.25)
+    assert cache.run("a", lambda: compute(6)) == ({"value": 6}, False)
+    assert calls == [1, 3, 4, 5, 6] and len(cache) <= 2
+
+def test_concurrent_retries_wait_for_the_original():
+    """Retries arriving mid-run get the original's result; a failed run lets a retry take over"""
+    cache = IdempotencyCache("test_idempotency", wait_timeout=5)
+    runs = []
+    started = threading.Event()
+
+    def slow():
+        runs.append(1)
+        started.set()
+        time.sleep(0.2)
+        return {"status": "processed"}
+
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        first = pool.submit(cache.run, "k", slow)
+        started.wait()
+        retries = [pool.submit(cache.run, "k", slow) for _ in range(19)]
+        assert first.result() == ({"status": "processed"}, False)
+        assert all(r.result() == ({"status": "processed"}, True) for r in retries)
+    assert len(runs) == 1
+
+    def failing():
+        started.set()
+        time.sleep(0.1)
+        raise RuntimeError("FMCSA down")
+
+    started.clear()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        original = pool.submit(cache.run, "f", failing)
+        started.wait()
+        retry = pool.submit(cache.run, "f", lambda: {"status": "retried"})
+        assert retry.result() == ({"status": "retried"}, False)
+        assert isinstance(original.exception(), RuntimeError)
+
+def test_completed_results_shared_across_workers(tmp_path):
+    store_path = str(tmp_path / "state.db")
+    worker_a = IdempotencyCache("test_idempotency", shared_store=SharedStore(store_path))
+    worker_b = IdempotencyCache("test_idempotency", shared_store=SharedStore(store_path))
+    worker_a.run("k", lambda: {"status": "processed"})
+    assert worker_b.run("k", lambda: {"status": "again"}) == ({"status": "processed"}, True)
+
+def test_shared_store_io_runs_outside_the_cache_lock(tmp_path):
+    """Different keys don't queue behind each other's SQLite reads; expired rows are pruned on an interval"""
+    class SlowStore(SharedStore):
+        prunes = 0
+
+        def cache_get(self, namespace, key):
+            time.sleep(0.2)
+            return super().cache_get(namespace, key)
+
+        def cache_prune_expired(self, namespace, now):
+            SlowStore.prunes += 1
+            super().cache_prune_expired(namespace, now)
+
+    cache = IdempotencyCache("test_idempotency", shared_store=SlowStore(str(tmp_path / "state.db")))
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda key: cache.run(key, lambda: {"key": key}), "abcd"))
+    assert time.monotonic() - start < 0.6
+    assert [result for result, _ in results] == [{"key": key} for key in "abcd"]
+    assert SlowStore.prunes == 1
+
+def test_webhook_retries_are_not_reprocessed():
+    """Same Idempotency-Key (or same payload + call_id): one verification, one log record"""
+    from fastapi.testclient import TestClient
+    from agent import CarrierAgent
+    from api import webhook
+    from main import app
+
+    client = TestClient(app)
+    payload = {"mc_number": "123456", "equipment_type": "Dry Van", "origin": "Chicago", "initial_offer": 2000}
+    verified = {"eligible": False, "mc_number": "123456", "status": "not_found"}
+    with patch.object(webhook, "_idempotency", IdempotencyCache("webhook_idempotency")), \
+            patch("services.fmcsa.FMCSAService.verify_mc_number", return_value=verified) as verify, \
+            patch.object(CarrierAgent, "log_negotiation"):
+        first = client.post("/webhook/happyrobot", json=payload, headers={"Idempotency-Key": "call-1"})
+        retry = client.post("/webhook/happyrobot", json=payload, headers={"Idempotency-Key": "call-1"})
+        assert retry.json() == first.json() and retry.headers["Idempotent-Replayed"] == "true"
+        assert "Idempotent-Replayed" not in first.headers and verify.call_count == 1
+
+        with_call_id = {**payload, "call_id": "abc"}
+        client.post("/webhook/happyrobot", json=with_call_id)
+        client.post("/webhook/happyrobot", json=with_call_id)
+        client.post("/webhook/happyrobot", json={**with_call_id, "call_id": "def"})
+        client.post("/webhook/happyrobot", json=payload)  # no key: always processed
+        client.post("/webhook/happyrobot", json=payload)
+        assert verify.call_count == 5
@@ -0,0 +1,384 @@
+"""
+Tests for streaming load board ingestion
+"""
+import io
+import json
+import os
+import tracemalloc
+
+os.environ.setdefault("API_KEY", "test-api-key")
+os.environ.setdefault("FMCSA_API_TOKEN", "test-token")
+os.environ.setdefault("ENVIRONMENT", "testing")
+
+from benchmarks.harness import make_loads
+from services.load_store import LoadStore, ingest, iter_json_records
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "loads.json")
+
+def test_streaming_parser_matches_json_load():
+    """JSON arrays (split at any chunk boundary) and NDJSON decode like json.load"""
+    loads = make_loads(50) + [{"load_id": "X", "loadboard_rate": 12345}]
+    array_text = json.dumps(loads, indent=2)
+    for chunk_size in (1, 7, 4096):
+        assert list(iter_json_records(io.StringIO(array_text), chunk_size)) == loads
+    ndjson_text = "\n".join(json.dumps(load) for load in loads) + "\n"
+    assert list(iter_json_records(io.StringIO(ndjson_text), 5)) == loads
+    assert list(iter_json_records(io.StringIO(" [ ] "))) == []
+    with open(DATA_PATH) as streamed, open(DATA_PATH) as f:
+        assert list(iter_json_records(streamed, 16)) == json.load(f)
+
+def test_ingest_validates_and_indexes():
+    """Invalid records are skipped and reported; duplicates replace; indexes follow"""
+    loads = make_loads(3)
+    bad = [{"load_id": "B1"}, {**loads[0], "load_id": "B2", "loadboard_rate": "cheap"}, ["not", "a", "load"]]
+    replacement = {**loads[1], "equipment_type": "Hotshot"}
+    text = "\n".join(json.dumps(r) for r in loads + bad + [replacement])
+    store, report = ingest(io.StringIO(text))
+    assert (report["loaded"], report["replaced"], report["rejected"]) == (3, 1, 3)
+    assert "loadboard_rate" in report["errors"][1]
+    assert len(store) == 3 and store.get(loads[1]["load_id"])["equipment_type"] == "Hotshot"
+    assert store.by_equipment("hotshot") == [replacement]
+    assert loads[1]["load_id"] not in [l["load_id"] for l in store.by_equipment(loads[1]["equipment_type"])]
+
+def test_ingest_peak_memory_tracks_stored_size(tmp_path):
+    """Streaming keeps peak memory near the stored size, below json.load's peak"""
+    path = tmp_path / "board.json"
+    path.write_text(json.dumps(make_loads(5000)))
+    tracemalloc.start()
+    try:
+        store, _ = ingest(str(path))
+        stored, peak = tracemalloc.get_traced_memory()
+        del store
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        with open(path) as f:
+            loads = json.load(f)
+        json_peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+    assert len(loads) == 5000
+    assert peak < stored * 1.2
+    assert peak < json_peak
+
+def test_load_table_matches_list_of_dicts():
+    """Columnar search, lookup and row materialization agree with the dict store"""
+    from services.load_table import LoadTable
+    loads = make_loads(3000)
+    odd = {**loads[0], "load_id": "ODD", "loadboard_rate": 1999.5, "notes": None,
+           "pickup_datetime": "2025-09-10T08:00:00Z", "hazmat": True}
+    odd.pop("miles")
+    store, table = LoadStore.from_records(loads + [odd]), LoadTable.from_records(loads + [odd])
+    assert table.rows() == store.rows() and len(table) == len(store) == 3001
+    assert json.dumps(table.get("ODD")) == json.dumps(odd)
+    for query in ({}, {"equipment_type": "reefer"}, {"origin": "chicago"}, {"destination": ", TX"},
+                  {"equipment_type": "Flatbed", "origin": "Dallas", "destination": "ATL"},
+                  {"equipment_type": "Hovercraft"}):
+        assert table.search(**query) == store.search(**query)
+    table.add({**loads[5], "equipment_type": "Hotshot"})
+    assert table.search(equipment_type="hotshot") == [{**loads[5], "equipment_type": "Hotshot"}]
+    assert table.get("missing") is None
+
+def test_free_text_notes_stay_out_of_the_dictionaries():
+    """Per-load notes are stored per row; rewriting them doesn't grow a dictionary"""
+    from services.load_table import LoadTable
+    loads = [{**load, "notes": f"Call {i} before arrival"} for i, load in enumerate(make_loads(200))]
+    table = LoadTable.from_records(loads)
+    for i in range(5):
+        table.add({**loads[0], "notes": f"Revision {i}"})
+    assert "notes" not in table._dictionaries
+    assert table.get(loads[0]["load_id"])["notes"] == "Revision 4" and table.rows()[1:] == loads[1:]
+
+def test_concurrent_searches_during_writes():
+    """Searches running while the table grows, updates and deletes never fail or see torn rows"""
+    import threading
+    from datetime import datetime
+    from services.load_table import LoadTable
+
+    loads = make_loads(2000)
+    table = LoadTable.from_records(loads[:200])
+    errors, done = [], threading.Event()
+
+    def search():
+        try:
+            while not done.is_set():
+                for load in table.search(equipment_type="Reefer"):
+                    assert load["equipment_type"] == "Reefer"
+                table.search(origin="Chicago", available_from=datetime(2025, 9, 10))
+                table.fragments(table.find(equipment_type="Flatbed"))
+        except Exception as e:
+            errors.append(e)
+
+    readers = [threading.Thread(target=search) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    try:
+        for i, load in enumerate(loads[200:]):
+            table.add(load)
+            table.add({**loads[i], "equipment_type": "Reefer" if i % 2 else "Flatbed"})
+            if i % 3 == 0:
+                table.delete(loads[i]["load_id"])
+    finally:
+        done.set()
+        for reader in readers:
+            reader.join()
+    assert errors == []
+    assert len(table) == len(table.rows()) == 2000 - len(range(0, 1800, 3))
+
+def test_load_table_memory_is_a_fraction_of_dicts():
+    """Dictionary-encoded columns use far less memory than one dict per load"""
+    from benchmarks.harness import retained_bytes
+    from services.load_table import LoadTable
+    board = "\n".join(json.dumps(load) for load in make_loads(10000))
+    dict_bytes = retained_bytes(lambda: ingest(io.StringIO(board), LoadStore()))
+    table_bytes = retained_bytes(lambda: ingest(io.StringIO(board), LoadTable()))
+    assert table_bytes < dict_bytes / 2
+
+def test_fast_json_responses_are_byte_compatible():
+    """FAST_JSON serves cached per-load fragments with the exact default bytes"""
+    from unittest.mock import patch
+    from fastapi.testclient import TestClient
+    from core.config import Config
+    from main import app
+    from services.load_table import LoadTable
+
+    loads = make_loads(500) + [{**make_loads(1)[0], "load_id": "Ü1", "notes": "Café – fragile", "loadboard_rate": 0.1}]
+    table = LoadTable.from_records(loads)
+    client = TestClient(app)
+    headers = {"X-API-Key": os.environ["API_KEY"]}
+
+    def fetch(fast):
+        with patch.object(Config, "FAST_JSON", fast):
+            return [
+                client.get("/loads", headers=headers).content,
+                client.get("/loads", params={"equipment_type": "reefer", "origin": "chicago"}, headers=headers).content,
+                client.post("/search_loads", json={"equipment_type": "Flatbed", "origin": "TX", "destination": "A"},
+                            headers=headers).content,
+            ]
+
+    with patch("api.loads.get_loads_store", return_value=table):
+        assert fetch(True) == fetch(False)
+        assert len(table._fragments) == len(loads)
+        table.add({**loads[0], "loadboard_rate": 4321})
+        assert fetch(True) == fetch(False)
+        assert json.loads(fetch(True)[0])[0]["loadboard_rate"] == 4321
+
+def test_load_crud_api_with_etags(tmp_path):
+    """POST/PATCH/DELETE update the board in place; ETags give 304s until it changes"""
+    from unittest.mock import patch
+    from fastapi.testclient import TestClient
+    from main import app
+    from services.load_repository import LoadRepository
+
+    snapshot = tmp_path / "loads.json"
+    snapshot.write_text(json.dumps(make_loads(20)))
+    repository = LoadRepository(str(snapshot))
+    client = TestClient(app)
+    headers = {"X-API-Key": os.environ["API_KEY"]}
+    new_load = {**make_loads(1, seed=7)[0], "load_id": "NEW1", "equipment_type": "Hotshot"}
+
+    with patch("api.loads.get_load_repository", return_value=repository):
+        first = client.get("/loads", headers=headers)
+        etag = first.headers["ETag"]
+        assert len(first.json()) == 20
+        assert client.get("/loads", headers={**headers, "If-None-Match": etag}).status_code == 304
+
+        created = client.post("/loads", json=new_load, headers=headers)
+        assert created.status_code == 201 and created.json() == new_load
+        assert client.post("/loads", json=new_load, headers=headers).status_code == 409
+        assert client.post("/loads", json={"load_id": "BAD"}, headers=headers).status_code == 422
+        assert client.get("/loads", headers={**headers, "If-None-Match": etag}).status_code == 200
+
+        patched = client.patch("/load/NEW1", json={"loadboard_rate": 999, "notes": None}, headers=headers)
+        assert patched.json()["loadboard_rate"] == 999 and "notes" not in patched.json()
+        assert client.patch("/load/NEW1", json={"loadboard_rate": "free"}, headers=headers).status_code == 422
+        assert client.get("/loads", params={"equipment_type": "hotshot"}, headers=headers).json() == [patched.json()]
+
+        assert client.delete("/load/NEW1", headers=headers).status_code == 204
+        assert client.get("/load/NEW1", headers=headers).status_code == 404
+        assert client.delete("/load/NEW1", headers=headers).status_code == 404
+        assert client.patch("/load/NEW1", json={}, headers=headers).status_code == 404
+
+def test_load_repository_wal_replay_and_compaction(tmp_path):
+    """Changes survive restarts via the WAL, peers tail it, compaction folds it into the snapshot"""
+    from services.load_repository import LoadRepository
+
+    snapshot = tmp_path / "loads.ndjson"
+    snapshot.write_text("\n".join(json.dumps(load) for load in make_loads(10)) + "\n")
+    writer, peer = LoadRepository(str(snapshot), compact_every=5), LoadRepository(str(snapshot), compact_every=5)
+    peer_table = peer.refresh()
+
+    writer.create({**make_loads(1)[0], "load_id": "W1"})
+    writer.update("L000001", {"loadboard_rate": 1})
+    writer.delete("L000002")
+    assert peer.refresh() is peer_table  # tailed the log, no re-ingest
+    assert peer_table.get("W1") is not None and peer_table.get("L000002") is None
+    assert peer.etag == writer.etag
+
+    restarted = LoadRepository(str(snapshot)).refresh()
+    assert len(restarted) == 10 and restarted.get("L000001")["loadboard_rate"] == 1
+
+    for i in range(2):
+        writer.create({**make_loads(1)[0], "load_id": f"C{i}"})
+    assert writer.version == 0 and os.path.getsize(writer.wal_path) == 0
+    compacted = [json.loads(line) for line in snapshot.read_text().splitlines()]
+    assert len(compacted) == 12 and {"W1", "C0", "C1"} <= {load["load_id"] for load in compacted}
+    assert len(peer.refresh()) == 12
+    # The delete's tombstone is gone from the compacted table, not just from the snapshot
+    assert writer.table.dead_rows == 0 and writer.table.rows() == compacted
+
+def test_time_window_queries_match_parsed_timestamps():
+    """Index-backed pickup/delivery windows agree with parsing every load's ISO strings"""
+    import random
+    from datetime import datetime, timedelta
+    from services.load_table import LoadTable
+
+    loads = make_loads(500)
+    loads[3] = {**loads[3], "pickup_datetime": "2025-09-10T08:30:00Z"}  # non-canonical, still indexed
+    loads[4] = {k: v for k, v in loads[4].items() if k != "pickup_datetime"}
+    table = LoadTable.from_records(loads)
+
+    def expected(rows, start=None, end=None, deliver_by=None):
+        def parsed(load, key):
+            return datetime.fromisoformat(load[key]).replace(tzinfo=None) if key in load else None
+        return [l["load_id"] for l in rows
+                if (start is None and end is None or parsed(l, "pickup_datetime") is not None
+                    and (start is None or parsed(l, "pickup_datetime") >= start)
+                    and (end is None or parsed(l, "pickup_datetime") <= end))
+                and (deliver_by is None or parsed(l, "delivery_datetime") <= deliver_by)]
+
+    rng = random.Random(3)
+    for _ in range(50):
+        start = datetime(2025, 9, 1) + timedelta(hours=rng.randint(0, 30 * 24))
+        end = start + timedelta(hours=rng.randint(0, 72))
+        deliver_by = datetime(2025, 10, 1) + timedelta(hours=rng.randint(0, 30 * 24))
+        for window in ({"available_from": start}, {"available_to": end}, {"deliver_by": deliver_by},
+                       {"available_from": start, "available_to": end, "deliver_by": deliver_by}):
+            got = [l["load_id"] for l in table.search(**window)]
+            assert got == expected(loads, window.get("available_from"), window.get("available_to"),
+                                   window.get("deliver_by"))
+
+    # The index follows writes
+    window = {"available_from": datetime(2025, 9, 10, 8), "available_to": datetime(2025, 9, 10, 9)}
+    table.add({**loads[0], "load_id": "LATE", "pickup_datetime": "2025-09-10T08:45:00"})
+    table.delete(loads[3]["load_id"])
+    got = {l["load_id"] for l in table.search(**window)}
+    assert "LATE" in got and loads[3]["load_id"] not in got
+
+def test_time_index_is_maintained_not_rebuilt():
+    """Writes after the first window query update the sorted index in place instead of re-sorting it"""
+    from datetime import datetime
+    from unittest.mock import patch
+    from services.load_table import LoadTable
+
+    loads = make_loads(200)
+    table = LoadTable.from_records(loads)
+    window = {"available_from": datetime(2025, 9, 10, 8), "available_to": datetime(2025, 9, 10, 9)}
+    table.search(**window)
+    moved = next(l for l in loads if l["pickup_datetime"] > "2025-09-11")
+    with patch("services.load_table.np.argsort", side_effect=AssertionError("index rebuilt")):
+        table.add({**moved, "pickup_datetime": "2025-09-10T08:15:00", "equipment_type": "Reefer"})
+        table.add({**loads[0], "load_id": "NEW", "pickup_datetime": "2025-09-10T09:00:00"})
+        table.delete("NEW")
+        got = [l["load_id"] for l in table.search(equipment_type="reefer", **window)]
+    expected = [l["load_id"] for l in table.rows() if l["equipment_type"] == "Reefer"
+                and "2025-09-10T08:00:00" <= l["pickup_datetime"] <= "2025-09-10T09:00:00"]
+    assert moved["load_id"] in got and got == expected
+    keys = table._time_indexes["pickup_datetime"]
+    assert keys == sorted(keys) and len(keys) == len(table)
+
+def test_time_window_api_filters():
+    """/loads takes ISO query parameters, /search_loads the same keys in its body"""
+    from unittest.mock import patch
+    from fastapi.testclient import TestClient
+    from main import app
+    from services.load_table import LoadTable
+
+    client = TestClient(app)
+    headers = {"X-API-Key": os.environ["API_KEY"]}
+    with open(DATA_PATH) as f:
+        loads = json.load(f)
+    table = LoadTable.from_records(loads)
+    with patch("api.loads.get_loads_store", return_value=table):
+        window = {"available_from": "2025-09-10", "available_to": "2025-09-10T23:59:59"}
+        got = client.get("/loads", params=window, headers=headers).json()
+        assert got and [l["load_id"] for l in got] == [
+            l["load_id"] for l in loads if l["pickup_datetime"].startswith("2025-09-10")]
+        body = {"equipment_type": got[0]["equipment_type"], "origin": got[0]["origin"],
+                "destination": got[0]["destination"], **window}
+        assert got[0] in client.post("/search_loads", json=body, headers=headers).json()
+        assert client.post("/search_loads", json={**body, "deliver_by": "thursday"}, headers=headers).status_code == 400
+        assert client.get("/loads", params={"deliver_by": "thursday"}, headers=headers).status_code == 422
+
+def test_expiry_heap_follows_updates_and_deletes():
+    """Loads come off the heap once, at their current pickup time; changed or deleted loads don't"""
+    from datetime import datetime
+    from services.load_table import LoadTable
+
+    loads = make_loads(300)
+    table = LoadTable.from_records(loads)
+    table.add({**loads[0], "pickup_datetime": "2099-01-01T00:00:00"})  # pushed back
+    table.add(dict(loads[1]))  # same pickup, scheduled twice
+    table.delete(loads[2]["load_id"])
+    cutoff = datetime(2025, 9, 15, 12)
+    expected = [l["load_id"] for l in loads[1:]
+                if l["load_id"] != loads[2]["load_id"] and datetime.fromisoformat(l["pickup_datetime"]) <= cutoff]
+    assert table.next_expiry() <= cutoff
+    assert sorted(table.pop_expired(cutoff)) == sorted(expected)
+    assert table.pop_expired(cutoff) == [] and table.next_expiry() > cutoff
+    assert len(table) == 299 and table.get(expected[0]) is not None  # the table itself is untouched
+
+def test_expiry_sweeper_deletes_due_loads(tmp_path):
+    """The sweeper deletes loads past pickup + grace through the WAL and counts them"""
+    from datetime import datetime, timedelta
+    from core.metrics import LOADS_EXPIRED
+    from services.load_expiry import LoadExpirySweeper
+    from services.load_repository import LoadRepository
+
+    snapshot = tmp_path / "loads.json"
+    snapshot.write_text(json.dumps(make_loads(200)))
+    repository = LoadRepository(str(snapshot))
+    now = datetime(2025, 9, 20)
+    sweeper = LoadExpirySweeper(lambda: repository, grace=timedelta(hours=1), clock=lambda: now)
+    before = LOADS_EXPIRED.value()
+
+    expired = sweeper.sweep()
+    remaining = repository.table.rows()
+    assert expired and expired + len(remaining) == 200
+    assert all(datetime.fromisoformat(l["pickup_datetime"]) > now - timedelta(hours=1) for l in remaining)
+    assert LOADS_EXPIRED.value() - before == expired and sweeper.sweep() == 0
+
+    next_pickup = min(datetime.fromisoformat(l["pickup_datetime"]) for l in remaining)
+    assert sweeper.seconds_until_next() == min(60.0, (next_pickup + timedelta(hours=1) - now).total_seconds())
+    assert len(LoadRepository(str(snapshot)).refresh()) == len(remaining)  # persisted in the WAL
+
+def test_fuzzy_place_matching():
+    """Speech-to-text spellings of cities still find their loads; typed substrings behave as before"""
+    from services.load_table import LoadTable
+    from services.place_match import normalize_place
+
+    places = ["Dallas, TX", "St. Louis, MO", "Chicago, IL", "Fort Worth, TX", "Los Angeles, CA",
+              "Portland, OR", "Portland, ME", "Miami, FL"]
+    table = LoadTable.from_records(
+        {"load_id": f"L{i}", "origin": place, "destination": places[-1 - i], "equipment_type": "Dry Van",
+         "loadboard_rate": 1000} for i, place in enumerate(places))
+
+    def origins(query):
+        return [l["origin"] for l in table.search(origin=query)]
+
+    for query, expected in (("Dalas", ["Dallas, TX"]), ("dallas texas", ["Dallas, TX"]),
+                            ("St Louis", ["St. Louis, MO"]), ("Saint Louis", ["St. Louis, MO"]),
+                            ("Chi town", ["Chicago, IL"]), ("Chicgo", ["Chicago, IL"]),
+                            ("Ft Worth", ["Fort Worth, TX"]), ("LA", ["Los Angeles, CA"]),
+                            ("Portland, Maine", ["Portland, ME"]), ("Portland", ["Portland, OR", "Portland, ME"]),
+                            ("Houston", []), ("Dal", ["Dallas, TX"])):
+        assert origins(query) == expected, query
+    assert [l["destination"] for l in table.search(destination="Miammi")] == ["Miami, FL"]
+
+    # Places added after the index was built are matched too
+    table.add({"load_id": "NEW", "origin": "Houston, TX", "destination": "Dallas, TX",
+               "equipment_type": "Dry Van", "loadboard_rate": 1000})
+    assert origins("Huston") == ["Houston, TX"]
+
+    hits = normalize_place.cache_info().hits
+    origins("Huston")
+    assert normalize_place.cache_info().hits == hits + 1
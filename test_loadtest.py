@@ -0,0 +1,63 @@
+"""
+Tests for the offline FMCSA stub and load-test harness
+"""
+import os
+import requests
+
+os.environ.setdefault("API_KEY", "test-api-key")
+os.environ.setdefault("FMCSA_API_TOKEN", "test-token")
+os.environ.setdefault("ENVIRONMENT", "testing")
+
+from services.fmcsa import FMCSAService
+from tools.fmcsa_stub import start_stub
+from tools.loadtest import RequestFactory, percentile
+
+def test_fmcsa_service_against_stub():
+    """Verification runs fully offline against the stub, with caching"""
+    server, stats, base_url = start_stub()
+    try:
+        service = FMCSAService()
+        service.base_url = base_url
+        assert service.verify_mc_number("123456")["eligible"] is True
+        assert service.verify_mc_number("123456")["eligible"] is True  # cached
+        assert service.verify_mc_number("700007")["eligible"] is False  # inactive
+        assert service.verify_mc_number("123450")["status"] == "not_found"
+        assert stats.snapshot()["requests"] == 3
+    finally:
+        server.shutdown()
+
+def test_stub_error_rate_returns_5xx():
+    """A 100% error rate answers every lookup with a 500"""
+    server, stats, base_url = start_stub(error_rate=1.0)
+    try:
+        response = requests.get(f"{base_url}/docket-number/123456", timeout=5)
+        assert response.status_code == 500
+        assert stats.snapshot()["errors"] == 1
+    finally:
+        server.shutdown()
+
+def test_percentile_and_request_factory():
+    """Percentiles use nearest rank; the factory draws MCs from a fixed pool"""
+    values = sorted(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    factory = RequestFactory(mc_pool_size=3, seed=7)
+    method, path, payload = factory.build("verify_mc")
+    assert (method, path) == ("POST", "/verify_mc")
+    assert payload["mc_number"] in factory.mc_pool
+
+def test_spawned_api_books_against_a_scratch_board(tmp_path, monkeypatch):
+    """spawn_api hands the API a copy of the board, so closed deals never touch the original"""
+    import json
+    from benchmarks.harness import make_loads
+    from services.load_repository import LoadRepository
+    from tools.loadtest import _scratch_board
+
+    board = tmp_path / "loads.json"
+    board.write_text(json.dumps(make_loads(2)))
+    monkeypatch.setenv("LOADS_PATH", str(board))
+    scratch = _scratch_board()
+    assert os.path.dirname(scratch) != str(tmp_path)
+    LoadRepository(scratch).delete("L000000")
+    assert len(LoadRepository(scratch).refresh()) == 1
+    assert len(LoadRepository(str(board)).refresh()) == 2 and not os.path.exists(f"{board}.wal")
@@ -0,0 +1,99 @@
+"""
+Tests for memory accounting, tracemalloc snapshots and the bounded FMCSA cache
+"""
+import os
+import time
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("API_KEY", "test-api-key")
+os.environ.setdefault("FMCSA_API_TOKEN", "test-token")
+os.environ.setdefault("ENVIRONMENT", "testing")
+
+from core.config import Config
+from core.memory import deep_sizeof
+from core.metrics import CACHE_EVICTIONS
+from main import app
+from services.fmcsa import FMCSAService
+
+client = TestClient(app)
+HEADERS = {"X-API-Key": os.environ["API_KEY"]}
+
+def test_fmcsa_cache_is_bounded():
+    """The per-worker cache evicts least recently used entries and drops stale ones on read"""
+    with patch.object(Config, "FMCSA_CACHE_MAX_ENTRIES", 3):
+        service = FMCSAService()
+    evictions = CACHE_EVICTIONS.value("fmcsa")
+    now = time.time()
+    for mc in ("1", "2", "3"):
+        service._cache[f"mc_{mc}"] = ({"mc_number": mc}, now)
+    assert service._get_cached("1") == {"mc_number": "1"}
+    service._cache["mc_4"] = ({"mc_number": "4"}, now)
+    # "2" was least recently used
+    assert service._get_cached("2") is None and service._get_cached("1") is not None
+    assert len(service._cache) == 3 and CACHE_EVICTIONS.value("fmcsa") == evictions + 1
+
+    service._cache["mc_5"] = ({"mc_number": "5"}, now - service._cache_ttl - 1)
+    assert service._get_cached("5") is None and "mc_5" not in service._cache
+    usage = service.memory_usage()
+    assert usage["entries"] == 2 and usage["max_entries"] == 3 and usage["bytes"] > 0
+
+def test_deep_sizeof_samples_large_containers():
+    """Sampled estimates stay close to a full walk; shared objects count once"""
+    records = {f"mc_{i}": ({"mc_number": str(i), "carrier_name": "ACME " * (i % 7)}, float(i)) for i in range(20000)}
+    exact = deep_sizeof(records, sample=10 ** 9)
+    assert abs(deep_sizeof(records) - exact) <= 0.05 * exact
+    shared = ["x" * 10000]
+    assert deep_sizeof([shared, shared]) < deep_sizeof([shared, ["x" * 10000]])
+
+def test_admin_memory_reports_subsystems():
+    """/admin/memory reports process RSS and per-subsystem footprints"""
+    from api.loads import get_loads_store
+    get_loads_store()
+    report = client.get("/admin/memory", headers=HEADERS).json()
+    assert report["process"]["pid"] == os.getpid()
+    assert report["process"]["rss_bytes"] is None or report["process"]["rss_bytes"] > 0
+    subsystems = report["subsystems"]
+    assert {"fmcsa_cache", "loads", "carrier_history", "negotiation_stats", "webhook_idempotency",
+            "reservations", "request_profiles", "metrics"} <= set(subsystems)
+    loads = subsystems["loads"]
+    assert loads["rows"] == len(get_loads_store()) and loads["bytes"] >= loads["column_bytes"] > 0
+    assert client.get("/admin/memory", headers={"X-API-Key": "wrong"}).status_code == 403
+
+def test_tracemalloc_snapshot_diff():
+    """Two snapshots diff to the lines that allocated in between"""
+    first = client.post("/admin/memory/snapshots", params={"label": "before"}, headers=HEADERS).json()
+    retained = [bytearray(1024) for _ in range(500)]
+    second = client.post("/admin/memory/snapshots", params={"label": "after"}, headers=HEADERS).json()
+    try:
+        listed = client.get("/admin/memory/snapshots", headers=HEADERS).json()
+        assert listed["tracing"] and first["snapshot_id"] in [s["snapshot_id"] for s in listed["snapshots"]]
+
+        diff = client.get(f"/admin/memory/snapshots/{first['snapshot_id']}/diff/{second['snapshot_id']}",
+                          headers=HEADERS).json()
+        grew = [s for s in diff["top"] if s["location"].startswith("test_memory.py:")]
+        assert grew and grew[0]["size_diff_bytes"] >= 500 * 1024 and grew[0]["count_diff"] >= 500
+
+        top = client.get(f"/admin/memory/snapshots/{second['snapshot_id']}",
+                         params={"group_by": "filename", "limit": 5}, headers=HEADERS).json()
+        assert len(top["top"]) <= 5 and top["label"] == "after"
+        assert client.get("/admin/memory/snapshots/missing", headers=HEADERS).status_code == 404
+    finally:
+        assert client.delete("/admin/memory/snapshots", headers=HEADERS).json() == {"tracing": False}
+    assert retained
+
+def test_soak_growth_fit():
+    """The soak gate fits steady-state RSS only and attributes growth to subsystems"""
+    from tools.soak import MB, fit_growth, subsystem_growth
+    # Steep during warmup, then 1MB per 100s
+    samples = [(t, int((50 + t if t < 30 else 80 + (t - 30) / 100) * MB)) for t in range(0, 330, 10)]
+    growth = fit_growth(samples, warmup=30)
+    assert growth["samples"] == 30 and abs(growth["growth_mb"] - 2.9) < 0.01
+    assert abs(growth["slope_mb_per_hour"] - 36) < 0.1
+    assert fit_growth(samples[:4], warmup=30) is None
+
+    first = {"subsystems": {"fmcsa_cache": {"entries": 10, "max_entries": 100, "bytes": 1000}, "loads": None}}
+    last = {"subsystems": {"fmcsa_cache": {"entries": 15, "max_entries": 100, "bytes": 1500, "backend": "memory"},
+                           "loads": {"rows": 2, "bytes": 50}}}
+    assert subsystem_growth(first, last) == {"fmcsa_cache": {"entries": 5, "bytes": 500},
+                                             "loads": {"rows": 2, "bytes": 50}}
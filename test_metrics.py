@@ -0,0 +1,180 @@
+"""
+Tests for Prometheus-style instrumentation
+"""
+import json
+import os
+import threading
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("API_KEY", "test-api-key")
+os.environ.setdefault("FMCSA_API_TOKEN", "test-token")
+os.environ.setdefault("ENVIRONMENT", "testing")
+
+from main import app
+from core.metrics import Counter, Histogram, MetricsRegistry
+
+client = TestClient(app)
+HEADERS = {"X-API-Key": os.environ["API_KEY"]}
+
+def test_histogram_buckets_are_cumulative():
+    """Observations land in cumulative buckets with sum and count"""
+    hist = Histogram("test_latency_seconds", "test", ("route",), buckets=(0.1, 1.0))
+    hist.observe(0.05, "/a")
+    hist.observe(0.5, "/a")
+    hist.observe(5.0, "/a")
+    data = hist.collect()[("/a",)]
+    assert data["buckets"] == [1, 2, 3]
+    assert data["count"] == 3
+    assert abs(data["sum"] - 5.55) < 1e-9
+
+def test_counter_merges_thread_shards():
+    """Increments from many threads are all counted"""
+    counter = Counter("test_events_total", "test", ("kind",))
+
+    def work():
+        for _ in range(1000):
+            counter.inc("x")
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert counter.value("x") == 8000
+
+def test_registry_renders_text_format():
+    """Registry output follows the Prometheus exposition format"""
+    registry = MetricsRegistry()
+    hist = registry.histogram("demo_seconds", "Demo latency", ("route",), buckets=(1.0,))
+    hist.observe(0.5, "/x")
+    text = registry.render()
+    assert "# TYPE demo_seconds histogram" in text
+    assert 'demo_seconds_bucket{route="/x",le="1.0"} 1' in text
+    assert 'demo_seconds_bucket{route="/x",le="+Inf"} 1' in text
+    assert 'demo_seconds_count{route="/x"} 1' in text
+
+def test_prometheus_endpoint_reports_route_latency():
+    """Requests are recorded per route template and status"""
+    client.get("/load/DOES-NOT-EXIST", headers=HEADERS)
+    response = client.get("/metrics/prometheus", headers=HEADERS)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'route="/load/{load_id}",status="404"' in response.text
+    assert "load_search_matches" in response.text
+
+def test_admin_profile_returns_collapsed_stacks():
+    """The admin profiler samples threads and returns folded stacks"""
+    response = client.get("/admin/profile", params={"seconds": 0.2, "interval_ms": 2}, headers=HEADERS)
+    assert response.status_code == 200
+    lines = [l for l in response.text.splitlines() if l]
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0
+
+def test_admin_profile_requires_api_key():
+    """Profiling is an authenticated admin operation"""
+    response = client.get("/admin/profile", params={"seconds": 0.1}, headers={"X-API-Key": "wrong"})
+    assert response.status_code == 403
+
+def test_per_request_profile_header():
+    """X-Profile captures a profile for that request only"""
+    response = client.get("/loads", headers={**HEADERS, "X-Profile": "1"})
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+    profile = client.get(f"/admin/profile/requests/{profile_id}", params={"format": "json"}, headers=HEADERS)
+    assert profile.status_code == 200
+    assert "stacks" in profile.json()
+    assert "X-Profile-Id" not in client.get("/loads", headers=HEADERS).headers
+
+def test_per_request_profile_samples_only_its_own_threads():
+    """The endpoint's threadpool thread is sampled, unrelated threads aren't; busy sessions skip profiling"""
+    import time
+    from unittest.mock import patch
+    from core.profiler import _session_lock
+    from services.load_table import LoadTable
+
+    stop = threading.Event()
+
+    def background_spin():
+        while not stop.is_set():
+            sum(range(1000))
+
+    def slow_store():
+        time.sleep(0.1)
+        return LoadTable()
+
+    spinner = threading.Thread(target=background_spin, daemon=True)
+    spinner.start()
+    try:
+        with patch("api.loads.get_loads_store", side_effect=slow_store):
+            response = client.get("/loads", headers={**HEADERS, "X-Profile": "1"})
+    finally:
+        stop.set()
+        spinner.join()
+    profile_id = response.headers["X-Profile-Id"]
+    stacks = client.get(f"/admin/profile/requests/{profile_id}", params={"format": "json"}, headers=HEADERS).json()["stacks"]
+    assert any("get_loads (loads.py" in stack for stack in stacks)
+    assert not any("background_spin" in stack for stack in stacks)
+
+    with _session_lock:
+        response = client.get("/loads", headers={**HEADERS, "X-Profile": "1"})
+    assert response.status_code == 200 and "X-Profile-Id" not in response.headers
+
+def test_quantile_sketch_accuracy_and_merge():
+    """Quantiles stay within the relative error; merged halves equal one sketch over everything"""
+    import random
+    from core.sketch import QuantileSketch
+
+    rng = random.Random(3)
+    values = [rng.lognormvariate(7.5, 0.4) for _ in range(20000)] + [0.0, -150.0, -20.0]
+    whole, first, second = QuantileSketch(), QuantileSketch(), QuantileSketch()
+    for i, value in enumerate(values):
+        whole.add(value)
+        (first if i % 2 else second).add(value)
+    ordered = sorted(values)
+    for q in (0.01, 0.5, 0.9, 0.99):
+        exact = ordered[int(q * (len(ordered) - 1))]
+        assert abs(whole.quantile(q) - exact) <= 0.01 * abs(exact) + 1e-9
+    assert whole.quantile(0) == -150.0 and whole.quantile(1) == max(values)
+
+    restored = QuantileSketch.from_dict(json.loads(json.dumps(first.to_dict()))).merge(second)
+    assert restored.to_dict()["positive"] == whole.to_dict()["positive"]
+    assert [restored.quantile(q) for q in (0, 0.5, 0.99, 1)] == [whole.quantile(q) for q in (0, 0.5, 0.99, 1)]
+    assert whole.summary() is whole.summary()  # cached until the next add
+    whole.add(1.0)
+    assert whole.summary()["count"] == len(values) + 1
+    assert QuantileSketch().quantile(0.5) is None
+
+def test_sketch_metric_merges_peer_exports():
+    registry = MetricsRegistry()
+    local = registry.sketch("demo_latency_seconds", "Demo latency", ("lane",))
+    peer = MetricsRegistry().sketch("demo_latency_seconds", "Demo latency", ("lane",))
+    for value in (0.1, 0.2, 0.3):
+        local.observe(value, "A → B")
+        peer.observe(value * 10, "A → B")
+    peer.observe(5.0, "C → D")
+    exports = [{"demo_latency_seconds": json.loads(json.dumps(peer.export()))}]
+    merged = local.collect(peer_exports=exports)
+    assert merged[("A → B",)].count == 6 and merged[("C → D",)].count == 1
+    text = registry.render(exports)
+    assert "# TYPE demo_latency_seconds summary" in text
+    assert 'demo_latency_seconds_count{lane="A → B"} 6' in text
+    assert 'demo_latency_seconds{lane="C → D",quantile="0.99"} 5.0' in text
+
+def test_metrics_endpoint_does_not_double_count_peers_during_a_render():
+    """/metrics merges peers from its own exchange, not the ones a concurrent render installed"""
+    from unittest.mock import patch
+    from core.metrics import WEBHOOK_LATENCY
+
+    peer = MetricsRegistry().sketch("webhook_latency_seconds", "peer", ("lane", "equipment_type"))
+    peer.observe(0.5, "A → B", "Dry Van")
+    exports = [{"webhook_latency_seconds": json.loads(json.dumps(peer.export()))}]
+    WEBHOOK_LATENCY.reset()
+    # What MetricsRegistry.render leaves in place while it runs
+    WEBHOOK_LATENCY._peer_totals = [{tuple(labels): data for labels, data in exports[0]["webhook_latency_seconds"]}]
+    try:
+        with patch("api.negotiation.exchange_metrics", return_value=exports):
+            latency = client.get("/metrics", headers=HEADERS).json()["webhook_latency_seconds"]
+    finally:
+        WEBHOOK_LATENCY._peer_totals = []
+    assert latency["all"]["count"] == 1
@@ -0,0 +1,107 @@
+"""
+Tests for negotiating several candidate loads per call
+"""
+import os
+import random
+from unittest.mock import patch
+
+os.environ.setdefault("API_KEY", "test-api-key")
+os.environ.setdefault("FMCSA_API_TOKEN", "test-token")
+os.environ.setdefault("ENVIRONMENT", "testing")
+
+from agent import CarrierAgent
+from api.negotiation import negotiate_rate, negotiate_rates, negotiation_at
+from benchmarks.harness import make_loads
+
+def test_vectorized_negotiation_matches_scalar():
+    rng = random.Random(7)
+    for max_rounds in (1, 3, 5):
+        rates = [rng.randint(800, 4000) for _ in range(200)]
+        offers = [rng.randint(0, 5000) for _ in range(200)]
+        result = negotiate_rates(rates, offers, max_rounds)
+        for i, (rate, offer) in enumerate(zip(rates, offers)):
+            assert negotiation_at(result, i) == negotiate_rate(rate, offer, max_rounds)
+    # One offer for every load
+    assert negotiation_at(negotiate_rates([2000, 1000], 2050), 1) == negotiate_rate(1000, 2050)
+
+def test_candidates_ranked_by_deal_then_closeness():
+    loads = [{"load_id": f"L{i}", "loadboard_rate": rate} for i, rate in enumerate([1000, 1850, 2000, 1500])]
+    ranked = CarrierAgent().negotiate_candidates(loads, initial_offer="2050")
+    # L2 closes at its board rate, L1 a round later above it; L3 gets closer than L0
+    assert [load["load_id"] for load, _ in ranked] == ["L2", "L1", "L3", "L0"]
+    assert [n["accepted"] for _, n in ranked] == [True, True, False, False]
+    assert ranked[1][1] == negotiate_rate(1850, 2050) and ranked[1][1]["final_rate"] == 1950
+    assert CarrierAgent().negotiate_candidates([], 2000) == []
+
+def test_webhook_closes_on_an_alternative_load(tmp_path):
+    """An offer too high for the first match still books the next one that closes"""
+    import json
+    from fastapi.testclient import TestClient
+    from main import app
+    from services.load_repository import LoadRepository
+    from services.reservations import ReservationBook
+
+    client = TestClient(app)
+    rates = [1000, 1950, 1200, 1900, 1100, 2000, 2000]
+    snapshot = tmp_path / "loads.json"
+    snapshot.write_text(json.dumps([{**load, "equipment_type": "Dry Van", "loadboard_rate": rate}
+                                    for load, rate in zip(make_loads(len(rates)), rates)]))
+    repository = LoadRepository(str(snapshot))
+    book = ReservationBook()
+    payload = {"mc_number": "123456", "equipment_type": "Dry Van", "initial_offer": 2000}
+    with patch("api.loads.get_load_repository", return_value=repository), \
+            patch("services.reservations._book", book), \
+            patch("services.fmcsa.FMCSAService.verify_mc_number", return_value={"eligible": True}), \
+            patch.object(CarrierAgent, "classify_sentiment", return_value="Neutral"), \
+            patch.object(CarrierAgent, "log_negotiation"):
+        result = client.post("/webhook/happyrobot", json=payload).json()
+        # Only the top NEGOTIATION_CANDIDATES (5) are negotiated; L000005 is never considered
+        assert result["load"]["load_id"] == "L000001" and result["outcome"] == "Deal Closed"
+        assert result["negotiation"] == negotiate_rate(1950, 2000)
+        assert [a["load_id"] for a in result["alternatives"]] == ["L000003", "L000002", "L000004", "L000000"]
+        assert [a["accepted"] for a in result["alternatives"]] == [True, False, False, False]
+        assert result["transfer_to_sales_rep"] and repository.table.get("L000001") is None
+
+        # The best deal is taken; the next call books the runner-up
+        assert client.post("/webhook/happyrobot", json=payload).json()["load"]["load_id"] == "L000003"
+
+def test_metrics_report_streaming_quantiles(tmp_path):
+    """/metrics folds new log lines into per-lane/equipment sketches; the dashboard renders them"""
+    import json
+    from fastapi.testclient import TestClient
+    from core.metrics import WEBHOOK_LATENCY
+    from main import app
+    from services.negotiation_stats import NegotiationStats
+
+    client = TestClient(app)
+    headers = {"X-API-Key": os.environ["API_KEY"]}
+    log = tmp_path / "negotiations.log"
+
+    def record(final_rate, rate=2000, lane="Chicago, IL → Dallas, TX", equipment="Dry Van", rounds=2):
+        return json.dumps({"mc_number": "123456", "accepted": final_rate is not None, "final_rate": final_rate,
+                           "history": [{}] * rounds, "loadboard_rate": rate, "lane": lane,
+                           "equipment_type": equipment}) + "\n"
+
+    with open(log, "w") as f:
+        f.writelines(record(rate) for rate in range(1801, 1901))
+        f.write(record(None, rounds=3))
+        f.write(json.dumps({"load_id": "L9", "final_rate": 100}) + "\n")  # /negotiate record
+    WEBHOOK_LATENCY.reset()
+    WEBHOOK_LATENCY.observe(0.25, "Chicago, IL → Dallas, TX", "Dry Van")
+    with patch("services.negotiation_stats._stats", NegotiationStats(str(log))):
+        metrics = client.get("/metrics", headers=headers).json()
+        assert (metrics["negotiations"], metrics["calls"], metrics["deals"]) == (102, 101, 100)
+        assert abs(metrics["final_rate"]["p50"] - 1850) <= 0.01 * 1850
+        assert abs(metrics["discount"]["p90"] - 0.0945) <= 0.02 * 0.0945
+        assert round(metrics["rounds"]["p99"]) == 2 and metrics["rounds"]["count"] == 101
+        assert abs(metrics["webhook_latency_seconds"]["by_lane"]["Chicago, IL → Dallas, TX"]["p50"] - 0.25) < 0.005
+
+        with open(log, "a") as f:
+            f.write(record(3000, rate=3000, lane="Miami, FL → Atlanta, GA", equipment="reefer"))
+        metrics = client.get("/metrics", headers=headers).json()
+        assert metrics["by_lane"]["Miami, FL → Atlanta, GA"]["final_rate"]["p50"] == 3000
+        assert metrics["by_equipment_type"]["Reefer"]["discount"]["p50"] == 0.0
+
+        dashboard = client.get("/dashboard").text
+        assert "Final Rate by Lane" in dashboard and "Miami, FL → Atlanta, GA" in dashboard
+    WEBHOOK_LATENCY.reset()
@@ -0,0 +1,165 @@
+"""
+Tests for load reservations
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+os.environ.setdefault("API_KEY", "test-api-key")
+os.environ.setdefault("FMCSA_API_TOKEN", "test-token")
+os.environ.setdefault("ENVIRONMENT", "testing")
+
+from benchmarks.harness import make_loads
+from core.shared_store import SharedStore
+from services.load_repository import LoadRepository
+from services.reservations import ReservationBook, SharedReservationBook
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def _books(tmp_path, clock):
+    return ReservationBook(clock=clock), SharedReservationBook(SharedStore(str(tmp_path / "state.db")), clock=clock)
+
+def test_hold_confirm_release_and_lapse(tmp_path):
+    """A hold is exclusive until released or lapsed; a confirmed hold never lapses until settled"""
+    clock = FakeClock()
+    for book in _books(tmp_path, clock):
+        token = book.hold("L1", "111", ttl=60)
+        assert token and book.hold("L1", "222", ttl=60) is None
+        assert book.held_ids() == {"L1"}
+        assert not book.release("L1", "wrong-token")
+        assert book.release("L1", token) and book.held_ids() == frozenset()
+
+        lapsing = book.hold("L2", "111", ttl=60)
+        clock.now += 61
+        assert not book.confirm("L2", lapsing)
+        taken_over = book.hold("L2", "222", ttl=60)
+        assert taken_over and book.confirm("L2", taken_over)
+        clock.now += 10_000
+        assert book.held_ids() == {"L2"}
+        assert book.hold("L2", "333", ttl=60) is None and not book.release("L2", taken_over)
+        assert not book.settle("L2", "wrong-token") and book.settle("L2", taken_over)
+        assert book.held_ids() == frozenset() and not book.settle("L2", taken_over)
+
+def test_lapsed_holds_pruned_on_hold_not_on_search(tmp_path):
+    """Searches only read the book; lapsed holds are deleted when later holds are taken"""
+    clock = FakeClock()
+    memory_book = ReservationBook(stripes=1, clock=clock)
+    shared_book = SharedReservationBook(SharedStore(str(tmp_path / "state.db")), clock=clock)
+
+    def shared_rows():
+        with shared_book.store._connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM reservations").fetchone()[0]
+
+    for i in range(100):
+        memory_book.hold(f"L{i}", "111", ttl=60)
+        shared_book.hold(f"L{i}", "111", ttl=60)
+    clock.now += 61
+    assert memory_book.held_ids() == shared_book.held_ids() == frozenset()
+    assert memory_book.memory_usage()["holds"] == 100 and shared_rows() == 100
+
+    memory_book.hold("M0", "222", ttl=60)
+    shared_book.hold("M0", "222", ttl=60)  # past the prune interval
+    assert memory_book.memory_usage()["holds"] == 1 and shared_rows() == 1
+    assert memory_book.held_ids() == shared_book.held_ids() == {"M0"}
+
+def test_concurrent_holds_never_double_book(tmp_path):
+    """Hundreds of concurrent calls racing for a few loads: one holder per load, one booking per load"""
+    loads = [f"L{i}" for i in range(25)]
+    for book in _books(tmp_path, time.time):
+        active, booked, overlaps = set(), [], []
+        guard = threading.Lock()
+
+        def call(n):
+            held = book.held_ids()
+            for load_id in (l for l in loads if l not in held):
+                token = book.hold(load_id, str(n), ttl=30)
+                if token is None:
+                    continue
+                with guard:
+                    if load_id in active:
+                        overlaps.append(load_id)
+                    active.add(load_id)
+                time.sleep(0.001)  # negotiating
+                with guard:
+                    active.discard(load_id)
+                if n % 3 == 0 and book.confirm(load_id, token):
+                    with guard:
+                        booked.append(load_id)
+                else:
+                    book.release(load_id, token)
+                return
+
+        with ThreadPoolExecutor(max_workers=64) as pool:
+            list(pool.map(call, range(400)))
+        assert overlaps == []
+        assert len(booked) == len(set(booked)) and set(booked) == book.held_ids()
+
+def test_webhook_holds_and_books_loads(tmp_path):
+    """Search skips held loads; a closed deal takes the load off the board for good, a lost one releases it"""
+    from fastapi.testclient import TestClient
+    from agent import CarrierAgent
+    from main import app
+
+    client = TestClient(app)
+    headers = {"X-API-Key": os.environ["API_KEY"]}
+    snapshot = tmp_path / "loads.json"
+    snapshot.write_text(json.dumps(
+        [{**load, "equipment_type": "Dry Van", "origin": "Chicago, IL"} for load in make_loads(3)]))
+    repository = LoadRepository(str(snapshot))
+    book = ReservationBook()
+    payload = {"mc_number": "123456", "equipment_type": "Dry Van", "origin": "Chicago", "initial_offer": 1000}
+
+    def webhook(accepted):
+        negotiation = {"accepted": accepted, "final_rate": 1000, "history": []}
+        ranked = lambda loads, initial_offer: [(load, negotiation) for load in loads]
+        with patch.object(CarrierAgent, "negotiate_candidates", side_effect=ranked):
+            return client.post("/webhook/happyrobot", json=payload).json()
+
+    with patch("api.loads.get_load_repository", return_value=repository), \
+            patch("services.reservations._book", book), \
+            patch("services.fmcsa.FMCSAService.verify_mc_number", return_value={"eligible": True}), \
+            patch.object(CarrierAgent, "classify_sentiment", return_value="Neutral"), \
+            patch.object(CarrierAgent, "log_negotiation"):
+        lost = webhook(accepted=False)
+        assert lost["load"]["load_id"] == "L000000" and not lost["transfer_to_sales_rep"]
+        assert book.held_ids() == frozenset()
+
+        first, second = webhook(accepted=True), webhook(accepted=True)
+        assert first["transfer_to_sales_rep"] and second["transfer_to_sales_rep"]
+        assert (first["load"]["load_id"], second["load"]["load_id"]) == ("L000000", "L000001")
+        assert [l["load_id"] for l in client.get("/loads", headers=headers).json()] == ["L000002"]
+        # Bookings are settled once the WAL has them: the book is empty and a restart keeps them off the board
+        assert book.held_ids() == frozenset()
+        assert [load["load_id"] for load in LoadRepository(str(snapshot)).refresh().rows()] == ["L000002"]
+
+        held = book.hold("L000002", "999", ttl=60)
+        assert webhook(accepted=True)["status"] == "no_loads_found"
+        book.release("L000002", held)
+
+def test_booking_settled_when_board_delete_keeps_failing():
+    """A confirmed booking whose load can't be deleted is retried, then settled instead of kept forever"""
+    from agent import BOOKING_DELETE_ATTEMPTS, CarrierAgent
+
+    class BrokenRepository:
+        calls = 0
+
+        def delete(self, load_id):
+            BrokenRepository.calls += 1
+            raise OSError("disk full")
+
+    book = ReservationBook()
+    token = book.hold("L1", "123456", ttl=60)
+    with patch("services.reservations._book", book), \
+            patch("api.loads.get_load_repository", return_value=BrokenRepository()), \
+            patch("agent.time.sleep"):
+        assert CarrierAgent().confirm_load({"load_id": "L1"}, token) is True
+    assert BrokenRepository.calls == BOOKING_DELETE_ATTEMPTS
+    assert book.held_ids() == frozenset() and book.memory_usage()["holds"] == 0
@@ -0,0 +1,60 @@
+"""
+Tests for the hashed keyring and per-key rate limiting
+"""
+import os
+from unittest.mock import patch
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("API_KEY", "test-api-key")
+os.environ.setdefault("FMCSA_API_TOKEN", "test-token")
+os.environ.setdefault("ENVIRONMENT", "testing")
+
+from core.rate_limit import TokenBucket
+from core.security import KeyRing, _parse_api_keys, get_api_key, hash_api_key
+
+def test_keyring_stores_only_digests():
+    """Keys validate against their SHA-256 digest; plaintext is never stored"""
+    ring = KeyRing()
+    ring.add("happyrobot", hash_api_key("hr-secret"), 10, 10)
+    assert ring.lookup("hr-secret").name == "happyrobot"
+    assert ring.lookup("hr-secret").name == "happyrobot"
+    assert ring.lookup("wrong") is None
+    assert ring.lookup("") is None
+    assert "hr-secret" not in repr(vars(ring))
+
+def test_parse_api_keys_spec():
+    """API_KEYS entries carry optional per-key rate and burst"""
+    entries = list(_parse_api_keys(f"dashboard:{hash_api_key('d')}:5:10, tools:{hash_api_key('t')}"))
+    assert entries[0] == ("dashboard", hash_api_key("d"), 5.0, 10.0)
+    assert entries[1][0] == "tools"
+
+def test_token_bucket_limits_and_refills():
+    """A bucket allows its burst, then refuses until refilled"""
+    bucket = TokenBucket(rate=1000, capacity=2)
+    assert bucket.try_acquire() and bucket.try_acquire()
+    assert not bucket.try_acquire()
+    assert 0 < bucket.retry_after() <= 0.001 + 1e-6
+
+def test_rate_limited_key_gets_429():
+    """Each key has its own bucket; exhausting it returns 429 with Retry-After"""
+    app = FastAPI()
+
+    @app.get("/ping", dependencies=[Depends(get_api_key)])
+    def ping():
+        return {"ok": True}
+
+    ring = KeyRing()
+    ring.add("limited", hash_api_key("limited-key"), rate=0.001, burst=2)
+    ring.add("other", hash_api_key("other-key"), rate=0.001, burst=2)
+    client = TestClient(app)
+    headers = {"X-API-Key": "limited-key"}
+    with patch("core.security.keyring", ring):
+        assert client.get("/ping", headers=headers).status_code == 200
+        assert client.get("/ping", headers=headers).status_code == 200
+        response = client.get("/ping", headers=headers)
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+        # Other keys are unaffected
+        assert client.get("/ping", headers={"X-API-Key": "other-key"}).status_code == 200
@@ -0,0 +1,57 @@
+"""
+Tests for multi-worker shared state
+"""
+import json
+import os
+import multiprocessing
+
+os.environ.setdefault("API_KEY", "test-api-key")
+os.environ.setdefault("FMCSA_API_TOKEN", "test-token")
+os.environ.setdefault("ENVIRONMENT", "testing")
+
+from core.metrics import MetricsRegistry
+from core.shared_store import SharedCache, SharedStore, append_line
+
+def _append_many(path, worker):
+    for i in range(200):
+        append_line(path, json.dumps({"worker": worker, "i": i, "pad": "x" * 512}))
+
+def test_shared_cache_visible_across_store_instances(tmp_path):
+    """Two workers opening the same SQLite file see each other's cache entries"""
+    path = str(tmp_path / "state.db")
+    worker_a = SharedCache(SharedStore(path), "fmcsa")
+    worker_b = SharedCache(SharedStore(path), "fmcsa")
+    worker_a["mc_123456"] = ({"eligible": True}, 1000.0)
+    assert "mc_123456" in worker_b
+    result, cached_time = worker_b.get("mc_123456")
+    assert result == {"eligible": True} and cached_time == 1000.0
+    assert len(worker_b) == 1
+
+def test_metrics_merge_peer_exports(tmp_path):
+    """Rendered metrics sum counters and histograms published by other workers"""
+    local, peer = MetricsRegistry(), MetricsRegistry()
+    for registry, count in ((local, 2), (peer, 3)):
+        counter = registry.counter("demo_total", "demo", ("kind",))
+        hist = registry.histogram("demo_seconds", "demo", buckets=(1.0,))
+        for _ in range(count):
+            counter.inc("a")
+            hist.observe(0.5)
+    store = SharedStore(str(tmp_path / "state.db"))
+    store.publish_metrics("peer", json.loads(json.dumps(peer.export())))
+    text = local.render(store.peer_metrics(exclude_worker_id="local"))
+    assert 'demo_total{kind="a"} 5' in text
+    assert "demo_seconds_count 5" in text
+    # Merging is per render only; local totals are unchanged afterwards
+    assert 'demo_total{kind="a"} 2' in local.render()
+
+def test_locked_appends_from_processes_do_not_interleave(tmp_path):
+    """Concurrent worker processes append whole lines only"""
+    path = str(tmp_path / "negotiations.log")
+    procs = [multiprocessing.Process(target=_append_many, args=(path, w)) for w in range(4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    with open(path) as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == 800
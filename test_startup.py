@@ -0,0 +1,43 @@
+"""
+Cold-start regression tests: import-time budget and lazy heavy dependencies
+"""
+import os
+import subprocess
+import sys
+
+os.environ.setdefault("API_KEY", "test-api-key")
+os.environ.setdefault("FMCSA_API_TOKEN", "test-token")
+os.environ.setdefault("ENVIRONMENT", "testing")
+
+# Generous enough for slow CI runners; today `import main` takes ~0.5s locally
+IMPORT_TIME_BUDGET_MS = int(os.getenv("IMPORT_TIME_BUDGET_MS", "1500"))
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+ENV = {**os.environ, "API_KEY": "test-api-key", "FMCSA_API_TOKEN": "test-token", "ENVIRONMENT": "testing"}
+
+def _import_main(extra_code=""):
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import main{extra_code}"],
+        cwd=REPO_DIR, env=ENV, capture_output=True, text=True, check=True,
+    )
+
+def _cumulative_us(stderr, module):
+    for line in stderr.splitlines():
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1])
+    raise AssertionError(f"{module} not found in -X importtime output")
+
+def test_import_time_budget():
+    """`import main` stays within the cold-start budget (best of 3 runs)"""
+    best_ms = min(_cumulative_us(_import_main().stderr, "main") / 1000 for _ in range(3))
+    assert best_ms < IMPORT_TIME_BUDGET_MS, f"import main took {best_ms:.0f}ms (budget {IMPORT_TIME_BUDGET_MS}ms)"
+
+def test_heavy_dependencies_not_imported_at_startup():
+    """TextBlob/NLTK load on first use or in background warmup, not on import"""
+    result = _import_main("; import sys; print(sorted(m for m in ('textblob', 'nltk') if m in sys.modules))")
+    assert result.stdout.strip() == "[]"
+
+def test_fmcsa_service_is_shared_and_lazy():
+    """The FMCSA service (and its cache) is created once and reused"""
+    from services.fmcsa import get_fmcsa_service
+    assert get_fmcsa_service() is get_fmcsa_service()
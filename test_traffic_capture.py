@@ -0,0 +1,127 @@
+"""
+Tests for traffic capture and replay
+"""
+import gzip
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+os.environ.setdefault("API_KEY", "test-api-key")
+os.environ.setdefault("FMCSA_API_TOKEN", "test-token")
+os.environ.setdefault("ENVIRONMENT", "testing")
+
+from core.traffic_capture import Sanitizer, TrafficRecorder, read_capture, response_digest
+from tools.replay import check_gates, compare, replay
+
+def test_sanitizer_keeps_behavior_and_drops_identities():
+    sanitizer = Sanitizer("salt")
+    clean = sanitizer.payload({
+        "mc_number": 123456, "call_id": "abc", "carrier_name": "Acme Trucking", "origin": "Chicago",
+        "call_transcript": "Call me at (312) 555-0199 or joe@acme.com, 2000 works",
+    })
+    assert "carrier_name" not in clean and clean["origin"] == "Chicago"
+    assert clean["call_transcript"] == "Call me at <phone> or <email>, 2000 works"
+    assert clean["mc_number"] != 123456 and 100000 <= clean["mc_number"] <= 999999
+    # Repeat callers stay repeat callers, whatever type the platform sent
+    assert sanitizer.payload({"mc_number": " 123456"})["mc_number"] == str(clean["mc_number"])
+    assert Sanitizer("other").payload({"mc_number": 123456})["mc_number"] != clean["mc_number"]
+    assert clean["call_id"] == sanitizer.token("abc") != "abc"
+
+def test_sanitizer_scrubs_nested_payloads():
+    """Transcript turns and carrier objects are scrubbed like top-level fields"""
+    sanitizer = Sanitizer("salt")
+    clean = sanitizer.payload({
+        "carrier": {"mc_number": "123456", "carrier_name": "Acme Trucking", "phone": "312-555-0199",
+                    "contacts": [{"email": "joe@acme.com", "role": "dispatch"}]},
+        "transcript": [{"role": "carrier", "text": "Reach me at joe@acme.com or 312 555 0199"},
+                       {"role": "agent", "text": "Thanks"}],
+    })
+    assert clean["carrier"] == {"mc_number": sanitizer.payload({"mc_number": "123456"})["mc_number"],
+                                "contacts": [{"role": "dispatch"}]}
+    assert clean["carrier"]["mc_number"] != "123456"
+    assert clean["transcript"] == [{"role": "carrier", "text": "Reach me at <email> or <phone>"},
+                                   {"role": "agent", "text": "Thanks"}]
+
+def test_response_digest_ignores_volatile_fields():
+    a = json.dumps({"status": "rejected", "mc_details": {"eligible": False, "verified_at": 1.0}}).encode()
+    b = json.dumps({"mc_details": {"verified_at": 2.0, "eligible": False}, "status": "rejected"}).encode()
+    assert response_digest(a) == response_digest(b)
+    assert response_digest(a) != response_digest(a.replace(b"rejected", b"processed"))
+
+def test_recorder_writes_compact_capture(tmp_path):
+    """Records are sanitized off the request path; a capture cut off mid-write still reads"""
+    path = str(tmp_path / "capture.jsonl.gz")
+    recorder = TrafficRecorder(path, salt="salt", max_records=2)
+    assert recorder.wants("/search_loads") and not recorder.wants("/health")
+    body = json.dumps({"mc_number": "123456", "origin": "Chicago"}).encode()
+    recorder.record(10.0, "POST", "/webhook/happyrobot", "", "retry-1", body, 200, 0.0123, b'{"status":"processed"}')
+    recorder.record(11.0, "POST", "/search_loads", "", None, b"not json", 400, 0.001, b"{}")
+    recorder.record(12.0, "POST", "/search_loads", "", None, b"{}", 200, 0.001, b"[]")  # over max_records
+    recorder.close()
+    assert not recorder.wants("/search_loads")
+
+    first, second = read_capture([path])
+    assert first["body"]["mc_number"] == Sanitizer("salt").mc_number("123456")
+    assert first["idempotency_key"] == Sanitizer("salt").token("retry-1")
+    assert (first["latency_ms"], first["response"]) == (12.3, response_digest(b'{"status":"processed"}'))
+    assert second["body"] is None and second["status"] == 400
+
+    truncated = str(tmp_path / "truncated.jsonl.gz")
+    with open(path, "rb") as f, open(truncated, "wb") as out:
+        data = gzip.decompress(f.read())
+        out.write(gzip.compress(data)[:-8])  # no gzip trailer, as after a kill
+    assert len(read_capture([truncated])) == 2
+
+def test_middleware_captures_without_changing_responses(tmp_path):
+    from fastapi.testclient import TestClient
+    from main import app
+
+    client = TestClient(app)
+    path = str(tmp_path / "capture.jsonl")
+    recorder = TrafficRecorder(path)
+    query = {"equipment_type": "Dry Van", "origin": "Chicago", "destination": "Dallas"}
+    with patch("main.get_traffic_recorder", return_value=recorder):
+        response = client.post("/search_loads", json=query, headers={"X-API-Key": "test-api-key"})
+        client.get("/health")
+    recorder.close()
+    assert response.status_code == 200 and isinstance(response.json(), list)
+    (record,) = read_capture([path])
+    assert record["path"] == "/search_loads" and record["body"] == query
+    assert record["response"] == response_digest(response.content)
+
+class _Echo(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        payload = json.dumps({"echo": json.loads(body), "key": self.headers.get("Idempotency-Key")}).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+def test_replay_and_compare():
+    """Replay keeps order and headers; compare pairs by sequence and flags changed responses"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Echo)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    target = f"http://127.0.0.1:{server.server_address[1]}"
+    records = [{"ts": 100.0 + i * 0.05, "method": "POST", "path": "/search_loads", "body": {"i": i},
+                "idempotency_key": "k" if i == 0 else None, "status": 200, "latency_ms": 1.0} for i in range(5)]
+    try:
+        results = replay(records, target, "key", speed=2)
+    finally:
+        server.shutdown()
+    assert [r["seq"] for r in results] == list(range(5)) and all(r["status"] == 200 for r in results)
+    assert results[0]["response"] == response_digest(json.dumps({"echo": {"i": 0}, "key": "k"}).encode())
+
+    changed = [dict(r) for r in results]
+    changed[3]["response"] = "different"
+    changed[4]["status"] = 500
+    report = compare(results, changed)
+    assert report["/search_loads"]["response_mismatches"] == 1
+    assert report["/search_loads"]["status_mismatches"] == 1
+    assert report["overall"]["mismatch_rate"] == 0.4 and report["overall"]["p99_ratio"] == 1.0
+    assert check_gates(report, max_mismatch_rate=0) and not check_gates(report, max_p99_ratio=1.5)
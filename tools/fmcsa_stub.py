@@ -0,0 +1,197 @@
+"""
+Local FMCSA QCMobile stub for offline load testing
+
+Serves ``/qc/services/carriers/docket-number/{mc}`` plus the DOT-keyed
+``/{dot}/authority`` and ``/{dot}/operation-classification`` resources with
+deterministic carrier records and configurable latency, error rate and 5xx
+bursts. DOT numbers are ``1000000 + mc``.
+Point the API at it with ``FMCSA_BASE_URL=http://127.0.0.1:<port>/qc/services/carriers``.
+
+Carrier outcome by MC number:
+- ends in 0: not found (empty content)
+- divisible by 7: inactive (statusCode "I")
+- divisible by 11: out of service
+- otherwise: active and eligible
+
+Control endpoints: ``GET /__stats`` (call counters), ``POST /__reset``.
+
+Usage: python -m tools.fmcsa_stub --port 8900 --latency lognormal:-3,0.5 --error-rate 0.02
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+BASE_PATH = "/qc/services/carriers"
+DOCKET_RE = re.compile(rf"^{BASE_PATH}/docket-number/(\d+)$")
+DOT_RESOURCE_RE = re.compile(rf"^{BASE_PATH}/(\d+)/(authority|operation-classification)$")
+DOT_OFFSET = 1000000
+
+
+def parse_latency(spec: str):
+    """Build a latency sampler (seconds) from fixed:S, uniform:LO,HI or lognormal:MU,SIGMA"""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",")] if args else []
+    if kind == "fixed":
+        return lambda: values[0] if values else 0.0
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(values[0], values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def carrier_record(mc: int) -> dict:
+    status = "I" if mc % 7 == 0 else "A"
+    return {
+        "legalName": f"Stub Carrier {mc} LLC",
+        "dbaName": "",
+        "dotNumber": DOT_OFFSET + mc,
+        "statusCode": status,
+        "oosDate": "2024-01-15" if mc % 11 == 0 else None,
+        "safetyRating": "S" if mc % 3 else "C",
+    }
+
+
+def dot_resource(mc: int, resource: str) -> list:
+    if resource == "authority":
+        return [{"carrierAuthority": {
+            "docketNumber": mc,
+            "dotNumber": DOT_OFFSET + mc,
+            "authorizedForHire": True,
+            "commonAuthorityStatus": "I" if mc % 7 == 0 else "A",
+            "contractAuthorityStatus": "N",
+            "brokerAuthorityStatus": "A" if mc % 5 == 0 else "N",
+        }}]
+    return [{"operationClassDesc": "Authorized For Hire"}]
+
+
+class StubConfig:
+    def __init__(self, latency="fixed:0", error_rate=0.0, burst_every=0.0, burst_duration=0.0, seed=None):
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.burst_every = burst_every
+        self.burst_duration = burst_duration
+        self.started = time.monotonic()
+        self.random = random.Random(seed)
+
+    def in_burst(self) -> bool:
+        if not self.burst_every or not self.burst_duration:
+            return False
+        return (time.monotonic() - self.started) % self.burst_every < self.burst_duration
+
+
+class StubStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counts = {"requests": 0, "ok": 0, "not_found": 0, "errors": 0, "burst_errors": 0}
+
+    def inc(self, key):
+        with self._lock:
+            self.counts["requests"] += 1
+            self.counts[key] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts)
+
+
+def make_handler(config: StubConfig, stats: StubStats):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Send headers and body in one segment; avoids 40ms delayed-ACK stalls on keep-alive
+        disable_nagle_algorithm = True
+        wbufsize = 64 * 1024
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if path == "/__stats":
+                return self._send(200, stats.snapshot())
+            match = DOCKET_RE.match(path)
+            dot_match = DOT_RESOURCE_RE.match(path)
+            if not match and not dot_match:
+                return self._send(404, {"content": "Not found"})
+
+            time.sleep(max(config.sample_latency(), 0.0))
+            if config.in_burst():
+                stats.inc("burst_errors")
+                return self._send(503, {"content": "Error ID: stub-burst"})
+            if config.random.random() < config.error_rate:
+                stats.inc("errors")
+                return self._send(500, {"content": "Error ID: stub-error"})
+
+            if dot_match:
+                stats.inc("ok")
+                mc = int(dot_match.group(1)) - DOT_OFFSET
+                return self._send(200, {"content": dot_resource(mc, dot_match.group(2))})
+            mc = int(match.group(1))
+            if mc % 10 == 0:
+                stats.inc("not_found")
+                return self._send(200, {"content": []})
+            stats.inc("ok")
+            return self._send(200, {"content": [{"carrier": carrier_record(mc)}]})
+
+        def do_POST(self):
+            if urlparse(self.path).path == "/__reset":
+                stats.reset()
+                return self._send(200, {"status": "reset"})
+            return self._send(404, {"content": "Not found"})
+
+    return Handler
+
+
+def start_stub(port: int = 0, host: str = "127.0.0.1", **config_kwargs):
+    """Start the stub in a background thread; returns (server, stats, base_url)"""
+    stats = StubStats()
+    server = ThreadingHTTPServer((host, port), make_handler(StubConfig(**config_kwargs), stats))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fmcsa-stub", daemon=True).start()
+    base_url = f"http://{host}:{server.server_address[1]}{BASE_PATH}"
+    return server, stats, base_url
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local FMCSA QCMobile stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", default="fixed:0.05",
+                        help="fixed:S | uniform:LO,HI | lognormal:MU,SIGMA (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered with 500")
+    parser.add_argument("--burst-every", type=float, default=0.0, help="Start a 503 burst every N seconds")
+    parser.add_argument("--burst-duration", type=float, default=0.0, help="Length of each 503 burst in seconds")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server, _, base_url = start_stub(
+        args.port, args.host, latency=args.latency, error_rate=args.error_rate,
+        burst_every=args.burst_every, burst_duration=args.burst_duration, seed=args.seed,
+    )
+    print(f"FMCSA stub listening; set FMCSA_BASE_URL={base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+End-to-end load test harness
+
+Drives ``/webhook/happyrobot``, ``/verify_mc`` and ``/search_loads`` at a
+target request rate (open loop, so slow responses don't reduce offered load)
+and reports latency percentiles, error rates and FMCSA call amplification
+(upstream calls per MC-verifying request).
+
+With ``--spawn`` the harness starts the local FMCSA stub and the API itself,
+so it runs fully offline:
+
+    python -m tools.loadtest --spawn --rps 50 --duration 30 --max-p99-ms 500
+
+Exit status is non-zero when a ``--max-*`` gate is exceeded.
+"""
+import argparse
+import atexit
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+EQUIPMENT = ["Dry Van", "Reefer", "Flatbed"]
+CITIES = ["Chicago, IL", "Dallas, TX", "Atlanta, GA", "Miami, FL", "Los Angeles, CA", "Phoenix, AZ", "Denver, CO"]
+TRANSCRIPTS = ["Thanks, that works great for me", "That rate is terrible", "Okay, let me think about it"]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def parse_mix(spec: str):
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+class RequestFactory:
+    """Builds request payloads; MC numbers come from a fixed pool so caches can warm"""
+
+    def __init__(self, mc_pool_size: int, seed: int = None):
+        self.random = random.Random(seed)
+        self.mc_pool = [self.random.randint(100000, 999999) for _ in range(mc_pool_size)]
+
+    def build(self, endpoint: str):
+        r = self.random
+        if endpoint == "webhook":
+            return "POST", "/webhook/happyrobot", {
+                "mc_number": r.choice(self.mc_pool),
+                "equipment_type": r.choice(EQUIPMENT),
+                "origin": r.choice(CITIES),
+                "destination": r.choice(CITIES),
+                "initial_offer": r.randint(1500, 3000),
+                "call_transcript": r.choice(TRANSCRIPTS),
+            }
+        if endpoint == "verify_mc":
+            return "POST", "/verify_mc", {"mc_number": r.choice(self.mc_pool)}
+        if endpoint == "search_loads":
+            return "POST", "/search_loads", {
+                "equipment_type": r.choice(EQUIPMENT),
+                "origin": r.choice(CITIES).split(",")[0],
+                "destination": r.choice(CITIES).split(",")[0],
+            }
+        raise ValueError(f"Unknown endpoint: {endpoint}")
+
+
+class Results:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.statuses = {}
+
+    def record(self, endpoint, latency, status):
+        with self._lock:
+            self.latencies.setdefault(endpoint, []).append(latency)
+            self.statuses.setdefault(endpoint, {}).setdefault(status, 0)
+            self.statuses[endpoint][status] += 1
+            if status == "exception" or int(status) >= 500:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def summary(self, elapsed):
+        report = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            report[endpoint] = {
+                "requests": len(values),
+                "error_rate": round(self.errors.get(endpoint, 0) / len(values), 4),
+                "statuses": self.statuses[endpoint],
+                "p50_ms": round(percentile(values, 50) * 1000, 2),
+                "p90_ms": round(percentile(values, 90) * 1000, 2),
+                "p99_ms": round(percentile(values, 99) * 1000, 2),
+                "max_ms": round(values[-1] * 1000, 2),
+            }
+        total = sum(len(v) for v in self.latencies.values())
+        all_values = sorted(v for values in self.latencies.values() for v in values)
+        report["overall"] = {
+            "requests": total,
+            "achieved_rps": round(total / elapsed, 2) if elapsed else 0,
+            "error_rate": round(sum(self.errors.values()) / total, 4) if total else 0,
+            "p50_ms": round(percentile(all_values, 50) * 1000, 2) if total else None,
+            "p99_ms": round(percentile(all_values, 99) * 1000, 2) if total else None,
+        }
+        return report
+
+
+def run_load(target, api_key, rps, duration, mix, factory, max_workers=64, timeout=30):
+    """Open-loop load: requests are scheduled at fixed intervals regardless of response time"""
+    results = Results()
+    local = threading.local()
+    endpoints, weights = zip(*mix.items())
+
+    def send(endpoint, method, path, payload, scheduled_at):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        try:
+            response = session.request(method, target + path, json=payload,
+                                       headers={"X-API-Key": api_key}, timeout=timeout)
+            status = str(response.status_code)
+        except requests.RequestException:
+            status = "exception"
+        # Measured from the scheduled start to avoid coordinated omission
+        results.record(endpoint, time.perf_counter() - scheduled_at, status)
+
+    interval = 1.0 / rps
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        n = 0
+        while True:
+            scheduled_at = started + n * interval
+            if scheduled_at - started >= duration:
+                break
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            endpoint = factory.random.choices(endpoints, weights)[0]
+            method, path, payload = factory.build(endpoint)
+            pool.submit(send, endpoint, method, path, payload, scheduled_at)
+            n += 1
+    return results.summary(time.perf_counter() - started)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _scratch_board() -> str:
+    """A throwaway copy of the load board, removed at exit
+
+    Closed deals delete their load through the repository's WAL; running
+    against the repo's board would empty it for every later run.
+    """
+    source = os.environ.get("LOADS_PATH") or os.path.join(REPO_DIR, "data", "loads.json")
+    scratch_dir = tempfile.mkdtemp(prefix="loadtest-board-")
+    atexit.register(shutil.rmtree, scratch_dir, True)
+    path = os.path.join(scratch_dir, os.path.basename(source))
+    shutil.copyfile(source, path)
+    if os.path.exists(source + ".wal"):
+        shutil.copyfile(source + ".wal", path + ".wal")
+    return path
+
+
+def spawn_api(fmcsa_base_url, api_key, workers=1):
+    """Start the API under uvicorn pointed at the stub and a scratch copy of the board; returns (process, base_url)"""
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = {
+        **os.environ,
+        "API_KEY": api_key,
+        "FMCSA_API_TOKEN": os.environ.get("FMCSA_API_TOKEN", "stub-token"),
+        "FMCSA_BASE_URL": fmcsa_base_url,
+        "API_URL": base_url,
+        "WORKERS": str(workers),
+        "LOG_LEVEL": "WARNING",
+        "LOADS_PATH": _scratch_board(),
+        # The sample board's pickups are in the past; keep it intact for the run
+        "LOAD_EXPIRY_ENABLED": "false",
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=REPO_DIR, env=env,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            if requests.get(base_url + "/health", timeout=1).status_code == 200:
+                return process, base_url
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("API did not become healthy within 60s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HappyRobot API load test")
+    parser.add_argument("--target", default="http://127.0.0.1:8000", help="API base URL (ignored with --spawn)")
+    parser.add_argument("--api-key", default=os.environ.get("API_KEY", "loadtest-key"))
+    parser.add_argument("--rps", type=float, default=20)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load")
+    parser.add_argument("--mix", default="webhook=1,verify_mc=1,search_loads=2",
+                        help="Weighted endpoint mix")
+    parser.add_argument("--mc-pool", type=int, default=500, help="Distinct MC numbers to draw from")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--stub-url", default=None,
+                        help="Stub root (e.g. http://127.0.0.1:8900) for amplification stats")
+    parser.add_argument("--spawn", action="store_true", help="Start the FMCSA stub and the API locally")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers when spawning")
+    parser.add_argument("--stub-latency", default="lognormal:-3,0.5")
+    parser.add_argument("--stub-error-rate", type=float, default=0.0)
+    parser.add_argument("--stub-burst-every", type=float, default=0.0)
+    parser.add_argument("--stub-burst-duration", type=float, default=0.0)
+    parser.add_argument("--max-p99-ms", type=float, default=None, help="Fail if overall p99 exceeds this")
+    parser.add_argument("--max-error-rate", type=float, default=None, help="Fail if overall error rate exceeds this")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    api_process = None
+    target, stub_url = args.target, args.stub_url
+    if args.spawn:
+        from tools.fmcsa_stub import BASE_PATH, start_stub
+        _, _, fmcsa_base_url = start_stub(
+            latency=args.stub_latency, error_rate=args.stub_error_rate,
+            burst_every=args.stub_burst_every, burst_duration=args.stub_burst_duration, seed=args.seed,
+        )
+        stub_url = fmcsa_base_url[: -len(BASE_PATH)]
+        api_process, target = spawn_api(fmcsa_base_url, args.api_key, args.workers)
+
+    try:
+        if stub_url:
+            requests.post(stub_url + "/__reset", timeout=5)
+        mix = parse_mix(args.mix)
+        report = run_load(target, args.api_key, args.rps, args.duration, mix,
+                          RequestFactory(args.mc_pool, args.seed))
+        if stub_url:
+            fmcsa_calls = requests.get(stub_url + "/__stats", timeout=5).json()
+            verifying = sum(report.get(name, {}).get("requests", 0) for name in ("webhook", "verify_mc"))
+            report["fmcsa"] = {
+                **fmcsa_calls,
+                "amplification": round(fmcsa_calls["requests"] / verifying, 3) if verifying else None,
+            }
+    finally:
+        if api_process is not None:
+            api_process.terminate()
+            api_process.wait(timeout=10)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failures = []
+    overall = report["overall"]
+    if args.max_p99_ms is not None and (overall["p99_ms"] or 0) > args.max_p99_ms:
+        failures.append(f"p99 {overall['p99_ms']}ms > {args.max_p99_ms}ms")
+    if args.max_error_rate is not None and overall["error_rate"] > args.max_error_rate:
+        failures.append(f"error rate {overall['error_rate']} > {args.max_error_rate}")
+    if failures:
+        print("❌ Load test gate failed: " + "; ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
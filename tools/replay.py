@@ -0,0 +1,225 @@
+"""
+Replay captured traffic against a candidate build
+
+Replays a capture written by the API with ``CAPTURE_PATH`` set (see
+``core/traffic_capture.py``) at its recorded pace, or ``--speed`` times
+faster, and compares each response and the latency distribution per
+endpoint against a baseline: the capture itself, or an earlier replay
+saved with ``--output``.
+
+Production responses depend on live FMCSA answers and the board at the
+time, so response equality is most useful between two replays of the same
+capture against the same stub, e.g. the current release and a candidate:
+
+    python -m tools.replay run capture.jsonl.gz --spawn --speed 4 --output baseline.jsonl.gz
+    git checkout my-branch
+    python -m tools.replay run capture.jsonl.gz --spawn --speed 4 --baseline baseline.jsonl.gz \\
+        --output candidate.jsonl.gz --max-p99-ratio 1.2 --max-mismatch-rate 0
+
+Saved replays can be compared again later with
+``python -m tools.replay diff baseline.jsonl.gz candidate.jsonl.gz``.
+
+With ``--spawn`` the local FMCSA stub and the API are started as in
+``tools/loadtest.py``. Exit status is non-zero when a ``--max-*`` gate is
+exceeded.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from core.traffic_capture import read_capture, response_digest, write_capture
+from tools.loadtest import percentile
+
+# Mismatched requests listed in the report
+MAX_EXAMPLES = 10
+
+
+def replay(records, target, api_key, speed=1.0, max_workers=64, timeout=30):
+    """Send ``records`` to ``target`` on the captured schedule (open loop); returns one result per record"""
+    results = [None] * len(records)
+    local = threading.local()
+
+    def send(seq, record, scheduled_at):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        headers = {"X-API-Key": api_key, "Content-Type": "application/json"}
+        if record.get("idempotency_key"):
+            headers["Idempotency-Key"] = record["idempotency_key"]
+        url = target + record["path"] + (f"?{record['query']}" if record.get("query") else "")
+        body = json.dumps(record["body"]) if record.get("body") is not None else None
+        try:
+            response = session.request(record["method"], url, data=body, headers=headers, timeout=timeout)
+            status, digest = response.status_code, response_digest(response.content)
+        except requests.RequestException:
+            status, digest = "exception", None
+        # Measured from the scheduled start to avoid coordinated omission
+        results[seq] = {"seq": seq, "ts": time.time(), "method": record["method"], "path": record["path"],
+                        "status": status, "latency_ms": round((time.perf_counter() - scheduled_at) * 1000, 3),
+                        "response": digest}
+
+    if not records:
+        return results
+    first = records[0]["ts"]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for seq, record in enumerate(records):
+            scheduled_at = started + ((record["ts"] - first) / speed if speed > 0 else 0)
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, seq, record, scheduled_at)
+    return results
+
+
+def _latency_summary(values):
+    values = sorted(values)
+    return {
+        "p50_ms": round(percentile(values, 50), 2),
+        "p90_ms": round(percentile(values, 90), 2),
+        "p99_ms": round(percentile(values, 99), 2),
+        "max_ms": round(values[-1], 2),
+    }
+
+
+def _ratio(candidate, baseline):
+    return round(candidate / baseline, 3) if baseline else None
+
+
+def compare(baseline, candidate):
+    """Latency percentiles and response/status mismatches, pairing records by capture sequence"""
+    by_seq = {record.get("seq", index): record for index, record in enumerate(baseline)}
+    paired = {}
+    mismatches = []
+    for index, record in enumerate(candidate):
+        seq = record.get("seq", index)
+        base = by_seq.get(seq)
+        if base is None:
+            continue
+        paired.setdefault(record["path"], []).append((base, record))
+        if base["status"] != record["status"] or base["response"] != record["response"]:
+            mismatches.append({"seq": seq, "path": record["path"],
+                               "baseline_status": base["status"], "candidate_status": record["status"],
+                               "kind": "status" if base["status"] != record["status"] else "response"})
+
+    report = {}
+    for path, pairs in sorted(paired.items()):
+        base_summary = _latency_summary([b["latency_ms"] for b, _ in pairs])
+        cand_summary = _latency_summary([c["latency_ms"] for _, c in pairs])
+        report[path] = {
+            "requests": len(pairs),
+            "status_mismatches": sum(1 for m in mismatches if m["path"] == path and m["kind"] == "status"),
+            "response_mismatches": sum(1 for m in mismatches if m["path"] == path and m["kind"] == "response"),
+            "baseline": base_summary,
+            "candidate": cand_summary,
+            "p50_ratio": _ratio(cand_summary["p50_ms"], base_summary["p50_ms"]),
+            "p99_ratio": _ratio(cand_summary["p99_ms"], base_summary["p99_ms"]),
+        }
+
+    total = sum(len(pairs) for pairs in paired.values())
+    all_base = [b["latency_ms"] for pairs in paired.values() for b, _ in pairs]
+    all_cand = [c["latency_ms"] for pairs in paired.values() for _, c in pairs]
+    report["overall"] = {
+        "requests": total,
+        "unpaired": len(candidate) - total,
+        "mismatch_rate": round(len(mismatches) / total, 4) if total else 0,
+        "p99_ratio": _ratio(percentile(sorted(all_cand), 99), percentile(sorted(all_base), 99)) if total else None,
+        "examples": mismatches[:MAX_EXAMPLES],
+    }
+    return report
+
+
+def check_gates(report, max_p99_ratio=None, max_mismatch_rate=None):
+    failures = []
+    overall = report["overall"]
+    if max_p99_ratio is not None and (overall["p99_ratio"] or 0) > max_p99_ratio:
+        failures.append(f"p99 ratio {overall['p99_ratio']} > {max_p99_ratio}")
+    if max_mismatch_rate is not None and overall["mismatch_rate"] > max_mismatch_rate:
+        failures.append(f"mismatch rate {overall['mismatch_rate']} > {max_mismatch_rate}")
+    return failures
+
+
+def _report(report, output, args):
+    print(json.dumps(report, indent=2))
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+    failures = check_gates(report, args.max_p99_ratio, args.max_mismatch_rate)
+    if failures:
+        print("❌ Replay gate failed: " + "; ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+def run(args):
+    records = read_capture(args.capture)
+    if not records:
+        sys.exit("Capture is empty")
+    for seq, record in enumerate(records):
+        record["seq"] = seq
+    baseline = read_capture([args.baseline]) if args.baseline else records
+
+    api_process = None
+    target = args.target
+    if args.spawn:
+        from tools.fmcsa_stub import start_stub
+        from tools.loadtest import spawn_api
+        _, _, fmcsa_base_url = start_stub(latency=args.stub_latency, seed=args.seed)
+        api_process, target = spawn_api(fmcsa_base_url, args.api_key, args.workers)
+    try:
+        results = replay(records, target, args.api_key, speed=args.speed, max_workers=args.max_workers)
+    finally:
+        if api_process is not None:
+            api_process.terminate()
+            api_process.wait(timeout=10)
+
+    if args.output:
+        write_capture(args.output, results)
+    _report(compare(baseline, results), args.report, args)
+
+
+def diff(args):
+    _report(compare(read_capture([args.baseline]), read_capture([args.candidate])), args.report, args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured API traffic and diff the results")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="Replay a capture against a target")
+    run_parser.add_argument("capture", nargs="+", help="Capture file(s); per-worker files are merged")
+    run_parser.add_argument("--target", default="http://127.0.0.1:8000", help="API base URL (ignored with --spawn)")
+    run_parser.add_argument("--api-key", default=os.environ.get("API_KEY", "replay-key"))
+    run_parser.add_argument("--speed", type=float, default=1.0, help="Pace multiplier; 0 sends as fast as possible")
+    run_parser.add_argument("--max-workers", type=int, default=64)
+    run_parser.add_argument("--spawn", action="store_true", help="Start the FMCSA stub and the API locally")
+    run_parser.add_argument("--workers", type=int, default=1, help="uvicorn workers when spawning")
+    run_parser.add_argument("--stub-latency", default="lognormal:-3,0.5")
+    run_parser.add_argument("--seed", type=int, default=None)
+    run_parser.add_argument("--baseline", default=None, help="Earlier replay output to compare against")
+    run_parser.add_argument("--output", default=None, help="Save this replay's results for later comparisons")
+    run_parser.set_defaults(handler=run)
+
+    diff_parser = sub.add_parser("diff", help="Compare two saved replays")
+    diff_parser.add_argument("baseline")
+    diff_parser.add_argument("candidate")
+    diff_parser.set_defaults(handler=diff)
+
+    for command in (run_parser, diff_parser):
+        command.add_argument("--report", default=None, help="Write the JSON report to this file")
+        command.add_argument("--max-p99-ratio", type=float, default=None,
+                             help="Fail if overall p99 grows by more than this factor")
+        command.add_argument("--max-mismatch-rate", type=float, default=None,
+                             help="Fail if more than this fraction of responses differ")
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
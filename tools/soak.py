@@ -0,0 +1,176 @@
+"""
+Memory soak test
+
+Holds the API under constant open-loop load (the ``tools.loadtest`` mix)
+and samples ``/admin/memory`` at a fixed interval. Once warmup is over
+(caches filled, lazy imports done) resident memory should stay flat, so the
+soak fits a least-squares line through the steady-state RSS samples and
+fails when the fitted growth over that window exceeds ``--max-growth-mb``.
+The per-subsystem bytes from the first and last steady-state samples are
+reported too, so a failure points at what grew:
+
+    python -m tools.soak --spawn --rps 30 --duration 600 --warmup 120 --max-growth-mb 8
+
+With ``--tracemalloc`` a snapshot is taken when warmup ends and another at
+the end, and the allocation sites that grew most are added to the report.
+Tracing slows every allocation, so compare latencies with it off.
+
+A spawned API runs a single worker, since each sample only sees the worker
+that answers it. Exit status is non-zero when the gate fails.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from tools.loadtest import RequestFactory, parse_mix, run_load, spawn_api
+
+MB = 1024 * 1024
+
+
+def fit_growth(samples: List[Tuple[float, Optional[int]]], warmup: float) -> Optional[Dict]:
+    """Least-squares RSS trend over the (elapsed seconds, rss bytes) samples taken after warmup"""
+    steady = [(t, rss) for t, rss in samples if t >= warmup and rss is not None]
+    if len(steady) < 3:
+        return None
+    n = len(steady)
+    mean_t = sum(t for t, _ in steady) / n
+    mean_rss = sum(rss for _, rss in steady) / n
+    variance = sum((t - mean_t) ** 2 for t, _ in steady)
+    slope = sum((t - mean_t) * (rss - mean_rss) for t, rss in steady) / variance if variance else 0.0
+    window = steady[-1][0] - steady[0][0]
+    return {
+        "samples": n,
+        "window_seconds": round(window, 1),
+        "slope_mb_per_hour": round(slope * 3600 / MB, 3),
+        "growth_mb": round(slope * window / MB, 3),
+        "first_mb": round(steady[0][1] / MB, 2),
+        "last_mb": round(steady[-1][1] / MB, 2),
+        "max_mb": round(max(rss for _, rss in steady) / MB, 2),
+    }
+
+
+def subsystem_growth(first: Dict, last: Dict) -> Dict:
+    """Change in each subsystem's bytes and entry counts between two /admin/memory reports"""
+    growth = {}
+    for name, usage in last["subsystems"].items():
+        before = first["subsystems"].get(name) or {}
+        if not usage:
+            continue
+        changes = {key: value - before.get(key, 0) for key, value in usage.items()
+                   if isinstance(value, int) and not isinstance(value, bool) and key != "max_entries"}
+        growth[name] = {key: value for key, value in changes.items() if value}
+    return growth
+
+
+def soak(target, api_key, rps, duration, warmup, interval, mix, factory, trace=False) -> Dict:
+    session = requests.Session()
+    session.headers["X-API-Key"] = api_key
+
+    def admin(method, path):
+        response = session.request(method, target + "/admin" + path, timeout=30)
+        response.raise_for_status()
+        return response.json()
+
+    load_report = {}
+    load = threading.Thread(
+        target=lambda: load_report.update(run_load(target, api_key, rps, duration, mix, factory)), daemon=True)
+    started = time.monotonic()
+    load.start()
+
+    samples, reports, snapshot_ids = [], [], []
+    n = 0
+    while load.is_alive():
+        elapsed = time.monotonic() - started
+        try:
+            report = admin("GET", "/memory")
+        except requests.RequestException as e:
+            print(f"⚠️  Memory sample failed at {elapsed:.0f}s: {e}", file=sys.stderr)
+        else:
+            samples.append((elapsed, report["process"]["rss_bytes"]))
+            if elapsed >= warmup:
+                reports.append(report)
+        if trace and not snapshot_ids and elapsed >= warmup:
+            snapshot_ids.append(admin("POST", "/memory/snapshots?label=warm")["snapshot_id"])
+        n += 1
+        load.join(max(started + n * interval - time.monotonic(), 0))
+    # One last sample once the load has finished
+    final = admin("GET", "/memory")
+    samples.append((time.monotonic() - started, final["process"]["rss_bytes"]))
+    reports.append(final)
+
+    result = {
+        "load": load_report,
+        "rss": fit_growth(samples, warmup),
+        "subsystem_growth": subsystem_growth(reports[0], reports[-1]),
+        "samples": [{"elapsed_seconds": round(t, 1), "rss_mb": round(rss / MB, 2) if rss else None}
+                    for t, rss in samples],
+    }
+    if trace:
+        snapshot_ids.append(admin("POST", "/memory/snapshots?label=end")["snapshot_id"])
+        if len(snapshot_ids) == 2:
+            result["tracemalloc"] = admin("GET", f"/memory/snapshots/{snapshot_ids[0]}/diff/{snapshot_ids[1]}?limit=15")
+        admin("DELETE", "/memory/snapshots")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HappyRobot API memory soak test")
+    parser.add_argument("--target", default="http://127.0.0.1:8000", help="API base URL (ignored with --spawn)")
+    parser.add_argument("--api-key", default=os.environ.get("API_KEY", "loadtest-key"))
+    parser.add_argument("--rps", type=float, default=20)
+    parser.add_argument("--duration", type=float, default=300, help="Seconds of load, warmup included")
+    parser.add_argument("--warmup", type=float, default=60, help="Seconds before memory is expected to level off")
+    parser.add_argument("--interval", type=float, default=5, help="Seconds between memory samples")
+    parser.add_argument("--mix", default="webhook=1,verify_mc=1,search_loads=2", help="Weighted endpoint mix")
+    parser.add_argument("--mc-pool", type=int, default=500, help="Distinct MC numbers to draw from")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--spawn", action="store_true", help="Start the FMCSA stub and the API locally")
+    parser.add_argument("--stub-latency", default="lognormal:-3,0.5")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="Diff tracemalloc snapshots from the end of warmup to the end of the run")
+    parser.add_argument("--max-growth-mb", type=float, default=16,
+                        help="Fail if fitted RSS growth after warmup exceeds this")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+    if args.warmup >= args.duration:
+        parser.error("--warmup must be shorter than --duration")
+
+    api_process = None
+    target = args.target
+    if args.spawn:
+        from tools.fmcsa_stub import start_stub
+        _, _, fmcsa_base_url = start_stub(latency=args.stub_latency, seed=args.seed)
+        api_process, target = spawn_api(fmcsa_base_url, args.api_key, workers=1)
+
+    try:
+        report = soak(target, args.api_key, args.rps, args.duration, args.warmup, args.interval,
+                      parse_mix(args.mix), RequestFactory(args.mc_pool, args.seed), trace=args.tracemalloc)
+    finally:
+        if api_process is not None:
+            api_process.terminate()
+            api_process.wait(timeout=10)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    rss = report["rss"]
+    if rss is None:
+        print("❌ Soak gate failed: fewer than 3 memory samples after warmup", file=sys.stderr)
+        sys.exit(1)
+    if rss["growth_mb"] > args.max_growth_mb:
+        print(f"❌ Soak gate failed: RSS grew {rss['growth_mb']}MB over {rss['window_seconds']}s "
+              f"({rss['slope_mb_per_hour']}MB/h) > {args.max_growth_mb}MB", file=sys.stderr)
+        sys.exit(1)
+    print(f"✅ RSS steady: {rss['growth_mb']}MB over {rss['window_seconds']}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()